@@ -5,7 +5,8 @@
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, List, Optional, Tuple, Any, NamedTuple, Iterable, Iterator
+import copy
 import json
 import logging
 from datetime import datetime, time, timedelta
@@ -13,90 +14,820 @@ from collections import defaultdict
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    from .utils.window_kernels import EventWindowIndex
+    from .utils.baseline_snapshot import save_baseline_snapshot, load_baseline_snapshot
+    from .utils.risk_result import RiskResult
+    from .utils.time_parsing import time_features
+    from .utils.aggregates import AggregateCache
+except ImportError:  # 以 src 目录为搜索路径直接导入 detector 时
+    from utils.window_kernels import EventWindowIndex
+    from utils.baseline_snapshot import save_baseline_snapshot, load_baseline_snapshot
+    from utils.risk_result import RiskResult
+    from utils.time_parsing import time_features
+    from utils.aggregates import AggregateCache
+
 logger = logging.getLogger(__name__)
 
 
+class CompiledConfig(NamedTuple):
+    """
+    编译后的只读配置
+    
+    时间段已解析为小时，业务类型参数按行存放在只读数组中，
+    各数组末行为未配置业务类型的默认值（业务类型编码为 -1 时取到）。
+    """
+    raw: Dict[str, Any]                              # 原始配置字典
+    business_hours: Tuple[int, int]                  # 营业时间起止小时
+    night_hours: Tuple[int, int]                     # 夜间时段起止小时
+    weekend_multiplier: float
+    risk_weights: Tuple[float, float, float, float]  # 金额、频率、时间、操作员异常权重
+    business_types: pd.Index                         # 已配置的业务类型
+    amount_params: np.ndarray                        # 正常金额下限、上限及 low/medium/high 阈值
+    normal_frequency: np.ndarray                     # 正常日操作次数，未配置为 NaN
+    rule_switches: np.ndarray                        # 夜间高流量、国际漫游突增、快速连续操作规则开关
+    night_boost: float
+    roaming_boost: float
+    rapid_boost: float
+    rapid_interval: timedelta
+    
+    def business_type_codes(self, business_type: np.ndarray) -> np.ndarray:
+        """业务类型列转为参数数组行号，未配置的业务类型为 -1"""
+        return self.business_types.get_indexer(business_type)
+    
+    def business_type_code(self, business_type: Any) -> int:
+        """单个业务类型的参数数组行号，未配置时为 -1"""
+        try:
+            return self.business_types.get_loc(business_type)
+        except (KeyError, TypeError):
+            return -1
+
+
+def compile_config(config: Dict[str, Any]) -> CompiledConfig:
+    """
+    将原始配置字典编译为评分热路径使用的只读结构
+    
+    Args:
+        config: 原始配置字典
+        
+    Returns:
+        编译后的配置
+    """
+    def parse_hour(value: str) -> int:
+        return int(value.split(':')[0])
+    
+    time_patterns = config['time_patterns']
+    global_rules = config.get('special_patterns', {})
+    default_thresholds = config.get('anomaly_thresholds', {}).get('amount', {})
+    business_types = config.get('business_types', {})
+    
+    amount_params, normal_frequency, rule_switches = [], [], []
+    for bt_cfg in list(business_types.values()) + [{}]:
+        thresholds = bt_cfg.get('amount_thresholds', default_thresholds)
+        min_amount, max_amount = bt_cfg.get('normal_amount_range', [0, float('inf')])
+        amount_params.append([
+            min_amount, max_amount,
+            thresholds.get('low', 0.2), thresholds.get('medium', 0.5), thresholds.get('high', 0.8)
+        ])
+        normal_frequency.append(bt_cfg.get('normal_frequency_per_day', np.nan))
+        special_rules = bt_cfg.get('special_rules', {})
+        rule_switches.append([
+            special_rules.get('night_high_traffic', global_rules.get('night_high_traffic', {}).get('enabled', False)),
+            special_rules.get('roaming_surge', global_rules.get('international_roaming_surge', {}).get('enabled', False)),
+            special_rules.get('rapid_succession', global_rules.get('rapid_succession', {}).get('enabled', False)),
+        ])
+    
+    def frozen(values: list, dtype) -> np.ndarray:
+        array = np.asarray(values, dtype=dtype)
+        array.flags.writeable = False
+        return array
+    
+    weights = config['risk_weights']
+    return CompiledConfig(
+        raw=copy.deepcopy(config),
+        business_hours=(parse_hour(time_patterns['business_hours']['start']),
+                        parse_hour(time_patterns['business_hours']['end'])),
+        night_hours=(parse_hour(time_patterns['night_hours']['start']),
+                     parse_hour(time_patterns['night_hours']['end'])),
+        weekend_multiplier=time_patterns['weekend_multiplier'],
+        risk_weights=(weights['amount_anomaly'], weights['frequency_anomaly'],
+                      weights['time_anomaly'], weights['operator_anomaly']),
+        business_types=pd.Index(list(business_types.keys()), dtype=object),
+        amount_params=frozen(amount_params, float),
+        normal_frequency=frozen(normal_frequency, float),
+        rule_switches=frozen(rule_switches, bool),
+        night_boost=global_rules.get('night_high_traffic', {}).get('risk_boost', 0.0),
+        roaming_boost=global_rules.get('international_roaming_surge', {}).get('risk_boost', 0.0),
+        rapid_boost=global_rules.get('rapid_succession', {}).get('risk_boost', 0.0),
+        rapid_interval=timedelta(seconds=global_rules.get('rapid_succession', {}).get('min_interval_seconds', 0)),
+    )
+
+
 class BillingAnomalyDetector:
     """资费异常检测器"""
     
-    def __init__(self, config_path: str = "src/config/baseline.json"):
+    def __init__(self, config_path: str = "src/config/baseline.json",
+                 baseline_snapshot: Optional[str] = None):
         """
         初始化检测器
         
         Args:
             config_path: 配置文件路径
+            baseline_snapshot: 可选，基线快照目录，提供时直接加载基线而无需重建
         """
-        self.config = self._load_config(config_path)
+        self.config_path = config_path
+        self.compiled_config = self._load_config(config_path)
         self.baseline_data = None
         self.operator_baselines = {}
         self.business_type_baselines = {}
+        # 操作次数未达 min_operations_for_baseline 的操作员，在线更新时继续累积
+        self._pending_operator_baselines = {}
+        
+        if baseline_snapshot:
+            self.load_baseline(baseline_snapshot)
+        
+    @property
+    def config(self) -> Dict:
+        """
+        原始配置字典的副本
         
-    def _load_config(self, config_path: str) -> Dict:
-        """加载配置文件"""
+        评分使用 compiled_config，就地修改返回的字典不生效；
+        修改配置请将改好的字典整体赋值给 config，或调用 reload_config。
+        """
+        return copy.deepcopy(self.compiled_config.raw)
+    
+    @config.setter
+    def config(self, config: Dict) -> None:
+        self.compiled_config = compile_config(config)
+    
+    def _load_config(self, config_path: str) -> CompiledConfig:
+        """加载并编译配置文件"""
         try:
             with open(config_path, 'r', encoding='utf-8') as f:
                 config = json.load(f)
+            compiled = compile_config(config)
             logger.info(f"成功加载配置文件: {config_path}")
-            return config
+            return compiled
         except Exception as e:
             logger.error(f"加载配置文件失败: {e}")
             raise
     
-    def build_baseline(self, historical_data: pd.DataFrame) -> None:
+    def build_baseline(self, historical_data: pd.DataFrame, keep_data: bool = False,
+                       aggregates: Optional[AggregateCache] = None) -> None:
         """
         构建用户行为基线
         
         Args:
             historical_data: 历史账单数据
+            keep_data: 是否在 baseline_data 中保留历史数据副本（默认不保留，避免内存翻倍）
+            aggregates: 可选，historical_data 上的聚合缓存（如 ExcelParser.aggregates），
+                        已有的分组统计直接复用
         """
         logger.info("开始构建用户行为基线...")
         
         # 存储基线数据
-        self.baseline_data = historical_data.copy()
+        if keep_data:
+            self.baseline_data = historical_data.copy()
+        
+        # 操作员基线和业务类型基线共用一份分组结果
+        if aggregates is None or aggregates.data is not historical_data:
+            aggregates = AggregateCache(historical_data)
         
         # 构建操作员基线
-        self._build_operator_baselines(historical_data)
+        self._build_operator_baselines(historical_data, aggregates)
         
         # 构建业务类型基线
-        self._build_business_type_baselines(historical_data)
+        self._build_business_type_baselines(historical_data, aggregates)
         
         logger.info("用户行为基线构建完成")
     
-    def _build_operator_baselines(self, data: pd.DataFrame) -> None:
+    def _build_operator_baselines(self, data: pd.DataFrame,
+                                  aggregates: Optional[AggregateCache] = None) -> None:
         """构建操作员行为基线"""
-        for operator_id in data['操作员ID'].unique():
-            operator_data = data[data['操作员ID'] == operator_id]
+        stats = self._aggregate_baseline_stats(data, '操作员ID', aggregates)
+        
+        for operator_id, group in stats.items():
+            self._place_operator_baseline(operator_id, group)
+    
+    def _build_business_type_baselines(self, data: pd.DataFrame,
+                                       aggregates: Optional[AggregateCache] = None) -> None:
+        """构建业务类型基线"""
+        stats = self._aggregate_baseline_stats(data, '业务类型', aggregates)
+        
+        for business_type, group in stats.items():
+            group.pop('business_type_distribution')
+            self.business_type_baselines[business_type] = group
+    
+    def save_baseline(self, path: str) -> None:
+        """
+        保存基线快照（NumPy数组目录 + 带结构版本和配置指纹的清单）
+        
+        Args:
+            path: 快照目录
+        """
+        save_baseline_snapshot(path, {
+            'operators': self.operator_baselines,
+            'pending_operators': self._pending_operator_baselines,
+            'business_types': self.business_type_baselines,
+        }, self.compiled_config.raw)
+    
+    def load_baseline(self, path: str, check_config: bool = True) -> None:
+        """
+        加载基线快照，替换当前基线
+        
+        Args:
+            path: 快照目录
+            check_config: 是否校验快照的配置指纹与当前配置一致，不一致时抛出 ValueError
+        """
+        tables = load_baseline_snapshot(path, self.compiled_config.raw if check_config else None)
+        self.operator_baselines = tables['operators']
+        self._pending_operator_baselines = tables['pending_operators']
+        self.business_type_baselines = tables['business_types']
+        for baseline in self.business_type_baselines.values():
+            baseline.pop('business_type_distribution', None)
+    
+    def _place_operator_baseline(self, operator_id: Any, baseline: Dict[str, Any]) -> None:
+        """按操作次数是否达到 min_operations_for_baseline 放入正式或待定基线"""
+        self.operator_baselines.pop(operator_id, None)
+        self._pending_operator_baselines.pop(operator_id, None)
+        
+        if baseline['count'] >= self.compiled_config.raw['operators']['min_operations_for_baseline']:
+            self.operator_baselines[operator_id] = baseline
+        else:
+            self._pending_operator_baselines[operator_id] = baseline
+    
+    def update_baseline(self, new_batch: pd.DataFrame) -> None:
+        """
+        用新一批账单在线更新操作员和业务类型基线
+        
+        只聚合新批次，计算量与新批次大小成正比：
+        旧基线的累计权重和直方图按 (1 - learning_rate) 衰减后与新批次合并，
+        活跃天数取合并后的首末日期跨度，金额均值/标准差按加权合并公式更新；超过 baseline_period_days 未出现的操作员基线被淘汰。
+        
+        Args:
+            new_batch: 新一批账单数据（如一天的账单）
+        """
+        logger.info(f"开始在线更新基线，新批次 {len(new_batch)} 条记录...")
+        decay = 1.0 - self.compiled_config.raw['operators']['learning_rate']
+        aggregates = AggregateCache(new_batch)
+        
+        for operator_id, batch in self._aggregate_baseline_stats(new_batch, '操作员ID', aggregates).items():
+            old = self.operator_baselines.get(operator_id, self._pending_operator_baselines.get(operator_id))
+            merged = batch if old is None else self._merge_baseline(old, batch, decay)
+            self._place_operator_baseline(operator_id, merged)
+        
+        for business_type, batch in self._aggregate_baseline_stats(new_batch, '业务类型', aggregates).items():
+            batch.pop('business_type_distribution')
+            old = self.business_type_baselines.get(business_type)
+            self.business_type_baselines[business_type] = (
+                batch if old is None else self._merge_baseline(old, batch, decay)
+            )
+        
+        self._expire_operator_baselines(pd.to_datetime(new_batch['账单日期']).max())
+        logger.info("基线在线更新完成")
+    
+    @staticmethod
+    def _merge_baseline(old: Dict[str, Any], batch: Dict[str, Any], decay: float) -> Dict[str, Any]:
+        """
+        合并旧基线与新批次统计量
+        
+        Args:
+            old: 旧基线（需包含 count、active_days、last_date，由 build_baseline 或 update_baseline 生成）
+            batch: 新批次统计量
+            decay: 旧基线权重衰减系数，即 1 - learning_rate
             
-            if len(operator_data) < self.config['operators']['min_operations_for_baseline']:
+        Returns:
+            合并后的基线
+        """
+        old_weight = decay * old['count']
+        batch_weight = batch['count']
+        weight = old_weight + batch_weight
+        
+        merged = dict(old)
+        merged['count'] = weight
+        # 活跃天数取合并后的日期跨度（与全量重建相同），衰减只作用于计数
+        old_first = old.get('first_date', pd.NaT)
+        if pd.isna(old_first) and not pd.isna(old['last_date']):
+            # 缺少首次日期的旧基线（如早期快照）由跨度反推
+            old_first = old['last_date'] - pd.Timedelta(days=old['active_days'])
+        merged['first_date'] = min((d for d in (old_first, batch['first_date']) if not pd.isna(d)), default=pd.NaT)
+        merged['last_date'] = max((d for d in (old['last_date'], batch['last_date']) if not pd.isna(d)), default=pd.NaT)
+        span = (merged['last_date'] - merged['first_date']).days if not pd.isna(merged['first_date']) else np.nan
+        merged['active_days'] = float(np.fmax(1, span))
+        merged['avg_frequency_per_day'] = weight / merged['active_days']
+        
+        # 加权合并均值与离差平方和（learning_rate 为 0 时等价于全量重算）
+        if pd.isna(old['avg_amount']):
+            merged['avg_amount'], merged['std_amount'] = batch['avg_amount'], batch['std_amount']
+        elif not pd.isna(batch['avg_amount']):
+            delta = batch['avg_amount'] - old['avg_amount']
+            old_m2 = np.nan_to_num(old['std_amount']) ** 2 * max(old['count'] - 1, 0) * decay
+            batch_m2 = np.nan_to_num(batch['std_amount']) ** 2 * max(batch_weight - 1, 0)
+            m2 = old_m2 + batch_m2 + delta ** 2 * old_weight * batch_weight / weight
+            merged['avg_amount'] = old['avg_amount'] + delta * batch_weight / weight
+            merged['std_amount'] = np.sqrt(m2 / (weight - 1)) if weight > 1 else np.nan
+        
+        # 直方图按相同衰减系数合并
+        for name in ('business_type_distribution', 'hourly_distribution'):
+            if name not in old:
                 continue
+            histogram = {k: decay * v for k, v in old[name].items()}
+            for k, v in batch[name].items():
+                histogram[k] = histogram.get(k, 0) + v
+            merged[name] = histogram
+        
+        return merged
+    
+    def _expire_operator_baselines(self, latest_date: pd.Timestamp) -> None:
+        """淘汰最近 baseline_period_days 天内没有操作的操作员基线"""
+        if pd.isna(latest_date):
+            return
+        cutoff = latest_date - pd.Timedelta(days=self.compiled_config.raw['operators']['baseline_period_days'])
+        expired_count = 0
+        for baselines in (self.operator_baselines, self._pending_operator_baselines):
+            expired = [k for k, v in baselines.items() if v['last_date'] < cutoff]
+            for operator_id in expired:
+                del baselines[operator_id]
+            expired_count += len(expired)
+        if expired_count:
+            logger.info(f"淘汰过期操作员基线: {expired_count} 个")
+    
+    def _aggregate_baseline_stats(self, data: pd.DataFrame, key: str,
+                                  aggregates: Optional[AggregateCache] = None) -> Dict[Any, Dict[str, Any]]:
+        """
+        单次分组聚合所有键的基线统计量
+        
+        分组编码、金额均值/标准差、账单日期跨度和业务类型构成取自聚合缓存，
+        小时分布由分组编码上的 bincount 直方图得到。
+        
+        Args:
+            data: 历史账单数据
+            key: 分组列名（操作员ID 或 业务类型）
+            aggregates: 可选，data 上的聚合缓存
             
-            baseline = {
-                'avg_amount': operator_data['费用金额'].mean(),
-                'std_amount': operator_data['费用金额'].std(),
-                'avg_frequency_per_day': len(operator_data) / max(1, (operator_data['账单日期'].max() - operator_data['账单日期'].min()).days),
-                'business_type_distribution': operator_data['业务类型'].value_counts().to_dict(),
-                'hourly_distribution': operator_data['操作时间'].dt.hour.value_counts().to_dict()
+        Returns:
+            {键: 统计量字典}，包含 count、active_days、first_date、last_date、avg_amount、std_amount、
+            avg_frequency_per_day、business_type_distribution、hourly_distribution
+        """
+        aggregates = aggregates if aggregates is not None else AggregateCache(data)
+        codes, keys = aggregates.group_codes(key)
+        if len(keys) == 0:
+            return {}
+        
+        valid = codes >= 0
+        moments = aggregates.column_stats(key, '费用金额')
+        date_span = aggregates.column_stats(key, '账单日期')
+        active_days = np.fmax(1, (date_span['max'] - date_span['min']).dt.days.to_numpy())
+        avg_frequency = moments['size'].to_numpy() / active_days
+        
+        # 业务类型构成直方图
+        type_histogram, business_types = aggregates.crosstab(key, '业务类型')
+        
+        # 小时分布直方图
+        hour = self._time_features(data)['hour']
+        has_hour = valid & (hour >= 0)
+        hour_histogram = np.bincount(
+            codes[has_hour] * 24 + hour[has_hour], minlength=len(keys) * 24
+        ).reshape(len(keys), 24)
+        
+        stats = {}
+        for i, key_value in enumerate(keys):
+            stats[key_value] = {
+                'count': int(moments['size'].iat[i]),
+                'active_days': float(active_days[i]),
+                'first_date': date_span['min'].iat[i],
+                'last_date': date_span['max'].iat[i],
+                'avg_amount': moments['mean'].iat[i],
+                'std_amount': moments['std'].iat[i],
+                'avg_frequency_per_day': float(avg_frequency[i]),
+                'business_type_distribution': {
+                    business_types[j]: int(type_histogram[i, j]) for j in np.flatnonzero(type_histogram[i])
+                },
+                'hourly_distribution': {
+                    int(h): int(hour_histogram[i, h]) for h in np.flatnonzero(hour_histogram[i])
+                }
             }
+        return stats
+    
+    def detect_anomalies(self, current_data: pd.DataFrame) -> RiskResult:
+        """
+        检测异常
+        
+        各维度异常度以整列方式计算（见 _score_components），
+        结果与逐行实现 _detect_anomalies_rowwise 完全一致。
+        
+        Args:
+            current_data: 当前账单数据
             
-            self.operator_baselines[operator_id] = baseline
+        Returns:
+            列式评分结果，可按 {账单编号: 风险分数} 字典方式读取，to_dict() 转为字典
+        """
+        logger.info("开始异常检测...")
+        
+        components = self._score_components(current_data)
+        risk_scores = RiskResult.from_components(current_data, components)
+        
+        logger.info(f"异常检测完成，共检测 {len(current_data)} 条记录")
+        return risk_scores
     
-    def _build_business_type_baselines(self, data: pd.DataFrame) -> None:
-        """构建业务类型基线"""
-        for business_type in data['业务类型'].unique():
-            business_data = data[data['业务类型'] == business_type]
+    def detect_anomalies_stream(self, chunks: Iterable[pd.DataFrame]
+                                ) -> Iterator[Tuple[pd.DataFrame, RiskResult]]:
+        """
+        分块流式检测异常，结果与整批调用 detect_anomalies 一致
+        
+        频率和夜间高流量规则按自然日统计，因此最后一个（可能未结束的）日期的账单会暂存到
+        下一块到达后再评分；跨块只携带该日的账单、最近7天的国际漫游操作时间和各操作员的
+        最近一次操作时间，内存占用与单日数据量相当，而不是与整个导出文件相当。
+        
+        Args:
+            chunks: 按操作时间先后排列的账单数据块迭代器
             
-            baseline = {
-                'avg_amount': business_data['费用金额'].mean(),
-                'std_amount': business_data['费用金额'].std(),
-                'avg_frequency_per_day': len(business_data) / max(1, (business_data['账单日期'].max() - business_data['账单日期'].min()).days),
-                'hourly_distribution': business_data['操作时间'].dt.hour.value_counts().to_dict()
-            }
+        Yields:
+            (已评分的账单块, 该块的评分结果)，每块包含若干完整自然日
+        """
+        config = self.compiled_config
+        prior_events = self._empty_prior_events()
+        pending = None
+        scored_until = None
+        total = 0
+        
+        for chunk in chunks:
+            if len(chunk) == 0:
+                continue
+            day = pd.to_datetime(chunk['操作时间']).dt.normalize()
+            if scored_until is not None and (day < scored_until).any():
+                raise ValueError("数据块未按操作时间排序：出现了已完成评分日期之前的账单")
             
-            self.business_type_baselines[business_type] = baseline
+            buffer = chunk if pending is None else pd.concat([pending, chunk], ignore_index=True)
+            buffer_day = pd.to_datetime(buffer['操作时间']).dt.normalize()
+            scored_until = buffer_day.max()
+            closed = (buffer_day < scored_until).to_numpy()
+            ready, pending = buffer[closed], buffer[~closed]
+            
+            if len(ready):
+                components = self._score_components(ready, config, prior_events)
+                prior_events = self._advance_prior_events(config, prior_events, ready, scored_until)
+                total += len(ready)
+                yield ready, RiskResult.from_components(ready, components)
+        
+        if pending is not None and len(pending):
+            components = self._score_components(pending, config, prior_events)
+            total += len(pending)
+            yield pending, RiskResult.from_components(pending, components)
+        
+        logger.info(f"流式异常检测完成，共检测 {total} 条记录")
     
-    def detect_anomalies(self, current_data: pd.DataFrame) -> Dict[str, float]:
+    @staticmethod
+    def _empty_prior_events() -> Dict[str, np.ndarray]:
+        """空的跨块事件状态"""
+        return {
+            'roaming_times': np.array([], dtype='datetime64[ns]'),
+            'operator_ids': np.array([], dtype=object),
+            'operator_times': np.array([], dtype='datetime64[ns]'),
+        }
+    
+    def _advance_prior_events(self, config: CompiledConfig, prior_events: Dict[str, np.ndarray],
+                              scored: pd.DataFrame, next_day: pd.Timestamp) -> Dict[str, np.ndarray]:
         """
-        检测异常
+        将已评分账单并入跨块事件状态，并丢弃之后不再需要的事件
+        
+        Args:
+            config: 本次流式检测使用的编译配置
+            prior_events: 当前跨块事件状态
+            scored: 刚完成评分的账单
+            next_day: 之后待评分账单的最早日期
+            
+        Returns:
+            新的跨块事件状态
+        """
+        operation_time = pd.to_datetime(scored['操作时间']).to_numpy(dtype='datetime64[ns]')
+        
+        # 国际漫游：只保留 next_day 之前7天内的操作时间
+        is_roaming = scored['业务类型'].to_numpy() == '国际漫游'
+        roaming_times = np.concatenate([prior_events['roaming_times'], operation_time[is_roaming]])
+        roaming_times = roaming_times[roaming_times >= np.datetime64(next_day - timedelta(days=7))]
+        
+        # 快速连续操作：之后的账单都晚于这些事件，只需各操作员最近一次操作时间
+        latest = pd.concat([
+            pd.Series(prior_events['operator_times'], index=prior_events['operator_ids']),
+            pd.Series(operation_time, index=scored['操作员ID'].to_numpy())
+        ]).dropna()
+        latest = latest[latest.index.notna()].groupby(level=0).max()
+        latest = latest[latest >= next_day - config.rapid_interval]
+        
+        return {
+            'roaming_times': roaming_times,
+            'operator_ids': latest.index.to_numpy(dtype=object),
+            'operator_times': latest.to_numpy(dtype='datetime64[ns]'),
+        }
+    
+    def _score_components(self, data: pd.DataFrame, config: Optional[CompiledConfig] = None,
+                          prior_events: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, np.ndarray]:
+        """
+        列式评分引擎：一次性计算整批数据的各维度异常度与综合风险评分
+        
+        Args:
+            data: 当前账单数据
+            config: 可选，使用的编译配置，默认为当前 compiled_config
+            prior_events: 可选，流式检测时此前数据块留下的事件（国际漫游时间、各操作员最近操作时间）
+            
+        Returns:
+            与 data 行对齐的数组字典，包含各维度异常度、特殊模式加成和综合风险评分
+        """
+        # 整批评分使用同一份编译配置，期间热更新不影响本批结果
+        config = config or self.compiled_config
+        prior_events = prior_events or self._empty_prior_events()
+        features = self._time_features(data)
+        # 金额统一按 float64 计算，紧凑表示中的 float32 金额不影响阈值比较
+        amount = data['费用金额'].to_numpy(dtype=np.float64)
+        # 操作员和业务类型以整数编码参与分组和查表，分类列直接复用其编码
+        operator_keys = self._factorize_keys(data['操作员ID'])
+        business_type_keys = self._factorize_keys(data['业务类型'])
+        business_type_code = self._key_positions(config.business_types, business_type_keys)
+        
+        # 操作员-日期操作次数，每次检测只统计一次，再按行取值
+        daily_frequency = self._operator_day_counts_vector(operator_keys, features['date'])
+        
+        components = {
+            'amount_anomaly': self._amount_anomaly_vector(config, amount, business_type_keys, business_type_code),
+            'frequency_anomaly': self._frequency_anomaly_vector(
+                config, daily_frequency, operator_keys, business_type_code
+            ),
+            'time_anomaly': self._time_anomaly_vector(config, features),
+            'operator_anomaly': self._operator_anomaly_vector(operator_keys, business_type_keys, features),
+            'special_pattern_boost': self._special_patterns_vector(
+                config, operator_keys, business_type_keys, business_type_code, features, prior_events
+            ),
+        }
+        
+        # 按配置权重合成综合风险评分，计算顺序与逐行实现保持一致
+        amount_weight, frequency_weight, time_weight, operator_weight = config.risk_weights
+        risk_score = (
+            amount_weight * components['amount_anomaly'] +
+            frequency_weight * components['frequency_anomaly'] +
+            time_weight * components['time_anomaly'] +
+            operator_weight * components['operator_anomaly']
+        )
+        components['risk_score'] = np.fmin(1.0, risk_score + components['special_pattern_boost'])
+        return components
+    
+    @staticmethod
+    def _factorize_keys(column: pd.Series) -> Tuple[np.ndarray, pd.Index]:
+        """
+        将键列转为 (整数编码, 取值表)
+        
+        分类列直接复用其编码和类别，不再逐行哈希；缺失值编码为 -1。
+        """
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            return column.cat.codes.to_numpy(dtype=np.int64), pd.Index(column.cat.categories)
+        codes, uniques = pd.factorize(column.to_numpy())
+        return codes.astype(np.int64), pd.Index(uniques)
+    
+    @staticmethod
+    def _key_positions(index: pd.Index, keys: Tuple[np.ndarray, pd.Index]) -> np.ndarray:
+        """按行取键在 index 中的位置，只对取值表查找一次，未找到或缺失时为 -1"""
+        codes, uniques = keys
+        positions = np.append(index.get_indexer(uniques), -1)
+        return positions[codes]
+    
+    def _time_features(self, data: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """由操作时间计算时间特征（时间戳、日期、小时、星期）"""
+        return time_features(data)
+    
+    def _amount_anomaly_vector(self, config: CompiledConfig, amount: np.ndarray,
+                               business_type_keys: Tuple[np.ndarray, pd.Index],
+                               business_type_code: np.ndarray) -> np.ndarray:
+        """整列计算金额异常度，规则同 _calculate_amount_anomaly"""
+        min_amount, max_amount, low, medium, high = config.amount_params[business_type_code].T
+        
+        # 业务类型金额基线，末行为无基线时的 NaN
+        baseline_types = pd.Index(list(self.business_type_baselines.keys()), dtype=object)
+        baseline_moments = np.asarray(
+            [[b['avg_amount'], b['std_amount']] for b in self.business_type_baselines.values()] + [[np.nan, np.nan]],
+            dtype=float
+        )
+        mean_amount, std_amount = baseline_moments[self._key_positions(baseline_types, business_type_keys)].T
+        
+        below = amount < min_amount
+        out_of_range = below | (amount > max_amount)
+        with np.errstate(all='ignore'):
+            deviation = np.abs(amount - np.where(below, min_amount, max_amount)) / np.maximum(max_amount, 1)
+            graded = np.select(
+                [deviation >= high, deviation >= medium, deviation >= low],
+                [1.0, 0.7, 0.4], default=0.1
+            )
+            z_score = np.abs(amount - mean_amount) / std_amount
+            statistical = np.where(std_amount > 0, np.fmin(1.0, z_score / 3.0), 0.0)
+        
+        return np.where(out_of_range, graded, statistical)
+    
+    def _build_operator_day_index(self, operator_id: np.ndarray, date: np.ndarray) -> pd.Series:
+        """
+        构建操作员-日期操作次数索引
+        
+        Args:
+            operator_id: 操作员ID列
+            date: 操作日期列（操作时间归一化到零点）
+            
+        Returns:
+            以 (操作员ID, 日期) 为索引的操作次数Series，缺失的操作员或日期不计入
+        """
+        return pd.DataFrame({'操作员ID': operator_id, '日期': date}).value_counts(sort=False)
+    
+    def _operator_day_counts_vector(self, operator_keys: Tuple[np.ndarray, pd.Index],
+                                    date: np.ndarray) -> np.ndarray:
+        """
+        按行计算操作员当天的操作次数
+        
+        Args:
+            operator_keys: 操作员ID的 (整数编码, 取值表)
+            date: 操作日期列（操作时间归一化到零点）
+            
+        Returns:
+            与行对齐的操作次数，操作员或日期缺失时为0
+        """
+        operator_code = operator_keys[0]
+        valid = (operator_code >= 0) & ~np.isnat(date)
+        daily_frequency = np.zeros(len(date))
+        if not valid.any():
+            return daily_frequency
+        
+        # (操作员编码, 日期) 组合为单个整数键，编码后用 bincount 计数
+        day = date[valid].astype('datetime64[D]').astype(np.int64)
+        day -= day.min()
+        pair_codes, _ = pd.factorize(operator_code[valid] * (day.max() + 1) + day)
+        daily_frequency[valid] = np.bincount(pair_codes)[pair_codes]
+        return daily_frequency
+    
+    def _frequency_anomaly_vector(self, config: CompiledConfig, daily_frequency: np.ndarray,
+                                  operator_keys: Tuple[np.ndarray, pd.Index],
+                                  business_type_code: np.ndarray) -> np.ndarray:
+        """整列计算频率异常度，规则同 _calculate_frequency_anomaly"""
+        # 与操作员基线比较，末位 NaN 供无基线的操作员取用
+        baseline_operators = pd.Index(list(self.operator_baselines.keys()))
+        operator_frequency = np.asarray(
+            [baseline['avg_frequency_per_day'] for baseline in self.operator_baselines.values()] + [np.nan],
+            dtype=float
+        )
+        baseline_frequency = operator_frequency[self._key_positions(baseline_operators, operator_keys)]
+        with np.errstate(all='ignore'):
+            frequency_ratio = daily_frequency / baseline_frequency
+            operator_score = np.fmin(1.0, (frequency_ratio - 1.5) / 2.0)
+        operator_hit = (baseline_frequency > 0) & (frequency_ratio > 1.5)
+        
+        # 与业务类型基线比较
+        normal_frequency = config.normal_frequency[business_type_code]
+        with np.errstate(all='ignore'):
+            business_score = np.fmin(1.0, (daily_frequency - normal_frequency * 2) / normal_frequency)
+        business_hit = daily_frequency > normal_frequency * 2
+        
+        return np.where(operator_hit, operator_score, np.where(business_hit, business_score, 0.0))
+    
+    def _time_anomaly_vector(self, config: CompiledConfig, features: Dict[str, np.ndarray]) -> np.ndarray:
+        """整列计算时间异常度，规则同 _calculate_time_anomaly"""
+        hour = features['hour']
+        start_hour, end_hour = config.business_hours
+        
+        deviation = np.where(hour < start_hour, (start_hour - hour) / 24, (hour - end_hour) / 24)
+        time_anomaly = np.fmin(1.0, deviation * 2)
+        time_anomaly = np.where(
+            features['weekday'] >= 5,
+            time_anomaly * config.weekend_multiplier,
+            time_anomaly
+        )
+        off_hours = (hour < start_hour) | (hour > end_hour)
+        return np.where(off_hours, time_anomaly, 0.0)
+    
+    def _operator_anomaly_vector(self, operator_keys: Tuple[np.ndarray, pd.Index],
+                                 business_type_keys: Tuple[np.ndarray, pd.Index],
+                                 features: Dict[str, np.ndarray]) -> np.ndarray:
+        """整列计算操作员行为异常度，规则同 _calculate_operator_anomaly"""
+        n = len(operator_keys[0])
+        if not self.operator_baselines:
+            return np.zeros(n)
+        
+        operators = pd.Index(list(self.operator_baselines.keys()))
+        business_types = pd.Index(sorted({
+            name for baseline in self.operator_baselines.values()
+            for name in baseline['business_type_distribution']
+        }, key=str))
+        
+        # 操作员 × 业务类型 / 小时 的占比矩阵，末行末列为零，供未命中的索引 -1 取用
+        business_ratio = np.zeros((len(operators) + 1, len(business_types) + 1))
+        hourly_ratio = np.zeros((len(operators) + 1, 25))
+        business_total = np.zeros(len(operators) + 1)
+        hourly_total = np.zeros(len(operators) + 1)
+        for i, baseline in enumerate(self.operator_baselines.values()):
+            business_dist = baseline['business_type_distribution']
+            business_total[i] = sum(business_dist.values())
+            if business_total[i] > 0:
+                columns = business_types.get_indexer(list(business_dist.keys()))
+                business_ratio[i, columns] = np.asarray(list(business_dist.values())) / business_total[i]
+            hourly_dist = baseline['hourly_distribution']
+            hourly_total[i] = sum(hourly_dist.values())
+            if hourly_total[i] > 0:
+                hours = np.asarray(list(hourly_dist.keys()), dtype=np.int64)
+                hourly_ratio[i, hours] = np.asarray(list(hourly_dist.values())) / hourly_total[i]
+        
+        rows = self._key_positions(operators, operator_keys)
+        in_baseline = rows >= 0
+        expected_ratio = business_ratio[rows, self._key_positions(business_types, business_type_keys)]
+        expected_hourly_ratio = hourly_ratio[rows, features['hour']]
+        
+        business_hit = in_baseline & (business_total[rows] > 0) & (expected_ratio < 0.1)
+        hourly_hit = in_baseline & (hourly_total[rows] > 0) & (expected_hourly_ratio < 0.05)
+        return np.where(business_hit, 0.3, np.where(hourly_hit, 0.2, 0.0))
+    
+    def _special_patterns_vector(self, config: CompiledConfig, operator_keys: Tuple[np.ndarray, pd.Index],
+                                 business_type_keys: Tuple[np.ndarray, pd.Index],
+                                 business_type_code: np.ndarray,
+                                 features: Dict[str, np.ndarray],
+                                 prior_events: Dict[str, np.ndarray]) -> np.ndarray:
+        """整列计算特殊模式加成，规则同 _detect_special_patterns"""
+        night_enabled, roaming_enabled, rapid_enabled = config.rule_switches[business_type_code].T
+        
+        boost = np.zeros(len(business_type_code))
+        if night_enabled.any():
+            boost += np.where(night_enabled, self._night_high_traffic_vector(config, features), 0.0)
+        if roaming_enabled.any():
+            boost += np.where(
+                roaming_enabled, self._roaming_surge_vector(config, business_type_keys, features, prior_events), 0.0
+            )
+        if rapid_enabled.any():
+            boost += np.where(
+                rapid_enabled, self._rapid_succession_vector(config, operator_keys, features, prior_events), 0.0
+            )
+        return boost
+    
+    def _night_high_traffic_vector(self, config: CompiledConfig, features: Dict[str, np.ndarray]) -> np.ndarray:
+        """整列计算夜间高流量加成，规则同 _detect_night_high_traffic"""
+        hour = features['hour']
+        start_hour, end_hour = config.night_hours
+        is_night = self._is_night_hour(hour, start_hour, end_hour) & (hour >= 0)
+        
+        # 每个日期的夜间操作次数只统计一次，再广播到各行
+        night_day_counts = self._build_night_day_index(features['date'], is_night)
+        night_operations = night_day_counts.reindex(features['date']).fillna(0).to_numpy()
+        
+        hit = is_night & (night_operations > 5)
+        return np.where(hit, config.night_boost, 0.0)
+    
+    @staticmethod
+    def _is_night_hour(hour, start_hour: int, end_hour: int):
+        """判断小时是否落在夜间时段，起始小时大于结束小时时按跨零点时段处理"""
+        if start_hour > end_hour:  # 跨日夜间时段
+            return (hour >= start_hour) | (hour <= end_hour)
+        return (start_hour <= hour) & (hour <= end_hour)
+    
+    def _build_night_day_index(self, date: np.ndarray, is_night: np.ndarray) -> pd.Series:
+        """
+        构建日期-夜间操作次数索引
+        
+        Args:
+            date: 操作日期列
+            is_night: 是否为夜间操作
+            
+        Returns:
+            以日期为索引的夜间操作次数Series
+        """
+        return pd.Series(date[is_night]).value_counts(sort=False)
+    
+    def _roaming_surge_vector(self, config: CompiledConfig, business_type_keys: Tuple[np.ndarray, pd.Index],
+                              features: Dict[str, np.ndarray],
+                              prior_events: Dict[str, np.ndarray]) -> np.ndarray:
+        """整列计算国际漫游突增加成，规则同 _detect_international_roaming_surge"""
+        operation_time = features['time']
+        is_roaming = self._key_positions(pd.Index(['国际漫游']), business_type_keys) >= 0
+        
+        # 最近7天（含当前时刻）的国际漫游操作次数
+        roaming_events = EventWindowIndex(
+            np.concatenate([prior_events['roaming_times'], operation_time[is_roaming]])
+        )
+        recent_roaming = roaming_events.count_in_window(operation_time, timedelta(days=7))
+        hit = is_roaming & (recent_roaming > 3)
+        return np.where(hit, config.roaming_boost, 0.0)
+    
+    def _rapid_succession_vector(self, config: CompiledConfig, operator_keys: Tuple[np.ndarray, pd.Index],
+                                 features: Dict[str, np.ndarray],
+                                 prior_events: Dict[str, np.ndarray]) -> np.ndarray:
+        """整列计算快速连续操作加成，规则同 _detect_rapid_succession"""
+        operator_code, operators = operator_keys
+        # 此前数据块中的操作员映射到本批编码，本批未出现的操作员不影响结果
+        event_code = np.concatenate([operators.get_indexer(prior_events['operator_ids']), operator_code])
+        event_time = np.concatenate([prior_events['operator_times'], features['time']])
+        known = event_code >= 0
+        
+        # 同一操作员在 [t - 间隔, t) 内的其他操作次数，操作员缺失的行不计入
+        operator_events = EventWindowIndex(event_time[known], groups=event_code[known])
+        recent_operations = operator_events.count_in_window(
+            features['time'], config.rapid_interval, groups=operator_code, closed='left'
+        )
+        hit = recent_operations > 0
+        return np.where(hit, config.rapid_boost, 0.0)
+    
+    def _detect_anomalies_rowwise(self, current_data: pd.DataFrame) -> Dict[str, float]:
+        """
+        逐行参考实现，与 detect_anomalies 结果一致，用于校验列式引擎
         
         Args:
             current_data: 当前账单数据
@@ -104,28 +835,31 @@ class BillingAnomalyDetector:
         Returns:
             风险评分字典 {账单编号: 风险分数}
         """
-        logger.info("开始异常检测...")
-        
         risk_scores = {}
+        features = self._time_features(current_data)
+        operator_day_counts = self._build_operator_day_index(current_data['操作员ID'].to_numpy(), features['date'])
+        is_night = self._is_night_hour(features['hour'], *self.compiled_config.night_hours) & (features['hour'] >= 0)
+        night_day_counts = self._build_night_day_index(features['date'], is_night)
         
         for _, row in current_data.iterrows():
             bill_id = str(row['账单编号'])
             
             # 计算各维度的异常度
             amount_anomaly = self._calculate_amount_anomaly(row)
-            frequency_anomaly = self._calculate_frequency_anomaly(row, current_data)
+            frequency_anomaly = self._calculate_frequency_anomaly(row, current_data, operator_day_counts)
             time_anomaly = self._calculate_time_anomaly(row)
             operator_anomaly = self._calculate_operator_anomaly(row)
             
             # 特殊模式检测
-            special_pattern_boost = self._detect_special_patterns(row, current_data)
+            special_pattern_boost = self._detect_special_patterns(row, current_data, night_day_counts)
             
             # 计算综合风险评分
+            amount_weight, frequency_weight, time_weight, operator_weight = self.compiled_config.risk_weights
             risk_score = (
-                self.config['risk_weights']['amount_anomaly'] * amount_anomaly +
-                self.config['risk_weights']['frequency_anomaly'] * frequency_anomaly +
-                self.config['risk_weights']['time_anomaly'] * time_anomaly +
-                self.config['risk_weights']['operator_anomaly'] * operator_anomaly
+                amount_weight * amount_anomaly +
+                frequency_weight * frequency_anomaly +
+                time_weight * time_anomaly +
+                operator_weight * operator_anomaly
             )
             
             # 应用特殊模式加成
@@ -133,26 +867,23 @@ class BillingAnomalyDetector:
             
             risk_scores[bill_id] = risk_score
         
-        logger.info(f"异常检测完成，共检测 {len(risk_scores)} 条记录")
         return risk_scores
     
     def _calculate_amount_anomaly(self, row: pd.Series) -> float:
         """计算金额异常度"""
         amount = row['费用金额']
         business_type = row['业务类型']
-        bt_cfg = self._get_business_type_config(business_type)
-        # 优先用业务类型独立阈值
-        thresholds = bt_cfg.get('amount_thresholds', self.config['anomaly_thresholds']['amount'])
-        normal_range = bt_cfg.get('normal_amount_range', [0, float('inf')])
-        min_amount, max_amount = normal_range
+        # 业务类型独立阈值（未配置时为全局阈值）
+        config = self.compiled_config
+        min_amount, max_amount, low, medium, high = config.amount_params[config.business_type_code(business_type)]
         if amount < min_amount or amount > max_amount:
             deviation = abs(amount - (min_amount if amount < min_amount else max_amount)) / max(max_amount, 1)
             # 按阈值分级
-            if deviation >= thresholds.get('high', 0.8):
+            if deviation >= high:
                 return 1.0
-            elif deviation >= thresholds.get('medium', 0.5):
+            elif deviation >= medium:
                 return 0.7
-            elif deviation >= thresholds.get('low', 0.2):
+            elif deviation >= low:
                 return 0.4
             else:
                 return 0.1
@@ -169,18 +900,18 @@ class BillingAnomalyDetector:
         
         return 0.0
     
-    def _calculate_frequency_anomaly(self, row: pd.Series, data: pd.DataFrame) -> float:
+    def _calculate_frequency_anomaly(self, row: pd.Series, data: pd.DataFrame,
+                                     operator_day_counts: Optional[pd.Series] = None) -> float:
         """计算频率异常度"""
         operator_id = row['操作员ID']
         operation_time = row['操作时间']
         
-        # 计算当天该操作员的操作次数
-        same_day_operations = data[
-            (data['操作员ID'] == operator_id) &
-            (data['操作时间'].dt.date == operation_time.date())
-        ]
-        
-        daily_frequency = len(same_day_operations)
+        # 查询当天该操作员的操作次数（未传入索引时按 data 现建）
+        if operator_day_counts is None:
+            operator_day_counts = self._build_operator_day_index(
+                data['操作员ID'].to_numpy(), self._time_features(data)['date']
+            )
+        daily_frequency = operator_day_counts.get((operator_id, operation_time.normalize()), 0)
         
         # 与基线比较
         if operator_id in self.operator_baselines:
@@ -192,9 +923,10 @@ class BillingAnomalyDetector:
                     return min(1.0, (frequency_ratio - 1.5) / 2.0)
         
         # 与业务类型基线比较
-        business_type = row['业务类型']
-        if business_type in self.config['business_types']:
-            normal_frequency = self.config['business_types'][business_type]['normal_frequency_per_day']
+        config = self.compiled_config
+        business_type_code = config.business_type_code(row['业务类型'])
+        if business_type_code >= 0:
+            normal_frequency = config.normal_frequency[business_type_code]
             
             if daily_frequency > normal_frequency * 2:
                 return min(1.0, (daily_frequency - normal_frequency * 2) / normal_frequency)
@@ -208,9 +940,7 @@ class BillingAnomalyDetector:
         is_weekend = operation_time.weekday() >= 5
         
         # 检查是否在营业时间外
-        business_hours = self.config['time_patterns']['business_hours']
-        start_hour = int(business_hours['start'].split(':')[0])
-        end_hour = int(business_hours['end'].split(':')[0])
+        start_hour, end_hour = self.compiled_config.business_hours
         
         if operation_hour < start_hour or operation_hour > end_hour:
             # 非营业时间操作
@@ -223,7 +953,7 @@ class BillingAnomalyDetector:
             
             # 周末加成
             if is_weekend:
-                time_anomaly *= self.config['time_patterns']['weekend_multiplier']
+                time_anomaly *= self.compiled_config.weekend_multiplier
             
             return time_anomaly
         
@@ -260,49 +990,43 @@ class BillingAnomalyDetector:
         
         return 0.0
     
-    def _detect_special_patterns(self, row: pd.Series, data: pd.DataFrame) -> float:
+    def _detect_special_patterns(self, row: pd.Series, data: pd.DataFrame,
+                                 night_day_counts: Optional[pd.Series] = None) -> float:
         """检测特殊异常模式"""
-        business_type = row['业务类型']
-        bt_cfg = self._get_business_type_config(business_type)
+        config = self.compiled_config
+        # 业务类型特殊规则优先，未配置时取全局规则开关
+        night_enabled, roaming_enabled, rapid_enabled = \
+            config.rule_switches[config.business_type_code(row['业务类型'])]
         boost = 0.0
-        # 业务类型特殊规则优先
-        special_rules = bt_cfg.get('special_rules', {})
-        # 全局规则
-        global_rules = self.config.get('special_patterns', {})
         # 夜间高流量
-        if special_rules.get('night_high_traffic', global_rules.get('night_high_traffic', {}).get('enabled', False)):
-            boost += self._detect_night_high_traffic(row, data)
+        if night_enabled:
+            boost += self._detect_night_high_traffic(row, data, night_day_counts)
         # 国际漫游突增
-        if special_rules.get('roaming_surge', global_rules.get('international_roaming_surge', {}).get('enabled', False)):
+        if roaming_enabled:
             boost += self._detect_international_roaming_surge(row, data)
         # 快速连续操作
-        if special_rules.get('rapid_succession', global_rules.get('rapid_succession', {}).get('enabled', False)):
+        if rapid_enabled:
             boost += self._detect_rapid_succession(row, data)
         return boost
     
-    def _detect_night_high_traffic(self, row: pd.Series, data: pd.DataFrame) -> float:
+    def _detect_night_high_traffic(self, row: pd.Series, data: pd.DataFrame,
+                                   night_day_counts: Optional[pd.Series] = None) -> float:
         """检测夜间高流量模式"""
         operation_time = row['操作时间']
-        night_hours = self.config['time_patterns']['night_hours']
-        start_hour = int(night_hours['start'].split(':')[0])
-        end_hour = int(night_hours['end'].split(':')[0])
+        start_hour, end_hour = self.compiled_config.night_hours
         
         # 检查是否在夜间时段
-        is_night = False
-        if start_hour > end_hour:  # 跨日夜间时段
-            is_night = operation_time.hour >= start_hour or operation_time.hour <= end_hour
-        else:
-            is_night = start_hour <= operation_time.hour <= end_hour
-        
-        if is_night:
-            # 检查夜间操作频率
-            night_operations = data[
-                (data['操作时间'].dt.date == operation_time.date()) &
-                ((data['操作时间'].dt.hour >= start_hour) | (data['操作时间'].dt.hour <= end_hour))
-            ]
+        if self._is_night_hour(operation_time.hour, start_hour, end_hour):
+            # 检查当天夜间操作频率（未传入日期索引时按 data 现建）
+            if night_day_counts is None:
+                hour = data['操作时间'].dt.hour
+                night_day_counts = self._build_night_day_index(
+                    data['操作时间'].dt.normalize().to_numpy(),
+                    self._is_night_hour(hour, start_hour, end_hour).to_numpy()
+                )
             
-            if len(night_operations) > 5:  # 夜间操作超过5次
-                return self.config['special_patterns']['night_high_traffic']['risk_boost']
+            if night_day_counts.get(operation_time.normalize(), 0) > 5:  # 夜间操作超过5次
+                return self.compiled_config.night_boost
         
         return 0.0
     
@@ -320,7 +1044,7 @@ class BillingAnomalyDetector:
             ]
             
             if len(recent_roaming) > 3:  # 一周内国际漫游超过3次
-                return self.config['special_patterns']['international_roaming_surge']['risk_boost']
+                return self.compiled_config.roaming_boost
         
         return 0.0
     
@@ -328,64 +1052,57 @@ class BillingAnomalyDetector:
         """检测快速连续操作"""
         operation_time = row['操作时间']
         operator_id = row['操作员ID']
-        min_interval = self.config['special_patterns']['rapid_succession']['min_interval_seconds']
+        min_interval = self.compiled_config.rapid_interval
         
         # 检查同一操作员在短时间内是否有其他操作
         recent_operations = data[
             (data['操作员ID'] == operator_id) &
             (data['操作时间'] < operation_time) &
-            (data['操作时间'] >= operation_time - timedelta(seconds=min_interval))
+            (data['操作时间'] >= operation_time - min_interval)
         ]
         
         if len(recent_operations) > 0:
-            return self.config['special_patterns']['rapid_succession']['risk_boost']
+            return self.compiled_config.rapid_boost
         
         return 0.0
     
-    def get_high_risk_records(self, risk_scores: Dict[str, float], 
+    def get_high_risk_records(self, risk_scores: RiskResult, 
                             threshold: float = 0.7) -> List[Tuple[str, float]]:
         """
         获取高风险记录
         
         Args:
-            risk_scores: 风险评分字典
+            risk_scores: 评分结果（也接受风险评分字典），重复的账单编号只列出一次
             threshold: 高风险阈值
             
         Returns:
             高风险记录列表 [(账单编号, 风险评分)]
         """
-        high_risk = [(bill_id, score) for bill_id, score in risk_scores.items() 
-                    if score >= threshold]
-        high_risk.sort(key=lambda x: x[1], reverse=True)
-        return high_risk
+        return RiskResult.from_scores(risk_scores).deduplicated().high_risk_records(threshold)
     
     def generate_anomaly_summary(self, data: pd.DataFrame, 
-                               risk_scores: Dict[str, float]) -> Dict[str, Any]:
+                               risk_scores: RiskResult) -> Dict[str, Any]:
         """
         生成异常检测摘要
         
         Args:
             data: 账单数据
-            risk_scores: 风险评分字典
+            risk_scores: 评分结果（也接受风险评分字典），重复的账单编号只计一次
             
         Returns:
             检测摘要字典
         """
-        total_records = len(data)
-        risk_values = list(risk_scores.values())
+        result = RiskResult.from_scores(risk_scores).deduplicated()
+        risk_distribution = result.band_counts()
         
         summary = {
-            'total_records': total_records,
-            'high_risk_count': sum(1 for score in risk_values if score >= 0.7),
-            'medium_risk_count': sum(1 for score in risk_values if 0.3 <= score < 0.7),
-            'low_risk_count': sum(1 for score in risk_values if score < 0.3),
-            'avg_risk_score': np.mean(risk_values),
-            'max_risk_score': np.max(risk_values),
-            'risk_distribution': {
-                '0-0.3': sum(1 for score in risk_values if score < 0.3),
-                '0.3-0.7': sum(1 for score in risk_values if 0.3 <= score < 0.7),
-                '0.7-1.0': sum(1 for score in risk_values if score >= 0.7)
-            }
+            'total_records': len(data),
+            'high_risk_count': risk_distribution['0.7-1.0'],
+            'medium_risk_count': risk_distribution['0.3-0.7'],
+            'low_risk_count': risk_distribution['0-0.3'],
+            'avg_risk_score': np.mean(result.risk_score),
+            'max_risk_score': np.max(result.risk_score),
+            'risk_distribution': risk_distribution
         }
         
         return summary
@@ -396,14 +1113,14 @@ class BillingAnomalyDetector:
         Args:
             config_path: 可选，新的配置文件路径
         """
-        if config_path:
-            self.config = self._load_config(config_path)
-        else:
-            self.config = self._load_config(self.config_path)
-        logger.info(f"配置文件已热更新: {config_path or self.config_path}")
+        config_path = config_path or self.config_path
+        # 先完成解析和编译，再以单次赋值替换，评分线程不会读到半更新的配置
+        self.compiled_config = self._load_config(config_path)
+        self.config_path = config_path
+        logger.info(f"配置文件已热更新: {config_path}")
 
     def _get_business_type_config(self, business_type: str) -> dict:
         """
         获取业务类型的独立配置（含阈值和特殊规则）
         """
-        return self.config['business_types'].get(business_type, {})
\ No newline at end of file
+        return self.compiled_config.raw['business_types'].get(business_type, {})
\ No newline at end of file
@@ -0,0 +1,195 @@
+"""
+分组聚合模块
+按操作员、业务类型、营业厅等键对同一份数据只分组一次，缓存分组编码和各列统计量，
+供解析器统计、检测器基线和可视化共用；数据替换后缓存自动失效
+"""
+
+import pandas as pd
+import numpy as np
+from typing import Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 按时间类型聚合的列（只统计 size、count、min、max）
+DATETIME_COLUMNS = ('账单日期', '操作时间')
+
+
+class AggregateCache:
+    """一份账单数据上的分组聚合缓存"""
+
+    def __init__(self, data: Optional[pd.DataFrame] = None):
+        """
+        初始化聚合缓存
+
+        Args:
+            data: 账单数据；数据原地修改后需调用 invalidate()，整体替换时赋值给 data 即可
+        """
+        self._data = data
+        self._groups = {}
+        self._column_stats = {}
+        self._crosstabs = {}
+
+    @property
+    def data(self) -> Optional[pd.DataFrame]:
+        return self._data
+
+    @data.setter
+    def data(self, data: Optional[pd.DataFrame]) -> None:
+        if data is not self._data:
+            self._data = data
+            self.invalidate()
+
+    def invalidate(self) -> None:
+        """清空全部缓存"""
+        self._groups.clear()
+        self._column_stats.clear()
+        self._crosstabs.clear()
+
+    def group_codes(self, key: str) -> Tuple[np.ndarray, pd.Index]:
+        """
+        取分组编码（按首次出现顺序编号，键缺失为 -1）
+
+        Args:
+            key: 分组列名
+
+        Returns:
+            (与数据行对齐的分组编码, 各组的键)
+        """
+        return self._grouping(key)[:2]
+
+    def column_stats(self, key: str, column: str) -> pd.DataFrame:
+        """
+        按键分组统计一列
+
+        Args:
+            key: 分组列名（如 操作员ID、业务类型、营业厅编号）
+            column: 统计列名，数值列不能转换的值视为缺失
+
+        Returns:
+            以键为索引的统计表：size（行数）、count（非缺失值数）、sum、mean、std（样本标准差）、min、max；
+            时间列只有 size、count、min、max
+        """
+        cache_key = (key, column)
+        if cache_key not in self._column_stats:
+            if column in DATETIME_COLUMNS:
+                self._column_stats[cache_key] = self._datetime_stats(key, column)
+            else:
+                values = pd.to_numeric(self._require_data()[column], errors='coerce')
+                self._column_stats[cache_key] = self.value_stats(key, values.to_numpy(dtype=np.float64))
+        return self._column_stats[cache_key]
+
+    def value_stats(self, key: str, values: np.ndarray) -> pd.DataFrame:
+        """
+        按键分组统计与数据行对齐的外部数值（如风险评分），复用分组编码，结果不缓存
+
+        Args:
+            key: 分组列名
+            values: 与数据行对齐的数值，NaN 视为缺失
+
+        Returns:
+            与 column_stats 相同结构的统计表
+        """
+        codes, keys, order, starts = self._grouping(key)
+        values = np.asarray(values, dtype=np.float64)
+        groups = len(keys)
+        valid = (codes >= 0) & ~np.isnan(values)
+        size = np.bincount(codes[codes >= 0], minlength=groups)
+        count = np.bincount(codes[valid], minlength=groups)
+        total = np.bincount(codes[valid], weights=values[valid], minlength=groups)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count > 0, total / count, np.nan)
+            # 两遍法计算离差平方和，避免大数相减的精度损失
+            deviation = values[valid] - mean[codes[valid]]
+            m2 = np.bincount(codes[valid], weights=deviation * deviation, minlength=groups)
+            std = np.where(count > 1, np.sqrt(m2 / (count - 1)), np.nan)
+
+        if groups:
+            sorted_values = values[order]
+            minimum = np.fmin.reduceat(sorted_values, starts[:-1])
+            maximum = np.fmax.reduceat(sorted_values, starts[:-1])
+        else:
+            minimum = maximum = np.empty(0)
+
+        return pd.DataFrame({
+            'size': size, 'count': count, 'sum': np.where(count > 0, total, 0.0),
+            'mean': mean, 'std': std, 'min': minimum, 'max': maximum,
+        }, index=keys)
+
+    def split(self, key: str, values: np.ndarray) -> Dict[object, np.ndarray]:
+        """
+        将与数据行对齐的数组按键拆分，各组内保持原行顺序
+
+        Args:
+            key: 分组列名
+            values: 与数据行对齐的数组
+
+        Returns:
+            {键: 该组的值}，按键首次出现的顺序排列
+        """
+        _, keys, order, starts = self._grouping(key)
+        grouped = np.asarray(values)[order]
+        return {keys[i]: grouped[starts[i]:starts[i + 1]] for i in range(len(keys))}
+
+    def crosstab(self, key: str, other: str) -> Tuple[np.ndarray, pd.Index]:
+        """
+        两个键的频数交叉表
+
+        Args:
+            key: 行键列名
+            other: 列键列名
+
+        Returns:
+            (形状为 (行键数, 列键数) 的计数矩阵, 列键)
+        """
+        cache_key = (key, other)
+        if cache_key not in self._crosstabs:
+            codes, keys = self.group_codes(key)
+            other_codes, other_keys = self.group_codes(other)
+            valid = (codes >= 0) & (other_codes >= 0)
+            counts = np.bincount(
+                codes[valid] * len(other_keys) + other_codes[valid],
+                minlength=len(keys) * len(other_keys)
+            ).reshape(len(keys), len(other_keys))
+            self._crosstabs[cache_key] = (counts, other_keys)
+        return self._crosstabs[cache_key]
+
+    def _require_data(self) -> pd.DataFrame:
+        if self._data is None:
+            raise ValueError("数据未加载")
+        return self._data
+
+    def _grouping(self, key: str) -> Tuple[np.ndarray, pd.Index, np.ndarray, np.ndarray]:
+        """分组编码、键、按组排列的行号及各组起点（末尾为总数）"""
+        if key not in self._groups:
+            codes, keys = pd.factorize(self._require_data()[key])
+            codes = codes.astype(np.int64)
+            order = np.argsort(codes, kind='stable')
+            order = order[codes[order] >= 0]
+            starts = np.searchsorted(codes[order], np.arange(len(keys) + 1))
+            self._groups[key] = (codes, pd.Index(keys), order, starts)
+        return self._groups[key]
+
+    def _datetime_stats(self, key: str, column: str) -> pd.DataFrame:
+        """时间列按组统计最早、最晚时间"""
+        codes, keys, order, starts = self._grouping(key)
+        values = pd.to_datetime(self._require_data()[column]).to_numpy(dtype='datetime64[ns]')
+        valid = (codes >= 0) & ~np.isnat(values)
+        ticks = values.view(np.int64)[order]
+        missing = np.isnat(values[order])
+
+        if len(keys):
+            # NaT 在 int64 下为最小值，求最小值前换成最大值
+            minimum = np.minimum.reduceat(np.where(missing, np.iinfo(np.int64).max, ticks), starts[:-1])
+            maximum = np.maximum.reduceat(ticks, starts[:-1])
+        else:
+            minimum = maximum = np.empty(0, dtype=np.int64)
+
+        count = np.bincount(codes[valid], minlength=len(keys))
+        return pd.DataFrame({
+            'size': np.bincount(codes[codes >= 0], minlength=len(keys)),
+            'count': count,
+            'min': np.where(count > 0, minimum, np.iinfo(np.int64).min).view('datetime64[ns]'),
+            'max': maximum.view('datetime64[ns]'),
+        }, index=keys)
@@ -0,0 +1,207 @@
+"""
+基线快照模块
+将操作员和业务类型基线按列保存为 NumPy 数组目录加清单文件，加载时还原为基线字典，无需重新聚合历史数据
+"""
+
+import pandas as pd
+import numpy as np
+from typing import Any, Dict, List, Optional
+import os
+import json
+import shutil
+import hashlib
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# 快照结构版本，数组布局变化时递增
+SNAPSHOT_SCHEMA_VERSION = 1
+
+MANIFEST_FILE = 'manifest.json'
+
+# 每个基线表按列保存的标量统计量
+SCALAR_FIELDS = ['count', 'active_days', 'avg_amount', 'std_amount', 'avg_frequency_per_day']
+
+# 每个基线表按列保存的日期字段（早期快照没有 first_date）
+DATE_FIELDS = ['first_date', 'last_date']
+
+
+def config_fingerprint(config: Dict) -> str:
+    """
+    计算配置指纹
+
+    Args:
+        config: 检测器配置字典
+
+    Returns:
+        配置规范化JSON的SHA-256摘要
+    """
+    canonical = json.dumps(config, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def save_baseline_snapshot(path: str,
+                           tables: Dict[str, Dict[Any, Dict[str, Any]]],
+                           config: Dict) -> None:
+    """
+    保存基线快照
+
+    先写入临时目录再整体替换，读取方不会看到写了一半的快照。
+    同一张表中整数键与字符串键混用时抛出 ValueError。
+
+    Args:
+        path: 快照目录
+        tables: {表名: {键: 基线字典}}，如 operators、pending_operators、business_types
+        config: 生成基线时使用的配置
+    """
+    # 先转换全部基线表，键类型不一致时不留下临时目录
+    table_arrays = {name: _baselines_to_arrays(baselines) for name, baselines in tables.items()}
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    manifest = {
+        'schema_version': SNAPSHOT_SCHEMA_VERSION,
+        'config_fingerprint': config_fingerprint(config),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'tables': {}
+    }
+    for name, arrays in table_arrays.items():
+        for column, array in arrays.items():
+            np.save(os.path.join(tmp_path, f"{name}.{column}.npy"), array, allow_pickle=False)
+        manifest['tables'][name] = {'rows': len(arrays['keys']), 'columns': sorted(arrays)}
+
+    with open(os.path.join(tmp_path, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    if os.path.exists(path):
+        old_path = f"{path}.old-{os.getpid()}"
+        os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+    else:
+        os.replace(tmp_path, path)
+    logger.info(f"基线快照已保存: {path}")
+
+
+def load_baseline_snapshot(path: str,
+                           config: Optional[Dict] = None) -> Dict[str, Dict[Any, Dict[str, Any]]]:
+    """
+    加载基线快照
+
+    数组读入后即还原为 {键: 基线字典}，加载耗时与基线条数成正比。
+
+    Args:
+        path: 快照目录
+        config: 当前配置，提供时校验配置指纹
+
+    Returns:
+        {表名: {键: 基线字典}}
+    """
+    manifest = read_snapshot_manifest(path)
+    if manifest.get('schema_version') != SNAPSHOT_SCHEMA_VERSION:
+        raise ValueError(
+            f"基线快照版本不匹配: {manifest.get('schema_version')}，当前支持 {SNAPSHOT_SCHEMA_VERSION}"
+        )
+    if config is not None and manifest.get('config_fingerprint') != config_fingerprint(config):
+        raise ValueError("基线快照的配置指纹与当前配置不一致，请重新构建基线")
+
+    tables = {}
+    for name, table in manifest['tables'].items():
+        arrays = {
+            column: np.load(os.path.join(path, f"{name}.{column}.npy"), allow_pickle=False)
+            for column in table['columns']
+        }
+        tables[name] = _arrays_to_baselines(arrays)
+
+    logger.info(f"基线快照已加载: {path}")
+    return tables
+
+
+def read_snapshot_manifest(path: str) -> Dict:
+    """读取快照清单"""
+    with open(os.path.join(path, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _baselines_to_arrays(baselines: Dict[Any, Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """将 {键: 基线字典} 转为按列对齐的数组"""
+    values = list(baselines.values())
+    arrays = {'keys': _key_array(list(baselines.keys()))}
+
+    for field in SCALAR_FIELDS:
+        arrays[field] = np.asarray([v.get(field, np.nan) for v in values], dtype=np.float64)
+    for field in DATE_FIELDS:
+        arrays[field] = np.asarray(
+            [v.get(field, pd.NaT) for v in values], dtype='datetime64[ns]'
+        ).reshape(len(values))
+
+    # 小时分布：n × 24 矩阵
+    hourly = np.zeros((len(values), 24))
+    for i, v in enumerate(values):
+        for hour, count in v.get('hourly_distribution', {}).items():
+            hourly[i, int(hour)] = count
+    arrays['hourly_distribution'] = hourly
+
+    # 业务类型构成：n × 业务类型数 矩阵，列标签单独保存
+    if any('business_type_distribution' in v for v in values):
+        labels = sorted({k for v in values for k in v.get('business_type_distribution', {})}, key=str)
+        column_of = {label: j for j, label in enumerate(labels)}
+        mix = np.zeros((len(values), len(labels)))
+        for i, v in enumerate(values):
+            for label, count in v.get('business_type_distribution', {}).items():
+                mix[i, column_of[label]] = count
+        arrays['business_type_labels'] = _key_array(labels)
+        arrays['business_type_distribution'] = mix
+
+    return arrays
+
+
+def _arrays_to_baselines(arrays: Dict[str, np.ndarray]) -> Dict[Any, Dict[str, Any]]:
+    """将按列对齐的数组还原为 {键: 基线字典}"""
+    keys = arrays['keys'].tolist()
+    scalars = {field: arrays[field].tolist() for field in SCALAR_FIELDS}
+    dates = {field: pd.DatetimeIndex(arrays[field]) for field in DATE_FIELDS if field in arrays}
+    hourly = np.asarray(arrays['hourly_distribution'])
+    mix = arrays.get('business_type_distribution')
+    labels = arrays['business_type_labels'].tolist() if mix is not None else []
+
+    baselines = {}
+    for i, key in enumerate(keys):
+        baseline = {field: scalars[field][i] for field in SCALAR_FIELDS}
+        baseline['count'] = _restore_number(baseline['count'])
+        for field, values in dates.items():
+            baseline[field] = values[i]
+        baseline['hourly_distribution'] = {
+            int(h): _restore_number(hourly[i, h]) for h in np.flatnonzero(hourly[i])
+        }
+        if mix is not None:
+            row = np.asarray(mix[i])
+            baseline['business_type_distribution'] = {
+                labels[j]: _restore_number(row[j]) for j in np.flatnonzero(row)
+            }
+        baselines[key] = baseline
+    return baselines
+
+
+def _key_array(keys: List[Any]) -> np.ndarray:
+    """
+    键数组：整数键保存为整数，字符串键保存为定长字符串（不依赖 pickle）
+
+    同一张表中整数键与字符串键混用、或出现其他类型的键时抛出 ValueError，
+    避免键被统一转为字符串后加载的基线与数据中的键不再匹配。
+    """
+    if all(isinstance(k, (int, np.integer)) and not isinstance(k, (bool, np.bool_)) for k in keys) and keys:
+        return np.asarray(keys, dtype=np.int64).reshape(len(keys))
+    if all(isinstance(k, str) for k in keys):
+        return np.asarray(keys, dtype=str).reshape(len(keys))
+    key_types = sorted({type(k).__name__ for k in keys})
+    raise ValueError(f"基线键类型不一致，无法保存快照: {key_types}（整数键与字符串键不能混用）")
+
+
+def _restore_number(value: float):
+    """整数值还原为 int，与 build_baseline 直接生成的计数保持相同类型"""
+    value = float(value)
+    return int(value) if value.is_integer() else value
@@ -0,0 +1,103 @@
+"""
+账单数据紧凑类型模块
+按统一的列类型表将清洗后的账单数据转为紧凑表示：关键列为分类编码，金额为 float32
+"""
+
+import pandas as pd
+import numpy as np
+from typing import Any, Dict, Iterable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 紧凑表示的列类型表
+BILL_SCHEMA = {
+    '营业厅编号': 'category',
+    '操作员ID': 'category',
+    '业务类型': 'category',
+    '费用金额': 'float32',
+    '优惠金额': 'float32',
+    '实收金额': 'float32',
+}
+
+CATEGORY_COLUMNS = [column for column, dtype in BILL_SCHEMA.items() if dtype == 'category']
+
+
+def build_category_dictionary(frames: Iterable[pd.DataFrame]) -> Dict[str, pd.Index]:
+    """
+    汇总多个数据块中分类列的全部取值，得到统一的类别表
+
+    Args:
+        frames: 账单数据块
+
+    Returns:
+        {列名: 排序后的类别}
+    """
+    values = {column: set() for column in CATEGORY_COLUMNS}
+    for frame in frames:
+        for column in CATEGORY_COLUMNS:
+            if column not in frame.columns:
+                continue
+            series = frame[column]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                values[column].update(series.cat.categories)
+            else:
+                values[column].update(series.dropna().unique())
+    return {column: pd.Index(sorted(found, key=str)) for column, found in values.items()}
+
+
+def apply_bill_schema(data: pd.DataFrame,
+                      categories: Optional[Dict[str, pd.Index]] = None) -> pd.DataFrame:
+    """
+    将账单数据转为紧凑类型
+
+    Args:
+        data: 清洗后的账单数据
+        categories: 可选，统一的类别表（见 build_category_dictionary），
+                    多个数据块使用同一类别表时分类编码可直接比较和拼接；
+                    不在类别表中的取值记为缺失
+
+    Returns:
+        转换后的新数据框
+    """
+    categories = categories or build_category_dictionary([data])
+    columns = {}
+    for column, dtype in BILL_SCHEMA.items():
+        if column not in data.columns:
+            continue
+        if dtype == 'category':
+            converted = data[column].astype(pd.CategoricalDtype(categories[column]))
+            unknown = int((converted.isna() & data[column].notna()).sum())
+            if unknown:
+                logger.warning(f"{column} 有 {unknown} 个取值不在类别表中，已记为缺失")
+            columns[column] = converted
+        else:
+            columns[column] = pd.to_numeric(data[column], errors='coerce').astype(dtype)
+    return data.assign(**columns)
+
+
+def memory_usage_report(before: pd.DataFrame, after: pd.DataFrame) -> Dict[str, Any]:
+    """
+    比较两种表示的内存占用
+
+    Args:
+        before: 转换前的数据
+        after: 转换后的数据
+
+    Returns:
+        包含转换前后总字节数、压缩倍数和各列字节数的字典
+    """
+    before_usage = before.memory_usage(deep=True, index=False)
+    after_usage = after.memory_usage(deep=True, index=False)
+    before_bytes = int(before_usage.sum())
+    after_bytes = int(after_usage.sum())
+    return {
+        'before_bytes': before_bytes,
+        'after_bytes': after_bytes,
+        'reduction_ratio': before_bytes / after_bytes if after_bytes else np.nan,
+        'columns': {
+            column: {'before_bytes': int(before_usage.get(column, 0)),
+                     'after_bytes': int(after_usage.get(column, 0))}
+            for column in after_usage.index
+        }
+    }
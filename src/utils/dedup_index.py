@@ -0,0 +1,144 @@
+"""
+账单去重索引模块
+以账单编号的 64 位哈希构成有序数组，持久化为 .npy 文件，跨文件、跨批次识别重复导出的账单
+"""
+
+import pandas as pd
+import numpy as np
+from typing import Any, Optional
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def hash_bill_ids(bill_ids: Any) -> np.ndarray:
+    """
+    计算账单编号的 64 位哈希（编号统一按文本处理，Excel 中的数字编号与 CSV 中的文本编号一致）
+
+    Args:
+        bill_ids: 账单编号序列
+
+    Returns:
+        uint64 哈希数组，与输入对齐
+    """
+    text = pd.Series(bill_ids, copy=False).astype(str)
+    # 账单编号基本不重复，不先做分类编码
+    return pd.util.hash_array(text.to_numpy(dtype=object), categorize=False)
+
+
+class BillIdIndex:
+    """已入库账单编号的持久化索引"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        初始化去重索引
+
+        Args:
+            path: 索引文件路径（.npy），文件已存在时以只读内存映射方式加载
+        """
+        self.path = path
+        self.last_report = None
+        if path is not None and os.path.exists(path):
+            self._hashes = np.load(path, mmap_mode='r')
+            logger.info(f"加载账单去重索引: {path}，共 {len(self._hashes)} 个账单编号")
+        else:
+            self._hashes = np.empty(0, dtype=np.uint64)
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def contains(self, bill_ids: Any) -> np.ndarray:
+        """
+        判断账单编号是否已入库
+
+        Args:
+            bill_ids: 账单编号序列
+
+        Returns:
+            与输入对齐的布尔数组
+        """
+        return self._contains_hashes(hash_bill_ids(bill_ids))
+
+    def add(self, bill_ids: Any) -> int:
+        """
+        将账单编号加入索引
+
+        Args:
+            bill_ids: 账单编号序列
+
+        Returns:
+            新加入的编号数
+        """
+        return self._add_hashes(hash_bill_ids(bill_ids))
+
+    def filter_new(self, data: pd.DataFrame, column: str = '账单编号', add: bool = True) -> pd.DataFrame:
+        """
+        去掉已入库的账单和本批内重复的账单（保留首次出现），并把新账单编号加入索引
+
+        去重结果记录在 last_report：total（输入行数）、duplicate_in_batch（批内重复）、
+        seen_before（此前已入库）、dropped（共去掉的行数）
+
+        Args:
+            data: 账单数据
+            column: 账单编号列名
+            add: 是否将保留下来的账单编号加入索引
+
+        Returns:
+            去重后的数据，保留原行索引
+        """
+        hashes = hash_bill_ids(data[column])
+        duplicate_in_batch = pd.Series(hashes, copy=False).duplicated().to_numpy()
+        seen_before = self._contains_hashes(hashes) & ~duplicate_in_batch
+        keep = ~(duplicate_in_batch | seen_before)
+
+        self.last_report = {
+            'total': len(data),
+            'duplicate_in_batch': int(duplicate_in_batch.sum()),
+            'seen_before': int(seen_before.sum()),
+            'dropped': int(len(data) - keep.sum()),
+        }
+        if self.last_report['dropped']:
+            logger.info(
+                f"账单去重: 去掉 {self.last_report['dropped']} 条（批内重复 "
+                f"{self.last_report['duplicate_in_batch']} 条，此前已入库 {self.last_report['seen_before']} 条）"
+            )
+        if add:
+            self._insert_sorted(np.sort(hashes[keep]))
+        return data[keep] if not keep.all() else data
+
+    def save(self, path: Optional[str] = None) -> None:
+        """
+        保存索引（先写临时文件再替换，读取方不会看到写了一半的索引）
+
+        Args:
+            path: 索引文件路径，默认为初始化时的路径
+        """
+        path = path or self.path
+        if path is None:
+            raise ValueError("未指定索引文件路径")
+        tmp_path = f"{path}.tmp-{os.getpid()}.npy"
+        np.save(tmp_path, np.ascontiguousarray(self._hashes))
+        os.replace(tmp_path, path)
+        self.path = path
+        logger.info(f"账单去重索引已保存: {path}，共 {len(self._hashes)} 个账单编号")
+
+    def _contains_hashes(self, hashes: np.ndarray) -> np.ndarray:
+        """在有序哈希数组上二分查找"""
+        if len(self._hashes) == 0:
+            return np.zeros(len(hashes), dtype=bool)
+        positions = np.searchsorted(self._hashes, hashes)
+        positions[positions == len(self._hashes)] = 0
+        return self._hashes[positions] == hashes
+
+    def _add_hashes(self, hashes: np.ndarray) -> int:
+        """合并新哈希并保持数组有序、无重复"""
+        new = np.unique(hashes)
+        new = new[~self._contains_hashes(new)]
+        self._insert_sorted(new)
+        return len(new)
+
+    def _insert_sorted(self, new: np.ndarray) -> None:
+        """将有序且不在索引中的哈希插入有序数组，不重新排序已有部分"""
+        if len(new):
+            self._hashes = np.insert(self._hashes, np.searchsorted(self._hashes, new), new)
@@ -1,49 +1,246 @@
 """
 Excel处理模块
-用于解析和处理营业厅账单Excel文件
+用于解析和处理营业厅账单Excel文件（也支持同样列结构的 CSV 和 Arrow IPC 导出文件）
 """
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+import os
+import glob
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from openpyxl import load_workbook
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from pandas.api.types import union_categoricals
 from datetime import datetime, time
 
+try:
+    from .parse_cache import ParseCache
+    from .bill_schema import CATEGORY_COLUMNS, apply_bill_schema, memory_usage_report
+    from .time_parsing import parse_datetime_column
+    from .export_writer import export_bills
+    from .aggregates import AggregateCache
+    from .dedup_index import BillIdIndex
+except ImportError:  # 以 utils 目录为搜索路径直接导入 excel_parser 时
+    from parse_cache import ParseCache
+    from bill_schema import CATEGORY_COLUMNS, apply_bill_schema, memory_usage_report
+    from time_parsing import parse_datetime_column
+    from export_writer import export_bills
+    from aggregates import AggregateCache
+    from dedup_index import BillIdIndex
+
 logger = logging.getLogger(__name__)
 
+# 解析器版本：读取或清洗规则变化时递增，使旧的解析缓存失效
+PARSER_VERSION = '4'
+
+# 按扩展名区分的账单文件格式
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm', '.xls')
+CSV_EXTENSIONS = ('.csv',)
+ARROW_EXTENSIONS = ('.arrow', '.feather', '.ipc')
+BILL_FILE_EXTENSIONS = EXCEL_EXTENSIONS + CSV_EXTENSIONS + ARROW_EXTENSIONS
+
+# CSV 中按文本读取的列，避免带前导零的编号被推断为整数
+TEXT_COLUMNS = ['账单编号', '营业厅编号', '操作员ID', '业务类型']
+
+# 多工作表合并时标记数据来源工作表的列
+SHEET_COLUMN = '来源工作表'
+
 
 class ExcelParser:
-    """Excel文件解析器"""
+    """账单文件解析器（Excel，以及同样列结构的 CSV 和 Arrow IPC 文件）"""
     
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, cache: Optional[ParseCache] = None,
+                 encoding: str = 'utf-8', sheet_name: Union[int, str] = 0):
         """
         初始化Excel解析器
         
         Args:
-            file_path: Excel文件路径
+            file_path: 账单文件路径，按扩展名识别 Excel、CSV 或 Arrow IPC 格式
+            cache: 可选，解析缓存，同一文件再次加载时直接读取缓存
+            encoding: CSV 文件编码（如 gbk）
+            sheet_name: 读取的工作表名称或序号，默认第一个工作表
         """
         self.file_path = file_path
+        self.cache = cache
+        # 原始数据的缓存键及对应数据，清洗时据此判断能否使用清洗结果缓存
+        self._raw_cache_key = None
+        self._raw_data = None
+        self.encoding = encoding
+        self.sheet_name = sheet_name
+        self.aggregates = AggregateCache()
         self.data = None
+        self.memory_report = None
+        self.dedup_report = None
         self.required_columns = [
             '账单编号', '营业厅编号', '账单日期', '操作员ID',
             '业务类型', '费用金额', '优惠金额', '实收金额', '操作时间'
         ]
     
+    @property
+    def data(self) -> Optional[pd.DataFrame]:
+        """当前数据，替换时聚合缓存随之失效"""
+        return self._data
+    
+    @data.setter
+    def data(self, data: Optional[pd.DataFrame]) -> None:
+        self._data = data
+        self.aggregates.data = data
+    
     def load_data(self) -> pd.DataFrame:
         """
-        加载Excel数据
+        加载账单数据
+        
+        CSV 和 Arrow IPC 文件由 pyarrow 多线程读取，之后的列验证和清洗与 Excel 相同。
         
         Returns:
             包含账单数据的DataFrame
         """
         try:
-            self.data = pd.read_excel(self.file_path)
-            logger.info(f"成功加载Excel文件: {self.file_path}")
+            if self.cache is not None:
+                key = self.cache.key_for(self.file_path, PARSER_VERSION, stage='raw',
+                                         encoding=self.encoding, sheet_name=self.sheet_name)
+                cached = self.cache.get(key)
+                if cached is not None:
+                    self.data = cached
+                    self._raw_cache_key, self._raw_data = key, self.data
+                    logger.info(f"从解析缓存加载Excel文件: {self.file_path}")
+                    return self.data
+            
+            extension = os.path.splitext(self.file_path)[1].lower()
+            if extension in CSV_EXTENSIONS:
+                self.data = self._read_csv()
+            elif extension in ARROW_EXTENSIONS:
+                self.data = self._read_arrow()
+            else:
+                self.data = pd.read_excel(self.file_path, sheet_name=self.sheet_name)
+            logger.info(f"成功加载账单文件: {self.file_path}")
+            
+            if self.cache is not None:
+                self.cache.put(key, self.data)
+                self._raw_cache_key, self._raw_data = key, self.data
             return self.data
         except Exception as e:
             logger.error(f"加载Excel文件失败: {e}")
             raise
     
+    def _read_csv(self) -> pd.DataFrame:
+        """多线程读取 CSV 文件，编号类列按文本读取"""
+        table = pa_csv.read_csv(
+            self.file_path,
+            read_options=pa_csv.ReadOptions(use_threads=True, encoding=self.encoding),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={column: pa.string() for column in TEXT_COLUMNS},
+                strings_can_be_null=True
+            )
+        )
+        return table.to_pandas(use_threads=True)
+    
+    def _read_arrow(self) -> pd.DataFrame:
+        """读取 Arrow IPC 文件（文件格式或流格式），以内存映射方式打开"""
+        with pa.memory_map(self.file_path, 'r') as source:
+            try:
+                table = pa.ipc.open_file(source).read_all()
+            except pa.ArrowInvalid:
+                source.seek(0)
+                table = pa.ipc.open_stream(source).read_all()
+        return table.to_pandas(use_threads=True)
+    
+    def iter_chunks(self, rows_per_chunk: int = 100000,
+                    clean_data: bool = True) -> Iterator[pd.DataFrame]:
+        """
+        分块读取Excel数据
+        
+        以只读模式逐行读取工作表，内存占用只与块大小有关，第一块读完即可开始检测。
+        读取数据前先校验表头是否包含全部必需列。
+        
+        Args:
+            rows_per_chunk: 每块行数
+            clean_data: 是否对每块按 clean_data 的规则清洗（重复行只在块内去除）
+            
+        Yields:
+            账单数据块，单元格保留 openpyxl 解析出的日期和数值类型
+        """
+        if rows_per_chunk <= 0:
+            raise ValueError("每块行数必须为正数")
+        
+        workbook = load_workbook(self.file_path, read_only=True, data_only=True)
+        try:
+            if isinstance(self.sheet_name, int):
+                worksheet = workbook.worksheets[self.sheet_name]
+            else:
+                worksheet = workbook[self.sheet_name]
+            rows = worksheet.iter_rows(values_only=True)
+            header = self._read_header(next(rows, ()))
+            width = len(header)
+            
+            rows_read = 0
+            buffer = []
+            for row in rows:
+                # 跳过空行（只读模式下工作表尺寸常包含格式化过的空白区域）
+                if all(value is None for value in row):
+                    continue
+                buffer.append(row[:width])
+                if len(buffer) == rows_per_chunk:
+                    yield self._rows_to_frame(buffer, header, rows_read, clean_data)
+                    rows_read += len(buffer)
+                    buffer = []
+            if buffer:
+                yield self._rows_to_frame(buffer, header, rows_read, clean_data)
+                rows_read += len(buffer)
+            
+            logger.info(f"分块读取Excel文件完成: {self.file_path}，共 {rows_read} 行")
+        finally:
+            workbook.close()
+    
+    def read_sheet_headers(self) -> Dict[str, List[str]]:
+        """
+        读取工作簿中每个工作表的表头行（只读模式，不读取数据行）
+        
+        Returns:
+            {工作表名称: 表头列名}，按工作簿中的顺序排列
+        """
+        workbook = load_workbook(self.file_path, read_only=True, data_only=True)
+        try:
+            return {
+                worksheet.title: self._normalize_header(
+                    next(worksheet.iter_rows(max_row=1, values_only=True), ())
+                )
+                for worksheet in workbook.worksheets
+            }
+        finally:
+            workbook.close()
+    
+    @staticmethod
+    def _normalize_header(header_row: tuple) -> List[str]:
+        """表头行转为列名列表，去掉末尾空列"""
+        header = [str(value).strip() if value is not None else '' for value in header_row]
+        while header and not header[-1]:
+            header.pop()
+        return header
+    
+    def _read_header(self, header_row: tuple) -> List[str]:
+        """解析表头行（去掉末尾空列）并校验必需列"""
+        header = self._normalize_header(header_row)
+        
+        missing_columns = set(self.required_columns) - set(header)
+        if missing_columns:
+            logger.error(f"缺少必需列: {missing_columns}")
+            raise ValueError(f"缺少必需列: {missing_columns}")
+        return header
+    
+    def _rows_to_frame(self, rows: List[tuple], header: List[str],
+                       start_row: int, clean_data: bool) -> pd.DataFrame:
+        """将读取的行转为数据块，行索引沿用整表的数据行序号"""
+        chunk = pd.DataFrame.from_records(
+            rows, columns=header, index=pd.RangeIndex(start_row, start_row + len(rows))
+        )
+        if clean_data:
+            chunk = self._clean_frame(chunk)
+        return chunk
+    
     def validate_columns(self) -> bool:
         """
         验证必需列是否存在
@@ -63,36 +260,87 @@ class ExcelParser:
         logger.info("列验证通过")
         return True
     
-    def clean_data(self) -> pd.DataFrame:
+    def clean_data(self, dedup_index: Optional[BillIdIndex] = None) -> pd.DataFrame:
         """
         数据清洗
         
+        数据仍是刚从缓存或文件加载的原始数据时，清洗结果也写入解析缓存（键随文件内容和 PARSER_VERSION 变化），
+        再次加载同一文件时直接读取清洗结果；去重索引过滤不缓存，每次都重新执行。
+        
+        Args:
+            dedup_index: 可选，账单去重索引，去掉此前已入库的账单，去重统计记录在 dedup_report
+        
         Returns:
             清洗后的DataFrame
         """
         if self.data is None:
             raise ValueError("数据未加载")
         
-        # 删除重复行
-        original_count = len(self.data)
-        self.data = self.data.drop_duplicates()
-        logger.info(f"删除重复行: {original_count - len(self.data)} 行")
+        data = None
+        cache_key = None
+        if self.cache is not None and self._raw_cache_key is not None and self.data is self._raw_data:
+            cache_key = self.cache.derive_key(self._raw_cache_key, stage='cleaned')
+            data = self.cache.get(cache_key)
+            if data is not None:
+                logger.info(f"从解析缓存加载清洗后的数据: {self.file_path}")
+        if data is None:
+            data = self._clean_frame(self.data)
+            if cache_key is not None:
+                self.cache.put(cache_key, data)
+        
+        if dedup_index is not None:
+            data = dedup_index.filter_new(data)
+            self.dedup_report = dedup_index.last_report
+        self.data = data
         
+        logger.info("数据清洗完成")
+        return self.data
+    
+    @staticmethod
+    def _clean_frame(data: pd.DataFrame) -> pd.DataFrame:
+        """清洗规则：删除关键字段缺失的行、按账单编号去重、转换日期和金额类型"""
         # 处理缺失值
-        self.data = self.data.dropna(subset=['账单编号', '营业厅编号', '操作员ID'])
+        data = data.dropna(subset=['账单编号', '营业厅编号', '操作员ID'])
+        
+        # 按账单编号去重（保留首次出现），不对整行做哈希
+        original_count = len(data)
+        data = data.drop_duplicates(subset=['账单编号'])
+        logger.info(f"删除重复账单: {original_count - len(data)} 行")
         
         # 数据类型转换
-        self.data['账单日期'] = pd.to_datetime(self.data['账单日期'])
-        self.data['操作时间'] = pd.to_datetime(self.data['操作时间'])
-        self.data['费用金额'] = pd.to_numeric(self.data['费用金额'], errors='coerce')
-        self.data['优惠金额'] = pd.to_numeric(self.data['优惠金额'], errors='coerce')
-        self.data['实收金额'] = pd.to_numeric(self.data['实收金额'], errors='coerce')
+        data['账单日期'] = parse_datetime_column(data['账单日期'])
+        data['操作时间'] = parse_datetime_column(data['操作时间'])
+        data['费用金额'] = pd.to_numeric(data['费用金额'], errors='coerce')
+        data['优惠金额'] = pd.to_numeric(data['优惠金额'], errors='coerce')
+        data['实收金额'] = pd.to_numeric(data['实收金额'], errors='coerce')
         
         # 填充缺失的数值为0
         numeric_columns = ['费用金额', '优惠金额', '实收金额']
-        self.data[numeric_columns] = self.data[numeric_columns].fillna(0)
+        data[numeric_columns] = data[numeric_columns].fillna(0)
         
-        logger.info("数据清洗完成")
+        return data
+    
+    def compact_data(self, categories: Optional[Dict[str, pd.Index]] = None) -> pd.DataFrame:
+        """
+        将清洗后的数据转为紧凑类型（关键列分类编码、金额 float32），并记录内存占用变化
+        
+        Args:
+            categories: 可选，统一的类别表，多个文件共用时分类编码一致
+            
+        Returns:
+            紧凑表示的DataFrame
+        """
+        if self.data is None:
+            raise ValueError("数据未加载")
+        
+        compacted = apply_bill_schema(self.data, categories)
+        self.memory_report = memory_usage_report(self.data, compacted)
+        self.data = compacted
+        
+        logger.info(
+            f"数据紧凑化完成: {self.memory_report['before_bytes'] / 1e6:.1f} MB -> "
+            f"{self.memory_report['after_bytes'] / 1e6:.1f} MB"
+        )
         return self.data
     
     def extract_business_hours_operations(self, 
@@ -133,49 +381,46 @@ class ExcelParser:
         
         stats = {}
         
-        # 按操作员分组统计
-        operator_stats = self.data.groupby('操作员ID').agg({
-            '账单编号': 'count',
-            '费用金额': ['sum', 'mean', 'std'],
-            '实收金额': ['sum', 'mean', 'std']
-        }).round(2)
-        
-        # 重命名列
-        operator_stats.columns = [
-            '操作次数', '费用总额', '平均费用', '费用标准差',
-            '实收总额', '平均实收', '实收标准差'
-        ]
-        
-        stats['operator_stats'] = operator_stats.to_dict('index')
+        # 按操作员分组统计（分组结果缓存在 self.aggregates 中，检测器构建基线时可复用）
+        stats['operator_stats'] = self._group_statistics('操作员ID', with_std=True)
         
         # 按业务类型统计
-        business_stats = self.data.groupby('业务类型').agg({
-            '账单编号': 'count',
-            '费用金额': ['sum', 'mean'],
-            '实收金额': ['sum', 'mean']
-        }).round(2)
-        
-        business_stats.columns = [
-            '操作次数', '费用总额', '平均费用', '实收总额', '平均实收'
-        ]
+        stats['business_stats'] = self._group_statistics('业务类型')
         
-        stats['business_stats'] = business_stats.to_dict('index')
+        # 按营业厅统计
+        stats['branch_stats'] = self._group_statistics('营业厅编号')
         
         return stats
     
-    def export_cleaned_data(self, output_path: str) -> None:
+    def _group_statistics(self, key: str, with_std: bool = False) -> Dict:
+        """按键汇总操作次数和费用、实收金额，结果保留两位小数"""
+        fee = self.aggregates.column_stats(key, '费用金额')
+        paid = self.aggregates.column_stats(key, '实收金额')
+        columns = {'操作次数': fee['size'], '费用总额': fee['sum'], '平均费用': fee['mean']}
+        if with_std:
+            columns['费用标准差'] = fee['std']
+        columns.update({'实收总额': paid['sum'], '平均实收': paid['mean']})
+        if with_std:
+            columns['实收标准差'] = paid['std']
+        return pd.DataFrame(columns).sort_index().round(2).to_dict('index')
+    
+    def export_cleaned_data(self, output_path: str, risk_result=None, **options) -> List[str]:
         """
-        导出清洗后的数据
+        导出清洗后的数据（按块流式写出，见 export_writer.export_bills）
         
         Args:
-            output_path: 输出文件路径
+            output_path: 输出文件路径，扩展名为 .xlsx、.csv 或 .parquet
+            risk_result: 可选，检测结果，同时导出风险评分及各维度异常度
+            **options: 传给 export_bills 的其他参数（如 split_by、chunk_size）
+            
+        Returns:
+            写出的文件路径列表（xlsx 超过行数上限且按文件拆分时有多个）
         """
         if self.data is None:
             raise ValueError("数据未加载")
         
         try:
-            self.data.to_excel(output_path, index=False)
-            logger.info(f"数据已导出到: {output_path}")
+            return export_bills(self.data, output_path, risk_result=risk_result, **options)
         except Exception as e:
             logger.error(f"导出数据失败: {e}")
             raise
@@ -183,26 +428,237 @@ class ExcelParser:
 
 def parse_bill_excel(file_path: str, 
                     clean_data: bool = True,
-                    validate_columns: bool = True) -> pd.DataFrame:
+                    validate_columns: bool = True,
+                    cache: Optional[ParseCache] = None,
+                    encoding: str = 'utf-8',
+                    dedup_index: Optional[BillIdIndex] = None) -> pd.DataFrame:
     """
     解析账单Excel文件的便捷函数
     
     Args:
-        file_path: Excel文件路径
+        file_path: 账单文件路径（Excel、CSV 或 Arrow IPC）
         clean_data: 是否进行数据清洗
         validate_columns: 是否验证列
+        cache: 可选，解析缓存，命中时跳过Excel解析和数据清洗
+        encoding: CSV 文件编码
+        dedup_index: 可选，账单去重索引，去掉此前任一文件已入库的账单（缓存命中时同样生效），
+                     去重统计见 dedup_index.last_report
         
     Returns:
         解析后的DataFrame
     """
+    data = None
+    if cache is not None:
+        key = cache.key_for(file_path, PARSER_VERSION, stage='parsed', clean_data=clean_data,
+                            validate_columns=validate_columns, encoding=encoding)
+        data = cache.get(key)
+        if data is not None:
+            logger.info(f"从解析缓存加载Excel文件: {file_path}")
+    
+    if data is None:
+        parser = ExcelParser(file_path, encoding=encoding)
+        parser.load_data()
+        
+        if validate_columns:
+            if not parser.validate_columns():
+                raise ValueError("列验证失败")
+        
+        if clean_data:
+            parser.clean_data()
+        
+        data = parser.data
+        if cache is not None:
+            cache.put(key, data)
+    
+    if dedup_index is not None:
+        data = dedup_index.filter_new(data)
+    return data
+
+def parse_bill_files(sources,
+                     max_workers: Optional[int] = None,
+                     clean_data: bool = True,
+                     validate_columns: bool = True,
+                     cache: Optional[ParseCache] = None,
+                     compact: bool = False,
+                     dedup_index: Optional[BillIdIndex] = None) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """
+    并行解析多个账单文件（如每个营业厅每天一个文件）
+    
+    各文件在进程池中独立完成解析、列验证和清洗，单个文件失败不影响其他文件。
+    合并结果按文件路径排序拼接，营业厅编号、操作员ID、业务类型统一为同一套类别的分类类型。
+    
+    Args:
+        sources: 目录、通配符模式（如 data/*/*.xlsx）或文件路径列表
+        max_workers: 进程数，默认为CPU核数；为1时在当前进程中依次解析
+        clean_data: 是否进行数据清洗
+        validate_columns: 是否验证列
+        cache: 可选，解析缓存
+        compact: 是否将合并结果转为紧凑类型（金额 float32）
+        dedup_index: 可选，账单去重索引，合并后按文件顺序去掉重复和此前已入库的账单，
+                     去重统计见 dedup_index.last_report
+        
+    Returns:
+        (合并后的DataFrame, 解析失败的文件 {文件路径: 错误信息})
+    """
+    file_paths = _resolve_bill_files(sources)
+    frames = {}
+    errors = {}
+    
+    if max_workers == 1 or len(file_paths) <= 1:
+        for path in file_paths:
+            try:
+                frames[path] = _parse_bill_file(path, clean_data, validate_columns, cache)
+            except Exception as e:
+                errors[path] = f"{type(e).__name__}: {e}"
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                path: executor.submit(_parse_bill_file, path, clean_data, validate_columns, cache)
+                for path in file_paths
+            }
+            for path, future in futures.items():
+                try:
+                    frames[path] = future.result()
+                except Exception as e:
+                    errors[path] = f"{type(e).__name__}: {e}"
+    
+    for path, message in errors.items():
+        logger.error(f"解析文件失败: {path}: {message}")
+    logger.info(f"多文件解析完成: 成功 {len(frames)} 个，失败 {len(errors)} 个")
+    
+    data = _concat_with_categories([frames[path] for path in file_paths if path in frames])
+    if dedup_index is not None:
+        data = dedup_index.filter_new(data).reset_index(drop=True)
+    if compact:
+        data = apply_bill_schema(data)
+    return data, errors
+
+
+def parse_bill_workbook(file_path: str,
+                        max_workers: Optional[int] = None,
+                        clean_data: bool = True,
+                        validate_columns: bool = True,
+                        compact: bool = False,
+                        dedup_index: Optional[BillIdIndex] = None) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """
+    并行解析一个工作簿中的全部工作表（如地区汇总的每个营业厅一个工作表）
+    
+    先以只读模式读取各工作表表头，缺少必需列的工作表（如汇总页）跳过并记录原因；
+    其余工作表在进程池中各自解析和清洗，耗时取决于并行度而不是工作表数。
+    合并结果按工作表顺序拼接，并增加来源工作表列（分类类型）。
+    
+    Args:
+        file_path: Excel工作簿路径
+        max_workers: 进程数，默认为CPU核数；为1时在当前进程中依次解析
+        clean_data: 是否进行数据清洗
+        validate_columns: 是否验证列，关闭时所有工作表都参与解析
+        compact: 是否将合并结果转为紧凑类型（金额 float32）
+        dedup_index: 可选，账单去重索引，合并后按工作表顺序去掉重复和此前已入库的账单
+        
+    Returns:
+        (合并后的DataFrame, 跳过或解析失败的工作表 {工作表名称: 原因})
+    """
+    if not file_path.lower().endswith(EXCEL_EXTENSIONS):
+        raise ValueError(f"不是Excel工作簿: {file_path}")
+    
     parser = ExcelParser(file_path)
-    parser.load_data()
+    headers = parser.read_sheet_headers()
+    sheet_names = []
+    skipped = {}
+    for sheet_name, header in headers.items():
+        missing_columns = [column for column in parser.required_columns if column not in header]
+        if validate_columns and missing_columns:
+            skipped[sheet_name] = f"缺少必需列: {missing_columns}"
+        else:
+            sheet_names.append(sheet_name)
     
-    if validate_columns:
-        if not parser.validate_columns():
-            raise ValueError("列验证失败")
+    frames = {}
+    if max_workers == 1 or len(sheet_names) <= 1:
+        for sheet_name in sheet_names:
+            try:
+                frames[sheet_name] = _parse_bill_sheet(file_path, sheet_name, clean_data)
+            except Exception as e:
+                skipped[sheet_name] = f"{type(e).__name__}: {e}"
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                sheet_name: executor.submit(_parse_bill_sheet, file_path, sheet_name, clean_data)
+                for sheet_name in sheet_names
+            }
+            for sheet_name, future in futures.items():
+                try:
+                    frames[sheet_name] = future.result()
+                except Exception as e:
+                    skipped[sheet_name] = f"{type(e).__name__}: {e}"
     
+    for sheet_name, reason in skipped.items():
+        logger.warning(f"跳过工作表 {sheet_name}: {reason}")
+    logger.info(f"工作簿解析完成: {file_path}，解析 {len(frames)} 个工作表，跳过 {len(skipped)} 个")
+    
+    sheet_dtype = pd.CategoricalDtype(list(frames))
+    data = _concat_with_categories([
+        frame.assign(**{SHEET_COLUMN: pd.Categorical([sheet_name] * len(frame), dtype=sheet_dtype)})
+        for sheet_name, frame in frames.items()
+    ])
+    if dedup_index is not None:
+        data = dedup_index.filter_new(data).reset_index(drop=True)
+    if compact:
+        data = apply_bill_schema(data)
+    return data, {sheet_name: skipped[sheet_name] for sheet_name in headers if sheet_name in skipped}
+
+
+def _parse_bill_sheet(file_path: str, sheet_name: str, clean_data: bool) -> pd.DataFrame:
+    """进程池任务：解析单个工作表，关键列转为分类类型以减少回传数据量"""
+    parser = ExcelParser(file_path, sheet_name=sheet_name)
+    parser.load_data()
     if clean_data:
-        return parser.clean_data()
+        parser.clean_data()
+    
+    data = parser.data
+    for column in CATEGORY_COLUMNS:
+        if column in data.columns:
+            data[column] = data[column].astype('category')
+    return data
+
+
+def _resolve_bill_files(sources) -> List[str]:
+    """将目录、通配符模式或路径列表展开为排序后的文件路径列表"""
+    if isinstance(sources, (str, os.PathLike)):
+        source = os.fspath(sources)
+        if os.path.isdir(source):
+            return sorted(
+                os.path.join(source, name) for name in os.listdir(source)
+                if name.lower().endswith(BILL_FILE_EXTENSIONS) and not name.startswith('~$')
+            )
+        if glob.has_magic(source):
+            return sorted(glob.glob(source, recursive=True))
+        return [source]
+    return sorted(os.fspath(path) for path in sources)
+
+
+def _parse_bill_file(file_path: str, clean_data: bool, validate_columns: bool,
+                     cache: Optional[ParseCache]) -> pd.DataFrame:
+    """进程池任务：解析单个文件，关键列转为分类类型以减少回传数据量"""
+    data = parse_bill_excel(file_path, clean_data=clean_data,
+                            validate_columns=validate_columns, cache=cache)
+    for column in CATEGORY_COLUMNS:
+        if column in data.columns:
+            data[column] = data[column].astype('category')
+    return data
+
+
+def _concat_with_categories(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """拼接多个数据块，分类列先统一为合并后的类别集合，拼接后仍为分类类型"""
+    if not frames:
+        return pd.DataFrame(columns=ExcelParser('').required_columns)
+    
+    for column in CATEGORY_COLUMNS:
+        if not all(column in frame.columns for frame in frames):
+            continue
+        categories = union_categoricals(
+            [frame[column].astype('category') for frame in frames], sort_categories=True
+        ).categories
+        for frame in frames:
+            frame[column] = frame[column].astype('category').cat.set_categories(categories)
     
-    return parser.data 
\ No newline at end of file
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,188 @@
+"""
+数据导出模块
+按块流式写出清洗后的账单数据（可附带风险评分），内存占用只与块大小有关；
+支持 xlsx、CSV 和 Parquet，xlsx 超过行数上限时自动分工作表或分文件
+"""
+
+import pandas as pd
+import numpy as np
+from typing import Dict, Iterator, List, Optional
+import os
+import logging
+from openpyxl import Workbook
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    from .risk_result import RiskResult
+except ImportError:  # 以 utils 目录为搜索路径直接导入 export_writer 时
+    from risk_result import RiskResult
+
+logger = logging.getLogger(__name__)
+
+# Excel 单个工作表的最大行数（含表头行）
+EXCEL_MAX_ROWS = 1048576
+
+# 支持的导出格式
+EXPORT_FORMATS = {'.xlsx': 'xlsx', '.csv': 'csv', '.parquet': 'parquet'}
+
+
+def export_bills(data: pd.DataFrame,
+                 output_path: str,
+                 risk_result: Optional[RiskResult] = None,
+                 components: bool = True,
+                 chunk_size: int = 50000,
+                 max_rows_per_sheet: int = EXCEL_MAX_ROWS - 1,
+                 split_by: str = 'sheet',
+                 sheet_name: str = '账单',
+                 encoding: str = 'utf_8_sig') -> List[str]:
+    """
+    按块流式导出账单数据，格式由扩展名决定（.xlsx、.csv 或 .parquet）
+
+    Args:
+        data: 清洗后的账单数据
+        output_path: 输出文件路径
+        risk_result: 可选，检测结果，拼接 风险评分 及各维度异常度列（未评分的账单为空）
+        components: 是否同时导出各维度异常度
+        chunk_size: 每次转换和写出的行数
+        max_rows_per_sheet: xlsx 每个工作表的最大数据行数，默认为 Excel 上限
+        split_by: xlsx 超过行数上限时的拆分方式，'sheet'（同一文件多个工作表）或 'file'（多个文件）
+        sheet_name: xlsx 工作表名称，拆分后依次加 _2、_3 后缀
+        encoding: CSV 文件编码，默认带 BOM 的 UTF-8 以便 Excel 直接打开
+
+    Returns:
+        写出的文件路径列表
+    """
+    extension = os.path.splitext(output_path)[1].lower()
+    if extension not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式: {extension}")
+    if chunk_size <= 0 or max_rows_per_sheet <= 0:
+        raise ValueError("块大小和每个工作表的行数必须为正数")
+    if split_by not in ('sheet', 'file'):
+        raise ValueError(f"不支持的拆分方式: {split_by}")
+
+    # 评分列只对齐一次（与 data 行对齐时不复制），写出时再逐块拼接，不生成整表副本
+    score_columns = {}
+    if risk_result is not None:
+        aligned = risk_result.align(data, default=np.nan)
+        score_columns['风险评分'] = aligned.risk_score
+        if components:
+            score_columns.update(aligned.components)
+
+    export_format = EXPORT_FORMATS[extension]
+    if export_format == 'xlsx':
+        paths = _write_xlsx(data, score_columns, output_path, chunk_size, max_rows_per_sheet, split_by, sheet_name)
+    elif export_format == 'csv':
+        paths = _write_csv(data, score_columns, output_path, chunk_size, encoding)
+    else:
+        paths = _write_parquet(data, score_columns, output_path, chunk_size)
+
+    logger.info(f"数据已导出到: {', '.join(paths)}（共 {len(data)} 行）")
+    return paths
+
+
+def _iter_frames(data: pd.DataFrame, score_columns: Dict[str, np.ndarray],
+                 chunk_size: int) -> Iterator[pd.DataFrame]:
+    """按行切分数据块（不复制数据），评分列逐块拼接"""
+    for start in range(0, len(data), chunk_size):
+        yield _with_scores(data, score_columns, start, start + chunk_size)
+
+
+def _with_scores(data: pd.DataFrame, score_columns: Dict[str, np.ndarray],
+                 start: int, stop: int) -> pd.DataFrame:
+    """取 [start, stop) 行并拼接对应的评分列"""
+    chunk = data.iloc[start:stop]
+    if not score_columns:
+        return chunk
+    return chunk.assign(**{name: values[start:stop] for name, values in score_columns.items()})
+
+
+def _iter_rows(data: pd.DataFrame, score_columns: Dict[str, np.ndarray],
+               chunk_size: int) -> Iterator[tuple]:
+    """逐块转为 Python 值的行元组，缺失值为 None"""
+    for chunk in _iter_frames(data, score_columns, chunk_size):
+        values = chunk.astype(object)
+        yield from values.where(chunk.notna(), None).itertuples(index=False, name=None)
+
+
+def _write_xlsx(data: pd.DataFrame, score_columns: Dict[str, np.ndarray], output_path: str,
+                chunk_size: int, max_rows_per_sheet: int, split_by: str, sheet_name: str) -> List[str]:
+    """以 openpyxl 只写模式逐行写出，行数达到上限时换工作表或换文件"""
+    header = [str(column) for column in _with_scores(data, score_columns, 0, 0).columns]
+    stem, extension = os.path.splitext(output_path)
+    paths = [output_path]
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(sheet_name)
+    worksheet.append(header)
+    sheet_count = 1
+    sheet_rows = 0
+
+    for row in _iter_rows(data, score_columns, chunk_size):
+        if sheet_rows == max_rows_per_sheet:
+            sheet_count += 1
+            if split_by == 'file':
+                workbook.save(paths[-1])
+                paths.append(f"{stem}_{sheet_count}{extension}")
+                workbook = Workbook(write_only=True)
+                worksheet = workbook.create_sheet(sheet_name)
+            else:
+                worksheet = workbook.create_sheet(f"{sheet_name}_{sheet_count}")
+            worksheet.append(header)
+            sheet_rows = 0
+        worksheet.append(row)
+        sheet_rows += 1
+
+    workbook.save(paths[-1])
+    if sheet_count > 1:
+        logger.info(f"超过每个工作表 {max_rows_per_sheet} 行的上限，已拆分为 {sheet_count} 个"
+                    f"{'文件' if split_by == 'file' else '工作表'}")
+    return paths
+
+
+def _write_csv(data: pd.DataFrame, score_columns: Dict[str, np.ndarray], output_path: str,
+               chunk_size: int, encoding: str) -> List[str]:
+    """逐块追加写出 CSV"""
+    with open(output_path, 'w', encoding=encoding, newline='') as f:
+        _with_scores(data, score_columns, 0, 0).to_csv(f, index=False)
+        for chunk in _iter_frames(data, score_columns, chunk_size):
+            chunk.to_csv(f, index=False, header=False)
+    return [output_path]
+
+
+def _write_parquet(data: pd.DataFrame, score_columns: Dict[str, np.ndarray], output_path: str,
+                   chunk_size: int) -> List[str]:
+    """每块写为一个行组，各块按同一表结构转换"""
+    schema = _parquet_schema(_with_scores(data, score_columns, 0, 0), data)
+    with pq.ParquetWriter(output_path, schema) as writer:
+        for chunk in _iter_frames(data, score_columns, chunk_size):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    return [output_path]
+
+
+def _parquet_schema(header: pd.DataFrame, data: pd.DataFrame, sample_size: int = 1000) -> pa.Schema:
+    """
+    由列类型推断 Parquet 表结构，不转换整个数据框
+
+    object 列在空切片上会被推断为 null 类型，之后写入文本时失败；
+    这类列取首个非空值起的 sample_size 行推断类型，全为空值时保持 null。
+
+    Args:
+        header: 含全部导出列的空数据框（账单列及评分列）
+        data: 账单数据，用于取 object 列的样本
+        sample_size: object 列推断类型的样本行数
+
+    Returns:
+        表结构
+    """
+    schema = pa.Schema.from_pandas(header, preserve_index=False)
+    for i, field in enumerate(schema):
+        if field.type != pa.null() or field.name not in data.columns:
+            continue
+        column = data[field.name]
+        present = column.notna().to_numpy()
+        if not present.any():
+            continue
+        first = int(present.argmax())
+        sample = column.iloc[first:first + sample_size].dropna()
+        schema = schema.set(i, pa.field(field.name, pa.array(sample.tolist()).type))
+    return schema
@@ -0,0 +1,194 @@
+"""
+解析缓存模块
+按文件内容哈希缓存解析并清洗后的账单数据（Parquet 列式格式），重复分析同一文件时跳过 Excel 解析
+"""
+
+import pandas as pd
+from typing import Any, Dict, Optional
+import os
+import json
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+CACHE_SUFFIX = '.parquet'
+
+# 计算文件哈希时每次读取的字节数
+HASH_BLOCK_SIZE = 1 << 20
+
+
+class ParseCache:
+    """以文件内容哈希为键的解析结果缓存，超过容量时淘汰最久未使用的条目"""
+
+    def __init__(self, cache_dir: str, max_bytes: int = 1 << 30):
+        """
+        初始化解析缓存
+
+        Args:
+            cache_dir: 缓存目录，不存在时自动创建
+            max_bytes: 缓存总大小上限（字节）
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key_for(self, file_path: str, version: str, **options: Any) -> str:
+        """
+        计算缓存键
+
+        Args:
+            file_path: 源文件路径
+            version: 解析器版本，解析或清洗规则变化时应更换
+            **options: 影响解析结果的其他选项（如是否清洗）
+
+        Returns:
+            由文件内容哈希、解析器版本和选项共同决定的缓存键
+        """
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+        digest.update(json.dumps({'version': version, 'options': options},
+                                 sort_keys=True, ensure_ascii=False).encode('utf-8'))
+        return digest.hexdigest()
+
+    def derive_key(self, key: str, **options: Any) -> str:
+        """
+        由已有缓存键派生同一文件其他处理阶段的缓存键，不再重新读取文件
+
+        Args:
+            key: key_for 得到的缓存键
+            **options: 区分处理阶段的选项（如 stage='cleaned'）
+
+        Returns:
+            派生的缓存键
+        """
+        digest = hashlib.sha256(key.encode('ascii'))
+        digest.update(json.dumps({'options': options}, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """
+        读取缓存
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存的数据，未命中时为 None
+        """
+        path = self._entry_path(key)
+        try:
+            data = pd.read_parquet(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            # 损坏的条目直接删除，按未命中处理
+            logger.warning(f"解析缓存条目无法读取，已删除: {path} ({e})")
+            self._remove(path)
+            self.misses += 1
+            return None
+
+        # 更新访问时间，作为淘汰顺序依据
+        os.utime(path)
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: pd.DataFrame) -> bool:
+        """
+        写入缓存，写入后按容量上限淘汰旧条目
+
+        Args:
+            key: 缓存键
+            data: 要缓存的数据
+
+        Returns:
+            是否写入成功（列类型无法以 Parquet 保存时跳过缓存）
+        """
+        path = self._entry_path(key)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        try:
+            data.to_parquet(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"数据无法写入解析缓存，已跳过: {e}")
+            self._remove(tmp_path)
+            return False
+
+        self.evict()
+        return True
+
+    def evict(self) -> int:
+        """
+        淘汰最久未使用的条目，直到总大小不超过上限
+
+        Returns:
+            淘汰的条目数
+        """
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+            evicted += 1
+
+        if evicted:
+            self.evictions += evicted
+            logger.info(f"解析缓存淘汰 {evicted} 个条目")
+        return evicted
+
+    def clear(self) -> None:
+        """清空缓存"""
+        for path, _, _ in self._entries():
+            self._remove(path)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        缓存统计信息
+
+        Returns:
+            条目数、总大小、容量上限及本进程内的命中、未命中、淘汰次数和命中率
+        """
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(entries),
+            'total_bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + CACHE_SUFFIX)
+
+    def _entries(self):
+        """[(路径, 大小, 最近访问时间)]"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(CACHE_SUFFIX):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
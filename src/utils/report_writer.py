@@ -0,0 +1,420 @@
+"""
+HTML报告写出模块
+按节直接写入输出文件，plotly.js 只引入一次（内联或同目录共享文件，不依赖 CDN），
+图表数据以二进制编码数组和舍入后的 float32 序列化，可选 gzip 压缩
+"""
+
+import plotly
+from plotly.io.json import to_json_plotly
+from plotly.offline import get_plotlyjs
+import pandas as pd
+import numpy as np
+from typing import Any, Dict, Iterable, Optional, Tuple
+import os
+import gzip
+import base64
+import html
+import json
+import logging
+
+try:
+    from .risk_result import RISK_BAND_EDGES
+except ImportError:  # 以 utils 目录为搜索路径直接导入 report_writer 时
+    from risk_result import RISK_BAND_EDGES
+
+logger = logging.getLogger(__name__)
+
+# 同目录共享的 plotly.js 文件名（带版本号，不同版本互不覆盖）
+PLOTLY_ASSET_NAME = f"plotly-{plotly.__version__}.min.js"
+
+REPORT_STYLE = """
+body { font-family: Arial, sans-serif; margin: 20px; }
+.header { background-color: #f0f0f0; padding: 20px; border-radius: 5px; }
+.section { margin: 30px 0; }
+.chart { margin: 20px 0; }
+.risk-table { width: 100%; border-collapse: collapse; margin: 20px 0; }
+.risk-table th, .risk-table td { border: 1px solid #ddd; padding: 8px; text-align: left; }
+.risk-table th { background-color: #f2f2f2; }
+.high-risk { background-color: #ffebee; }
+.medium-risk { background-color: #fff3e0; }
+.low-risk { background-color: #f1f8e9; }
+.risk-table th { cursor: pointer; }
+.table-controls, .table-pager { margin: 10px 0; }
+.table-controls input { margin-right: 15px; }
+"""
+
+# 数据表的客户端脚本：分块数据按需解析，只渲染当前页；筛选或排序时才解析全部数据块
+TABLE_SCRIPT = """
+function reportTable(id, options) {
+  var chunks = document.querySelectorAll('script[data-table="' + id + '"]');
+  var table = document.getElementById(id);
+  var body = table.tBodies[0];
+  var controls = document.getElementById(id + '-controls');
+  var search = controls.querySelector('input[type=search]');
+  var minScore = controls.querySelector('input[type=number]');
+  var info = controls.querySelector('.table-info');
+  var pager = document.getElementById(id + '-pager');
+  var buttons = pager.querySelectorAll('button');
+  var pageLabel = pager.querySelector('span');
+  var rows = [], loaded = 0, view = null, page = 0, sortColumn = -1, sortDesc = false;
+
+  function load(count) {
+    while (loaded < chunks.length && rows.length < count) {
+      var columns = JSON.parse(chunks[loaded++].textContent);
+      for (var i = 0; i < columns[0].length; i++) {
+        var row = new Array(columns.length);
+        for (var c = 0; c < columns.length; c++) { row[c] = columns[c][i]; }
+        rows.push(row);
+      }
+    }
+  }
+  function escape(value) {
+    return value === null ? '' : String(value).replace(/[&<>"]/g, function(ch) {
+      return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'}[ch];
+    });
+  }
+  function rowClass(row) {
+    if (options.scoreColumn < 0) { return ''; }
+    var score = row[options.scoreColumn];
+    return score >= options.bandEdges[1] ? 'high-risk' : score >= options.bandEdges[0] ? 'medium-risk' : 'low-risk';
+  }
+  function rebuild() {
+    var text = search.value.trim().toLowerCase();
+    var threshold = minScore ? parseFloat(minScore.value) : NaN;
+    if (!text && isNaN(threshold) && sortColumn < 0) {
+      view = null;
+    } else {
+      load(Infinity);
+      view = rows.filter(function(row) {
+        if (!isNaN(threshold) && !(row[options.scoreColumn] >= threshold)) { return false; }
+        if (!text) { return true; }
+        return options.textColumns.some(function(column) {
+          return row[column] !== null && String(row[column]).toLowerCase().indexOf(text) >= 0;
+        });
+      });
+      if (sortColumn >= 0) {
+        var direction = sortDesc ? -1 : 1;
+        view.sort(function(a, b) {
+          var x = a[sortColumn], y = b[sortColumn];
+          if (x === y) { return 0; }
+          if (x === null) { return 1; }
+          if (y === null) { return -1; }
+          return x < y ? -direction : direction;
+        });
+      }
+    }
+    page = 0;
+    render();
+  }
+  function render() {
+    var total = view ? view.length : options.total;
+    var pages = Math.max(1, Math.ceil(total / options.pageSize));
+    page = Math.max(0, Math.min(page, pages - 1));
+    var start = page * options.pageSize, end = Math.min(start + options.pageSize, total);
+    if (!view) { load(end); }
+    var source = view || rows, html = [];
+    for (var i = start; i < end; i++) {
+      var cells = source[i].map(function(value) { return '<td>' + escape(value) + '</td>'; });
+      html.push('<tr class="' + rowClass(source[i]) + '">' + cells.join('') + '</tr>');
+    }
+    body.innerHTML = html.join('');
+    info.textContent = '共 ' + total + ' 条';
+    pageLabel.textContent = '第 ' + (page + 1) + ' / ' + pages + ' 页';
+    buttons[0].disabled = page === 0;
+    buttons[1].disabled = page >= pages - 1;
+  }
+
+  buttons[0].onclick = function() { page--; render(); };
+  buttons[1].onclick = function() { page++; render(); };
+  search.oninput = rebuild;
+  if (minScore) { minScore.oninput = rebuild; }
+  Array.prototype.forEach.call(table.tHead.rows[0].cells, function(header, column) {
+    header.onclick = function() {
+      // 首次点击数值列按降序排列，再次点击切换方向
+      sortDesc = sortColumn === column ? !sortDesc : options.numericColumns.indexOf(column) >= 0;
+      sortColumn = column;
+      rebuild();
+    };
+  });
+  render();
+}
+"""
+
+
+def write_plotly_asset(directory: str) -> str:
+    """
+    在目录中写出共享的 plotly.js 文件（已存在时不重复写）
+
+    Args:
+        directory: 报告所在目录
+
+    Returns:
+        plotly.js 文件路径
+    """
+    path = os.path.join(directory, PLOTLY_ASSET_NAME)
+    if not os.path.exists(path):
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(get_plotlyjs())
+        os.replace(tmp_path, path)
+    return path
+
+
+def compact_figure_json(fig, decimals: int = 4) -> Dict[str, Any]:
+    """
+    将图表转为紧凑的可序列化结构
+
+    浮点数组舍入后以 float32 二进制编码；附加数据中的浮点列同样舍入。
+    坐标轴已声明为日期类型（type='date'）时，该轴上的时间坐标转为毫秒时间戳（float64 二进制编码），
+    避免逐点写出时间字符串；其他坐标轴上的字符串（如编号、年份）原样保留。
+
+    Args:
+        fig: Plotly图表对象
+        decimals: 浮点数保留的小数位数
+
+    Returns:
+        {'data': [...], 'layout': {...}}
+    """
+    figure = fig.to_plotly_json()
+    layout = figure.get('layout', {})
+    for trace in figure.get('data', []):
+        _compact_arrays(trace, decimals)
+        for axis in ('x', 'y'):
+            axis_name = f"{axis}axis{trace.get(f'{axis}axis', axis)[1:]}"
+            if layout.get(axis_name, {}).get('type') != 'date':
+                continue
+            milliseconds = _to_milliseconds(trace.get(axis))
+            if milliseconds is not None:
+                trace[axis] = _encode_array(milliseconds)
+    return {'data': figure.get('data', []), 'layout': layout}
+
+
+def _to_milliseconds(values: Any) -> Optional[np.ndarray]:
+    """日期坐标轴上的时间数组（datetime64 或 ISO 时间字符串）转为毫秒时间戳，无法解析时返回 None"""
+    if not isinstance(values, np.ndarray) or len(values) == 0:
+        return None
+    if values.dtype == object:
+        if not isinstance(values[0], str):
+            return None
+        try:
+            values = values.astype('datetime64[ms]')
+        except ValueError:
+            return None
+    elif not np.issubdtype(values.dtype, np.datetime64):
+        return None
+    milliseconds = values.astype('datetime64[ms]').astype(np.int64).astype(np.float64)
+    milliseconds[np.isnat(values)] = np.nan
+    return milliseconds
+
+
+def _encode_array(values: np.ndarray) -> Dict[str, str]:
+    """数组的 plotly 二进制编码形式（小端字节序的 base64）"""
+    values = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder('<'))
+    return {'dtype': values.dtype.str[1:], 'bdata': base64.b64encode(values.tobytes()).decode('ascii')}
+
+
+def _compact_arrays(node: Dict[str, Any], decimals: int) -> None:
+    """递归地将 float64 数组舍入并转为 float32，对象数组中的浮点列就地舍入"""
+    for name, value in node.items():
+        if isinstance(value, dict) and value.get('dtype') == 'f8' and 'bdata' in value:
+            values = np.frombuffer(base64.b64decode(value['bdata']), dtype='<f8')
+            node[name] = _encode_array(np.round(values, decimals).astype('<f4'))
+        elif isinstance(value, dict):
+            _compact_arrays(value, decimals)
+        elif isinstance(value, np.ndarray) and value.dtype == np.float64:
+            node[name] = _encode_array(np.round(value, decimals).astype('<f4'))
+        elif isinstance(value, np.ndarray) and value.dtype == object and value.ndim == 2:
+            # 如 customdata 的 [账单编号, 风险评分]
+            value = value.copy()
+            for column in range(value.shape[1]):
+                try:
+                    floats = value[:, column].astype(np.float64)
+                except (TypeError, ValueError):
+                    continue
+                value[:, column] = np.round(floats, decimals)
+            node[name] = value
+
+
+class HtmlReportWriter:
+    """流式HTML报告写出器，用作上下文管理器"""
+
+    def __init__(self, output_path: str, title: str = '资费异常检测报告',
+                 plotlyjs: str = 'inline', compress: bool = False, decimals: int = 4):
+        """
+        初始化报告写出器
+
+        Args:
+            output_path: 输出文件路径，compress 为 True 且未以 .gz 结尾时自动追加 .gz
+            title: 页面标题
+            plotlyjs: plotly.js 引入方式，'inline'（内联一次，单文件离线可用）
+                      或 'local'（同目录共享文件 PLOTLY_ASSET_NAME，多份报告共用）
+            compress: 是否以 gzip 压缩写出
+            decimals: 图表浮点数保留的小数位数
+        """
+        if plotlyjs not in ('inline', 'local'):
+            raise ValueError(f"不支持的 plotly.js 引入方式: {plotlyjs}")
+        if compress and not output_path.endswith('.gz'):
+            output_path = f"{output_path}.gz"
+        self.output_path = output_path
+        self.title = title
+        self.plotlyjs = plotlyjs
+        self.compress = compress
+        self.decimals = decimals
+        self._file = None
+        self._figure_count = 0
+        self._template_json = None
+        self._table_count = 0
+
+    def __enter__(self) -> 'HtmlReportWriter':
+        directory = os.path.dirname(os.path.abspath(self.output_path))
+        if self.compress:
+            self._file = gzip.open(self.output_path, 'wt', encoding='utf-8')
+        else:
+            self._file = open(self.output_path, 'w', encoding='utf-8')
+
+        self._file.write(f'<!DOCTYPE html>\n<html>\n<head>\n<title>{html.escape(self.title)}</title>\n'
+                         f'<meta charset="utf-8">\n')
+        if self.plotlyjs == 'inline':
+            self._file.write('<script type="text/javascript">')
+            self._file.write(get_plotlyjs())
+            self._file.write('</script>\n')
+        else:
+            write_plotly_asset(directory)
+            self._file.write(f'<script src="{PLOTLY_ASSET_NAME}"></script>\n')
+        self._file.write(f'<style>{REPORT_STYLE}</style>\n</head>\n<body>\n')
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self._file.write('</body>\n</html>\n')
+        self._file.close()
+        self._file = None
+        if exc_type is None:
+            logger.info(f"HTML报告已生成: {self.output_path}")
+        else:
+            # 生成中途出错时不留下不完整的报告
+            os.remove(self.output_path)
+
+    def write_html(self, content: str) -> None:
+        """写入一段原始HTML"""
+        self._file.write(content)
+
+    def write_header(self, lines: Iterable[str]) -> None:
+        """
+        写入报告页眉
+
+        Args:
+            lines: 标题下方的说明行（纯文本）
+        """
+        self._file.write(f'<div class="header">\n<h1>{html.escape(self.title)}</h1>\n')
+        for line in lines:
+            self._file.write(f'<p>{html.escape(line)}</p>\n')
+        self._file.write('</div>\n')
+
+    def write_figure(self, title: str, fig) -> None:
+        """
+        写入一个图表节，图表数据紧凑序列化后由 Plotly.newPlot 绘制
+
+        Args:
+            title: 节标题
+            fig: Plotly图表对象
+        """
+        self._figure_count += 1
+        div_id = f"figure-{self._figure_count}"
+        figure = compact_figure_json(fig, self.decimals)
+
+        # 所有图表共用的默认模板只写一次
+        layout = figure['layout']
+        template = layout.pop('template', None)
+        template_ref = 'null'
+        if template is not None:
+            template_json = to_json_plotly(template)
+            if self._template_json is None:
+                self._template_json = template_json
+                self._file.write(f'<script>var reportTemplate = {template_json};</script>\n')
+            if template_json == self._template_json:
+                template_ref = 'reportTemplate'
+            else:
+                template_ref = template_json
+
+        self._file.write(f'<div class="section">\n<h2>{html.escape(title)}</h2>\n'
+                         f'<div class="chart"><div id="{div_id}"></div></div>\n<script>\n'
+                         f'(function() {{\nvar figure = ')
+        self._file.write(to_json_plotly(figure))
+        self._file.write(f';\nif ({template_ref}) {{ figure.layout.template = {template_ref}; }}\n'
+                         f'Plotly.newPlot("{div_id}", figure.data, figure.layout, {{responsive: true}});\n'
+                         f'}})();\n</script>\n</div>\n')
+
+    def write_data_table(self, title: str, data: pd.DataFrame, page_size: int = 50,
+                         chunk_size: int = 5000, score_column: Optional[str] = None,
+                         band_edges: Tuple[float, float] = RISK_BAND_EDGES, decimals: int = 3) -> None:
+        """
+        写入一个可分页、排序、筛选的数据表节
+
+        数据按列以 JSON 分块写入页面（每块 chunk_size 行），浏览器只渲染当前页；
+        未排序、未筛选时按需解析数据块，因此行数很多时页面仍可立即打开。
+
+        Args:
+            title: 节标题
+            data: 表格数据，列名即表头，按行的默认顺序显示
+            page_size: 每页行数
+            chunk_size: 每个数据块的行数
+            score_column: 可选，风险评分列名，按评分分级着色并提供最低评分筛选
+            band_edges: 中风险、高风险的评分下限
+            decimals: 浮点数保留的小数位数
+        """
+        if page_size <= 0 or chunk_size <= 0:
+            raise ValueError("每页行数和数据块行数必须为正数")
+
+        self._table_count += 1
+        table_id = f"table-{self._table_count}"
+        if self._table_count == 1:
+            self._file.write(f'<script>{TABLE_SCRIPT}</script>\n')
+
+        columns = [str(column) for column in data.columns]
+        numeric_columns = [i for i, column in enumerate(data.columns)
+                           if pd.api.types.is_numeric_dtype(data[column]) and not pd.api.types.is_bool_dtype(data[column])]
+        options = {
+            'total': len(data),
+            'pageSize': page_size,
+            'scoreColumn': columns.index(score_column) if score_column is not None else -1,
+            'bandEdges': list(band_edges),
+            'numericColumns': numeric_columns,
+            'textColumns': [i for i in range(len(columns)) if i not in numeric_columns],
+        }
+
+        score_filter = '最低风险评分: <input type="number" min="0" max="1" step="0.05">' if score_column is not None else ''
+        self._file.write(
+            f'<div class="section">\n<h2>{html.escape(title)}</h2>\n'
+            f'<div class="table-controls" id="{table_id}-controls">'
+            f'筛选: <input type="search" placeholder="账单编号、营业厅、操作员…">{score_filter}'
+            f'<span class="table-info"></span></div>\n'
+            f'<table class="risk-table" id="{table_id}">\n<thead>\n<tr>'
+            + ''.join(f'<th>{html.escape(column)}</th>' for column in columns)
+            + '</tr>\n</thead>\n<tbody></tbody>\n</table>\n'
+            f'<div class="table-pager" id="{table_id}-pager">'
+            f'<button type="button">上一页</button> <span></span> <button type="button">下一页</button></div>\n'
+        )
+        for start in range(0, len(data), chunk_size):
+            chunk = _table_chunk_json(data.iloc[start:start + chunk_size], decimals)
+            self._file.write(f'<script type="application/json" data-table="{table_id}">{chunk}</script>\n')
+        self._file.write(f'<script>reportTable("{table_id}", {json.dumps(options)});</script>\n</div>\n')
+
+
+def _table_chunk_json(chunk: pd.DataFrame, decimals: int) -> str:
+    """数据块转为按列排列的 JSON 数组，缺失值为 null，时间格式化为文本"""
+    columns = []
+    for column in chunk.columns:
+        values = chunk[column]
+        if pd.api.types.is_float_dtype(values):
+            rounded = np.round(values.to_numpy(dtype=np.float64), decimals)
+            columns.append([None if value != value else value for value in rounded.tolist()])
+        elif pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            columns.append(values.tolist())
+        elif pd.api.types.is_datetime64_any_dtype(values):
+            columns.append(values.dt.strftime('%Y-%m-%d %H:%M:%S').astype(object).where(values.notna(), None).tolist())
+        else:
+            columns.append(values.astype(object).where(values.notna(), None).map(
+                lambda value: value if value is None else str(value)).tolist())
+    # 避免数据中的 </script> 提前结束脚本块
+    return json.dumps(columns, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
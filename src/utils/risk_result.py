@@ -0,0 +1,311 @@
+"""
+风险评分结果模块
+以与账单行对齐的 NumPy 数组保存综合风险评分和各维度异常度，
+同时保留 {账单编号: 风险分数} 字典的只读访问方式
+"""
+
+import pandas as pd
+import numpy as np
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# 各维度异常度列，顺序与风险权重一致，最后为特殊模式加成
+COMPONENT_FIELDS = ['amount_anomaly', 'frequency_anomaly', 'time_anomaly',
+                    'operator_anomaly', 'special_pattern_boost']
+
+# 风险等级分界：[0, 0.3) 低风险，[0.3, 0.7) 中风险，[0.7, 1.0] 高风险
+RISK_BAND_EDGES = (0.3, 0.7)
+RISK_BAND_LABELS = ['0-0.3', '0.3-0.7', '0.7-1.0']
+
+
+class RiskResult(Mapping):
+    """
+    列式风险评分结果
+
+    数组与评分时的账单行一一对应；按字典方式访问时键为 str(账单编号)，
+    账单编号重复时与原字典结果一样每个编号只出现一次（按首次出现顺序），评分以最后一条为准，
+    因此 len()、keys()、values()、items() 与 to_dict() 一致，可能少于数组行数。
+    """
+
+    def __init__(self, bill_ids: np.ndarray, risk_score: np.ndarray,
+                 components: Optional[Dict[str, np.ndarray]] = None,
+                 index: Optional[pd.Index] = None):
+        """
+        初始化评分结果
+
+        Args:
+            bill_ids: 账单编号（原始值，不做字符串转换）
+            risk_score: 综合风险评分
+            components: 可选，各维度异常度 {列名: 数组}
+            index: 可选，评分时账单数据的行索引，用于拼接回原数据
+        """
+        self.bill_ids = np.asarray(bill_ids)
+        self.risk_score = np.asarray(risk_score, dtype=np.float64)
+        self.components = dict(components or {})
+        self.index = index if index is not None else pd.RangeIndex(len(self.risk_score))
+        self._lookup = None
+        self._lookup_positions = None
+
+    @classmethod
+    def from_components(cls, data: pd.DataFrame, components: Dict[str, np.ndarray]) -> 'RiskResult':
+        """
+        由列式评分引擎的输出构造结果
+
+        Args:
+            data: 评分的账单数据
+            components: _score_components 返回的数组字典
+
+        Returns:
+            评分结果
+        """
+        return cls(
+            data['账单编号'].to_numpy(),
+            components['risk_score'],
+            {name: components[name] for name in COMPONENT_FIELDS if name in components},
+            data.index
+        )
+
+    @classmethod
+    def from_scores(cls, risk_scores: Any) -> 'RiskResult':
+        """
+        将风险评分字典转换为评分结果，已是 RiskResult 时原样返回
+
+        Args:
+            risk_scores: RiskResult 或 {账单编号: 风险分数} 字典
+
+        Returns:
+            评分结果
+        """
+        if isinstance(risk_scores, RiskResult):
+            return risk_scores
+        bill_ids = np.asarray(list(risk_scores.keys()), dtype=object)
+        risk_score = np.fromiter(risk_scores.values(), dtype=np.float64, count=len(risk_scores))
+        return cls(bill_ids, risk_score)
+
+    @classmethod
+    def concat(cls, results: List['RiskResult']) -> 'RiskResult':
+        """按顺序拼接多个评分结果（如流式检测的各块）"""
+        if not results:
+            return cls(np.array([], dtype=object), np.array([]))
+        names = [name for name in COMPONENT_FIELDS if all(name in r.components for r in results)]
+        return cls(
+            np.concatenate([r.bill_ids for r in results]),
+            np.concatenate([r.risk_score for r in results]),
+            {name: np.concatenate([r.components[name] for r in results]) for name in names},
+            results[0].index.append([r.index for r in results[1:]])
+        )
+
+    # ---- 字典兼容接口 ----
+
+    def __len__(self) -> int:
+        return len(self._key_lookup())
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __getitem__(self, bill_id: str) -> float:
+        position = self._key_lookup().get_indexer([bill_id])[0]
+        if position < 0:
+            raise KeyError(bill_id)
+        return float(self.risk_score[self._lookup_positions[position]])
+
+    def __contains__(self, bill_id: Any) -> bool:
+        return self._key_lookup().get_indexer([bill_id])[0] >= 0
+
+    def keys(self) -> List[str]:
+        """账单编号字符串列表（去重，按首次出现顺序）"""
+        return self._key_lookup().tolist()
+
+    def values(self) -> List[float]:
+        """风险评分列表（与 keys() 对齐，重复编号取最后一条）"""
+        self._key_lookup()
+        return self.risk_score[self._lookup_positions].tolist()
+
+    def items(self) -> Iterator[Tuple[str, float]]:
+        return zip(self.keys(), self.values())
+
+    def to_dict(self) -> Dict[str, float]:
+        """转换为 {账单编号: 风险分数} 字典"""
+        return dict(self.items())
+
+    def deduplicated(self) -> 'RiskResult':
+        """
+        每个账单编号只保留一行（评分取最后一条，按首次出现顺序），与字典视图一致
+
+        Returns:
+            去重后的评分结果，没有重复编号时返回自身
+        """
+        self._key_lookup()
+        if len(self._lookup_positions) == len(self.risk_score):
+            return self
+        positions = self._lookup_positions
+        return RiskResult(
+            self.bill_ids[positions],
+            self.risk_score[positions],
+            {name: values[positions] for name, values in self.components.items()},
+            self.index[positions]
+        )
+
+    def take(self, positions: np.ndarray) -> 'RiskResult':
+        """
+        按行号取出部分记录（含各维度异常度和行索引）
+
+        Args:
+            positions: 行号数组
+
+        Returns:
+            子集评分结果
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        return RiskResult(
+            self.bill_ids[positions],
+            self.risk_score[positions],
+            {name: values[positions] for name, values in self.components.items()},
+            self.index[positions]
+        )
+
+    def align(self, data: pd.DataFrame, default: float = 0.0) -> 'RiskResult':
+        """
+        取与 data 行对齐的评分结果
+
+        data 正是评分时的账单数据时返回自身；否则按账单编号查找，
+        未评分账单的风险评分取 default，各维度异常度为 NaN。
+
+        Args:
+            data: 账单数据
+            default: 未评分账单的默认分数
+
+        Returns:
+            与 data 逐行对应的评分结果
+        """
+        positions = self._positions_for(data)
+        if positions is None:
+            return self
+        found = positions >= 0
+        return RiskResult(
+            data['账单编号'].to_numpy(),
+            np.where(found, self.risk_score[positions], default) if len(self.risk_score) else np.full(len(data), default),
+            {name: np.where(found, values[positions], np.nan) if len(values) else np.full(len(data), np.nan)
+             for name, values in self.components.items()},
+            data.index
+        )
+
+    def _key_lookup(self) -> pd.Index:
+        """
+        去重后的账单编号字符串索引（按首次出现顺序），_lookup_positions 为各编号最后一条记录的行号；
+        首次按键访问时建立
+        """
+        if self._lookup is None:
+            keys = np.asarray(list(map(str, self.bill_ids.tolist())), dtype=object)
+            codes, uniques = pd.factorize(keys)
+            if len(uniques) == len(keys):
+                positions = np.arange(len(keys))
+            else:
+                positions = np.zeros(len(uniques), dtype=np.int64)
+                np.maximum.at(positions, codes, np.arange(len(keys)))
+            self._lookup = pd.Index(uniques, dtype=object)
+            self._lookup_positions = positions
+        return self._lookup
+
+    # ---- 列式查询 ----
+
+    def top_k(self, k: int, threshold: Optional[float] = None) -> np.ndarray:
+        """
+        风险评分最高的 k 条记录的行号
+
+        先用 argpartition 选出前 k 条再排序，无需对全部记录排序。
+
+        Args:
+            k: 返回的记录数
+            threshold: 可选，只返回评分不低于该阈值的记录
+
+        Returns:
+            按风险评分降序排列的行号数组
+        """
+        candidates = np.arange(len(self.risk_score))
+        if threshold is not None:
+            candidates = np.flatnonzero(self.risk_score >= threshold)
+        k = min(k, len(candidates))
+        if k <= 0:
+            return np.array([], dtype=np.int64)
+        if k < len(candidates):
+            candidates = candidates[np.argpartition(-self.risk_score[candidates], k - 1)[:k]]
+            candidates.sort()
+        # 稳定排序：评分相同时保持原行顺序
+        return candidates[np.argsort(-self.risk_score[candidates], kind='stable')]
+
+    def high_risk_records(self, threshold: float = 0.7,
+                          limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        高风险记录列表
+
+        Args:
+            threshold: 高风险阈值
+            limit: 可选，最多返回的记录数
+
+        Returns:
+            按风险评分降序排列的 [(账单编号, 风险评分)]
+        """
+        k = len(self.risk_score) if limit is None else limit
+        positions = self.top_k(k, threshold)
+        bill_ids = map(str, self.bill_ids[positions].tolist())
+        return list(zip(bill_ids, self.risk_score[positions].tolist()))
+
+    def band_counts(self) -> Dict[str, int]:
+        """
+        各风险等级的记录数，由一次直方图统计得到
+
+        Returns:
+            {'0-0.3': 数量, '0.3-0.7': 数量, '0.7-1.0': 数量}
+        """
+        bands = np.searchsorted(RISK_BAND_EDGES, self.risk_score, side='right')
+        counts = np.bincount(bands, minlength=len(RISK_BAND_LABELS))
+        return dict(zip(RISK_BAND_LABELS, counts.tolist()))
+
+    def scores_for(self, data: pd.DataFrame, default: float = 0.0) -> np.ndarray:
+        """
+        取与 data 行对齐的风险评分
+
+        data 正是评分时的账单数据时直接返回评分数组（不复制）；
+        否则按账单编号查找，未评分的账单取 default。
+
+        Args:
+            data: 账单数据
+            default: 未评分账单的默认分数
+
+        Returns:
+            与 data 行对齐的风险评分数组
+        """
+        positions = self._positions_for(data)
+        if positions is None:
+            return self.risk_score
+        return np.where(positions >= 0, self.risk_score[positions], default)
+
+    def join(self, data: pd.DataFrame, components: bool = True) -> pd.DataFrame:
+        """
+        将风险评分（及各维度异常度）作为新列拼接到账单数据上
+
+        Args:
+            data: 账单数据
+            components: 是否同时拼接各维度异常度
+
+        Returns:
+            新增 风险评分 及各维度异常度列的数据框（原数据列不复制）
+        """
+        positions = self._positions_for(data)
+        columns = {'风险评分': self.risk_score}
+        if components:
+            columns.update(self.components)
+        if positions is not None:
+            columns = {name: np.where(positions >= 0, values[positions], np.nan)
+                       for name, values in columns.items()}
+        return data.assign(**columns)
+
+    def _positions_for(self, data: pd.DataFrame) -> Optional[np.ndarray]:
+        """data 与结果行对齐时返回 None，否则返回各行在结果中的行号（未评分为 -1）"""
+        bill_ids = data['账单编号'].to_numpy()
+        if len(bill_ids) == len(self.bill_ids) and data.index.equals(self.index) and \
+                (bill_ids is self.bill_ids or np.array_equal(bill_ids, self.bill_ids)):
+            return None
+        positions = self._key_lookup().get_indexer(list(map(str, bill_ids.tolist())))
+        return np.where(positions >= 0, self._lookup_positions[positions], -1)
@@ -0,0 +1,173 @@
+"""
+时间解析模块
+按列识别一次时间格式后整列解析，Excel 序列日期按算术换算；检测用到的日期、小时、星期由时间戳算术得到
+"""
+
+import pandas as pd
+import numpy as np
+from typing import Dict, Optional
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 常见的导出时间格式，按优先顺序尝试
+CANDIDATE_FORMATS = [
+    '%Y-%m-%d %H:%M:%S',
+    '%Y/%m/%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M:%S.%f',
+    '%Y-%m-%d %H:%M',
+    '%Y/%m/%d %H:%M',
+    '%Y-%m-%d',
+    '%Y/%m/%d',
+    '%Y%m%d%H%M%S',
+    '%Y%m%d',
+]
+
+# Excel 序列日期的零点（1900 日期系统，已包含 1900-02-29 的偏差）
+EXCEL_EPOCH = pd.Timestamp('1899-12-30')
+
+# 视为 Excel 序列日期的数值范围（1900-01-01 至 2173 年）
+EXCEL_SERIAL_RANGE = (1, 100000)
+
+# 逐个推断格式的参数：pandas 2.0 起需显式指定 format='mixed'，1.x 不指定格式时即逐个推断
+MIXED_FORMAT = {'format': 'mixed'} if int(pd.__version__.split('.')[0]) >= 2 else {}
+
+
+def detect_datetime_format(values: pd.Series, sample_size: int = 100) -> Optional[str]:
+    """
+    用列中的前若干个字符串值识别时间格式
+
+    Args:
+        values: 字符串值
+        sample_size: 参与识别的样本数
+
+    Returns:
+        所有样本都能解析的第一个候选格式，均不匹配时为 None
+    """
+    sample = [value.strip() for value in values.head(sample_size).tolist()]
+    for fmt in CANDIDATE_FORMATS:
+        try:
+            for value in sample:
+                datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        return fmt
+    return None
+
+
+def excel_serial_to_datetime(serial: pd.Series) -> pd.Series:
+    """
+    将 Excel 序列日期（自 1899-12-30 起的天数，小数部分为时刻）换算为时间
+
+    Args:
+        serial: 序列日期数值
+
+    Returns:
+        时间列，超出合理范围的值为 NaT
+    """
+    serial = pd.to_numeric(serial, errors='coerce')
+    low, high = EXCEL_SERIAL_RANGE
+    serial = serial.where((serial >= low) & (serial < high))
+    # 换算到毫秒并取整，消除浮点误差（Excel 的时刻精度为毫秒）
+    milliseconds = (serial * 86400000).round()
+    return EXCEL_EPOCH + pd.to_timedelta(milliseconds, unit='ms')
+
+
+def parse_datetime_column(values: pd.Series) -> pd.Series:
+    """
+    解析时间列
+
+    已是时间类型时原样返回；数值列按 Excel 序列日期换算；
+    文本列先识别一次格式再整列按固定格式解析，与格式不符的少量值逐个推断，
+    仍无法解析的纯数字文本按 Excel 序列日期处理。
+
+    Args:
+        values: 原始时间列（文本、时间对象或 Excel 序列日期混合均可）
+
+    Returns:
+        datetime64 类型的时间列，与输入行对齐，无法解析的值为 NaT
+    """
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return values
+    if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+        return excel_serial_to_datetime(values)
+
+    # 纯文本列（最常见）整列解析，混合列按值类型分别处理
+    if pd.api.types.infer_dtype(values, skipna=True) in ('string', 'empty'):
+        return _parse_text(values)
+
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    kinds = values.map(type)
+    is_text = kinds == str
+    is_number = kinds.isin([int, float, np.int64, np.float64]) & values.notna()
+    is_datetime = values.notna() & ~is_text & ~is_number
+
+    if is_datetime.any():
+        parsed[is_datetime] = pd.to_datetime(values[is_datetime], errors='coerce')
+    if is_number.any():
+        parsed[is_number] = excel_serial_to_datetime(values[is_number].astype(float))
+    if is_text.any():
+        parsed[is_text] = _parse_text(values[is_text])
+    return parsed
+
+
+def _parse_text(text: pd.Series) -> pd.Series:
+    """按识别出的格式整列解析文本时间，与格式不符的值逐个推断，纯数字文本视为 Excel 序列日期"""
+    sample = text.head(1000).dropna()
+    if sample.str.strip().ne(sample).any():
+        text = text.str.strip()
+        sample = text.head(1000).dropna()
+
+    fmt = detect_datetime_format(sample)
+    if fmt is not None:
+        parsed = pd.to_datetime(text, format=fmt, errors='coerce')
+    else:
+        parsed = pd.Series(pd.NaT, index=text.index, dtype='datetime64[ns]')
+
+    # 只在有未解析的值时再区分空值和格式不符的值
+    leftover = parsed.isna().to_numpy(copy=True)
+    if leftover.any():
+        leftover[leftover] = (text[leftover].notna() & (text[leftover] != '')).to_numpy()
+    if leftover.any():
+        remaining = text[leftover]
+        inferred = pd.to_datetime(remaining, errors='coerce', **MIXED_FORMAT)
+        parsed[leftover] = inferred.fillna(excel_serial_to_datetime(remaining))
+        if fmt is not None:
+            logger.info(f"{int(leftover.sum())} 个时间值与格式 {fmt} 不符，已逐个解析")
+    return parsed
+
+
+def time_features(data: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    由操作时间计算检测用的时间特征
+
+    直接在 datetime64 数组上做整数运算，不经过 .dt 访问器，也不读取数据中的同名列，
+    操作时间修改后结果随之更新。
+
+    Args:
+        data: 账单数据
+
+    Returns:
+        {'time': 时间戳, 'date': 日期, 'hour': 小时, 'weekday': 星期}，时间缺失时小时和星期为 -1
+    """
+    operation_time = pd.to_datetime(data['操作时间'])
+    if getattr(operation_time.dtype, 'tz', None) is not None:
+        operation_time = operation_time.dt.tz_localize(None)
+    times = operation_time.to_numpy(dtype='datetime64[ns]')
+    missing = np.isnat(times)
+
+    days = times.astype('datetime64[D]')
+    dates = days.astype('datetime64[ns]')
+    with np.errstate(invalid='ignore'):
+        hour = (times - dates) // np.timedelta64(1, 'h')
+    # 1970-01-01 为星期四
+    weekday = (days.astype(np.int64) + 3) % 7
+
+    return {
+        'time': times,
+        'date': dates,
+        'hour': np.where(missing, -1, hour).astype(np.int64),
+        'weekday': np.where(missing, -1, weekday).astype(np.int64),
+    }
@@ -8,13 +8,219 @@ import plotly.express as px
 from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 import json
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+import os
+import re
 import logging
 
+try:
+    from .risk_result import RiskResult, RISK_BAND_EDGES, COMPONENT_FIELDS
+    from .aggregates import AggregateCache
+    from .report_writer import HtmlReportWriter, write_plotly_asset
+except ImportError:  # 以 utils 目录为搜索路径直接导入 visualize 时
+    from risk_result import RiskResult, RISK_BAND_EDGES, COMPONENT_FIELDS
+    from aggregates import AggregateCache
+    from report_writer import HtmlReportWriter, write_plotly_asset
+
 logger = logging.getLogger(__name__)
 
+# 时间轴每个序列默认的点数预算，超过时改用 WebGL 绘制并降采样
+TIMELINE_MAX_POINTS = 20000
+
+# risk_group_stats 输出的按组风险评分统计列，图表也接受这种结构的预聚合统计表
+RISK_STATS_COLUMNS = ['count', 'mean', 'std', 'min', 'max', 'high_risk_count',
+                      'q1', 'median', 'q3', 'lowerfence', 'upperfence']
+
+# 报告高风险清单中的账单列及各维度异常度的表头
+HIGH_RISK_COLUMNS = ['账单编号', '营业厅编号', '操作员ID', '业务类型', '费用金额', '操作时间']
+COMPONENT_LABELS = {
+    'amount_anomaly': '金额异常度',
+    'frequency_anomaly': '频率异常度',
+    'time_anomaly': '时间异常度',
+    'operator_anomaly': '操作员异常度',
+    'special_pattern_boost': '特殊模式加成',
+}
+
+
+def risk_group_stats(data: pd.DataFrame, risk_scores: RiskResult, key: str,
+                     aggregates: Optional[AggregateCache] = None,
+                     high_risk_threshold: float = 0.7) -> pd.DataFrame:
+    """
+    按键汇总风险评分：一次评分对齐，一次分组聚合
+    
+    Args:
+        data: 账单数据
+        risk_scores: 评分结果或风险评分字典，未评分的账单按 0 计
+        key: 分组列名（如 操作员ID、业务类型、营业厅编号）
+        aggregates: 可选，data 上的聚合缓存，复用其中的分组编码
+        high_risk_threshold: 计入 high_risk_count 的评分下限
+        
+    Returns:
+        以键为索引、列为 RISK_STATS_COLUMNS 的统计表，按键首次出现的顺序排列；
+        分位数按线性插值计算，须线为距四分位数 1.5 倍四分位距以内的最远评分
+    """
+    aggregates = _aggregates_for(data, aggregates)
+    scores = RiskResult.from_scores(risk_scores).scores_for(data)
+    codes, keys = aggregates.group_codes(key)
+    moments = aggregates.value_stats(key, scores)
+    high_risk = aggregates.value_stats(key, (scores >= high_risk_threshold).astype(np.float64))
+    
+    # 按 (分组, 评分) 排序一次，各组分位数直接按下标取得
+    valid = codes >= 0
+    order = np.lexsort((scores[valid], codes[valid]))
+    sorted_codes = codes[valid][order]
+    sorted_scores = scores[valid][order]
+    starts = np.searchsorted(sorted_codes, np.arange(len(keys) + 1))
+    sizes = np.diff(starts)
+    
+    def quantile(q: float) -> np.ndarray:
+        position = starts[:-1] + q * (sizes - 1)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        return sorted_scores[lower] + (sorted_scores[upper] - sorted_scores[lower]) * (position - lower)
+    
+    if len(keys):
+        q1, median, q3 = quantile(0.25), quantile(0.5), quantile(0.75)
+        reach = 1.5 * (q3 - q1)
+        lowerfence = np.minimum.reduceat(
+            np.where(sorted_scores >= (q1 - reach)[sorted_codes], sorted_scores, np.inf), starts[:-1]
+        )
+        upperfence = np.maximum.reduceat(
+            np.where(sorted_scores <= (q3 + reach)[sorted_codes], sorted_scores, -np.inf), starts[:-1]
+        )
+    else:
+        q1 = median = q3 = lowerfence = upperfence = np.empty(0)
+    
+    return pd.DataFrame({
+        'count': moments['size'].to_numpy(),
+        'mean': moments['mean'].to_numpy(),
+        'std': moments['std'].to_numpy(),
+        'min': moments['min'].to_numpy(),
+        'max': moments['max'].to_numpy(),
+        'high_risk_count': high_risk['sum'].to_numpy().astype(np.int64),
+        'q1': q1, 'median': median, 'q3': q3,
+        'lowerfence': lowerfence, 'upperfence': upperfence,
+    }, index=keys)
+
+
+def downsample_minmax(x: np.ndarray, y: np.ndarray, max_points: int,
+                      keep: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    按时间等宽分桶，每桶保留 y 的最小值和最大值点，保持曲线的峰谷形状
+    
+    Args:
+        x: 时间（datetime64）
+        y: 数值
+        max_points: 点数预算，桶数为预算扣除必留点后的一半
+        keep: 可选，必须保留的点（如高风险账单），必留点多于预算时全部保留
+        
+    Returns:
+        保留点的行号，按时间排序；时间或数值缺失的点不保留
+    """
+    ticks = np.asarray(x, dtype='datetime64[ns]')
+    y = np.asarray(y, dtype=np.float64)
+    valid = ~np.isnat(ticks) & ~np.isnan(y)
+    keep = np.zeros(len(y), dtype=bool) if keep is None else valid & np.asarray(keep, dtype=bool)
+    positions = np.flatnonzero(valid)
+    
+    buckets = max((max_points - int(keep.sum())) // 2, 0)
+    if len(positions) <= max_points or buckets == 0:
+        selected = positions if len(positions) <= max_points else np.flatnonzero(keep)
+    else:
+        t = ticks[positions].view(np.int64)
+        span = max(int(t.max()) - int(t.min()), 1)
+        bucket = np.minimum(((t - t.min()) / span * buckets).astype(np.int64), buckets - 1)
+        # 按 (桶, 数值) 排序后，每桶首个为最小值、末个为最大值
+        order = np.lexsort((y[positions], bucket))
+        sorted_bucket = bucket[order]
+        first = np.flatnonzero(np.r_[True, sorted_bucket[1:] != sorted_bucket[:-1]])
+        last = np.r_[first[1:] - 1, len(order) - 1]
+        selected = np.union1d(positions[order[np.r_[first, last]]], np.flatnonzero(keep))
+    
+    return selected[np.argsort(ticks[selected], kind='stable')]
+
+
+def risk_outliers(data: pd.DataFrame, risk_scores: RiskResult, key: str,
+                  stats: Optional[pd.DataFrame] = None,
+                  aggregates: Optional[AggregateCache] = None,
+                  max_per_group: int = 200) -> pd.DataFrame:
+    """
+    各组须线以外的评分（箱线图的离群点）
+    
+    Args:
+        data: 账单数据
+        risk_scores: 评分结果或风险评分字典，未评分的账单按 0 计
+        key: 分组列名
+        stats: 可选，risk_group_stats 对同一数据和键的结果，未传时重新计算
+        aggregates: 可选，data 上的聚合缓存，复用其中的分组编码
+        max_per_group: 每组最多保留的离群点数，偏离中位数最远的优先
+        
+    Returns:
+        离群点表，列为 key、账单编号、风险评分，按组首次出现的顺序、组内按偏离程度降序排列
+    """
+    aggregates = _aggregates_for(data, aggregates)
+    if stats is None:
+        stats = risk_group_stats(data, risk_scores, key, aggregates)
+    scores = RiskResult.from_scores(risk_scores).scores_for(data)
+    codes, keys = aggregates.group_codes(key)
+    if not len(keys):
+        return pd.DataFrame({key: [], '账单编号': [], '风险评分': []})
+    
+    group = np.where(codes >= 0, codes, 0)
+    beyond = (scores < stats['lowerfence'].to_numpy()[group]) | (scores > stats['upperfence'].to_numpy()[group])
+    rows = np.flatnonzero((codes >= 0) & beyond)
+    
+    # 按 (组, 偏离中位数的程度降序) 排序后，每组取前 max_per_group 条
+    deviation = np.abs(scores[rows] - stats['median'].to_numpy()[codes[rows]])
+    rows = rows[np.lexsort((-deviation, codes[rows]))]
+    sorted_codes = codes[rows]
+    rank = np.arange(len(rows)) - np.searchsorted(sorted_codes, sorted_codes)
+    rows = rows[rank < max_per_group]
+    
+    return pd.DataFrame({
+        key: keys[codes[rows]],
+        '账单编号': data['账单编号'].to_numpy()[rows],
+        '风险评分': scores[rows],
+    })
+
+
+def high_risk_table(data: pd.DataFrame, risk_scores: RiskResult,
+                    high_risk_threshold: float = 0.7) -> pd.DataFrame:
+    """
+    全部高风险账单的清单，按风险评分降序排列
+    
+    Args:
+        data: 账单数据
+        risk_scores: 评分结果或风险评分字典，未评分的账单不列入
+        high_risk_threshold: 高风险阈值
+        
+    Returns:
+        清单表：排名、账单列（HIGH_RISK_COLUMNS 中 data 含有的列）、风险评分及各维度异常度
+    """
+    result = RiskResult.from_scores(risk_scores)
+    joined = result.join(data, components=True)
+    scores = joined['风险评分'].to_numpy(dtype=np.float64)
+    rows = np.flatnonzero(scores >= high_risk_threshold)
+    # 稳定排序：评分相同时保持原行顺序
+    rows = rows[np.argsort(-scores[rows], kind='stable')]
+    
+    flagged = joined.iloc[rows]
+    columns = [column for column in HIGH_RISK_COLUMNS if column in flagged.columns]
+    components = [name for name in COMPONENT_FIELDS if name in flagged.columns]
+    table = flagged[columns + ['风险评分'] + components].rename(columns=COMPONENT_LABELS)
+    table.insert(0, '排名', np.arange(1, len(table) + 1))
+    return table.reset_index(drop=True)
+
+
+def _aggregates_for(data: pd.DataFrame, aggregates: Optional[AggregateCache]) -> AggregateCache:
+    """沿用传入的聚合缓存（须建立在同一份数据上），否则新建"""
+    if aggregates is None or aggregates.data is not data:
+        return AggregateCache(data)
+    return aggregates
+
 
 class AnomalyVisualizer:
     """异常检测结果可视化器"""
@@ -31,19 +237,45 @@ class AnomalyVisualizer:
     
     def create_anomaly_timeline(self, 
                                data: pd.DataFrame,
-                               risk_scores: Dict[str, float],
-                               baseline_data: Optional[pd.DataFrame] = None) -> go.Figure:
+                               risk_scores: RiskResult,
+                               baseline_data: Optional[pd.DataFrame] = None,
+                               max_points: int = TIMELINE_MAX_POINTS,
+                               high_risk_threshold: float = 0.7) -> go.Figure:
         """
         创建异常时间轴图
         
+        数据量超过 max_points 时进入大数据模式：散点改用 WebGL（Scattergl）绘制，
+        金额和风险评分序列按时间分桶保留最小/最大值点，高风险账单始终全部保留。
+        
         Args:
             data: 账单数据
-            risk_scores: 风险评分字典 {账单编号: 风险分数}
+            risk_scores: 评分结果或风险评分字典 {账单编号: 风险分数}
             baseline_data: 基线数据
+            max_points: 每个序列的点数预算
+            high_risk_threshold: 降采样时必须保留的风险评分下限
             
         Returns:
             Plotly图表对象
         """
+        scores = RiskResult.from_scores(risk_scores).scores_for(data)
+        times = pd.to_datetime(data['操作时间']).to_numpy(dtype='datetime64[ns]')
+        amounts = pd.to_numeric(data['费用金额'], errors='coerce').to_numpy(dtype=np.float64)
+        bill_ids = data['账单编号'].to_numpy()
+        
+        large = len(data) > max_points
+        scatter = go.Scattergl if large else go.Scatter
+        high_risk = scores >= high_risk_threshold
+        if large:
+            amount_rows = downsample_minmax(times, amounts, max_points, keep=high_risk)
+            risk_rows = downsample_minmax(times, scores, max_points, keep=high_risk)
+            logger.info(f"时间轴共 {len(data)} 个点，降采样为金额 {len(amount_rows)} 点、风险评分 {len(risk_rows)} 点")
+        else:
+            amount_rows = risk_rows = slice(None)
+        
+        # 按风险等级取颜色
+        band_colors = np.array([self.colors['low_risk'], self.colors['medium_risk'], self.colors['high_risk']])
+        colors = band_colors[np.digitize(scores[amount_rows], RISK_BAND_EDGES)]
+        
         # 创建子图
         fig = make_subplots(
             rows=3, cols=1,
@@ -54,32 +286,35 @@ class AnomalyVisualizer:
         
         # 添加费用金额趋势
         fig.add_trace(
-            go.Scatter(
-                x=data['操作时间'],
-                y=data['费用金额'],
+            scatter(
+                x=times[amount_rows],
+                y=amounts[amount_rows],
                 mode='markers',
                 marker=dict(
                     size=8,
-                    color=[self._get_risk_color(risk_scores.get(str(bill_id), 0)) 
-                           for bill_id in data['账单编号']],
-                    colorscale='RdYlGn_r'
+                    color=colors
                 ),
                 name='费用金额',
-                hovertemplate='<b>账单编号:</b> %{customdata}<br>' +
+                hovertemplate='<b>账单编号:</b> %{customdata[0]}<br>' +
                             '<b>时间:</b> %{x}<br>' +
                             '<b>金额:</b> %{y:.2f}<br>' +
-                            '<b>风险评分:</b> %{marker.color}<extra></extra>',
-                customdata=data['账单编号']
+                            '<b>风险评分:</b> %{customdata[1]:.3f}<extra></extra>',
+                customdata=np.column_stack([bill_ids[amount_rows], scores[amount_rows]])
             ),
             row=1, col=1
         )
         
         # 添加基线（如果有）
         if baseline_data is not None:
+            baseline_times = pd.to_datetime(baseline_data['操作时间']).to_numpy(dtype='datetime64[ns]')
+            baseline_amounts = pd.to_numeric(baseline_data['费用金额'], errors='coerce').to_numpy(dtype=np.float64)
+            baseline_rows = slice(None)
+            if len(baseline_data) > max_points:
+                baseline_rows = downsample_minmax(baseline_times, baseline_amounts, max_points)
             fig.add_trace(
-                go.Scatter(
-                    x=baseline_data['操作时间'],
-                    y=baseline_data['费用金额'],
+                scatter(
+                    x=baseline_times[baseline_rows],
+                    y=baseline_amounts[baseline_rows],
                     mode='lines',
                     line=dict(color=self.colors['baseline'], width=2, dash='dash'),
                     name='历史基线',
@@ -89,11 +324,13 @@ class AnomalyVisualizer:
             )
         
         # 添加操作频率
-        hourly_counts = data.groupby(data['操作时间'].dt.hour).size()
+        hours = pd.Series(times).dt.hour.dropna().to_numpy(dtype=np.int64)
+        hourly_counts = np.bincount(hours, minlength=24)
+        active_hours = np.flatnonzero(hourly_counts)
         fig.add_trace(
             go.Bar(
-                x=hourly_counts.index,
-                y=hourly_counts.values,
+                x=active_hours,
+                y=hourly_counts[active_hours],
                 name='操作频率',
                 marker_color=self.colors['normal'],
                 hovertemplate='<b>小时:</b> %{x}:00<br>' +
@@ -103,12 +340,10 @@ class AnomalyVisualizer:
         )
         
         # 添加风险评分时间轴
-        risk_data = [(data.iloc[i]['操作时间'], risk_scores.get(str(data.iloc[i]['账单编号']), 0))
-                    for i in range(len(data))]
-        risk_times, risk_values = zip(*risk_data)
+        risk_times, risk_values = times[risk_rows], scores[risk_rows]
         
         fig.add_trace(
-            go.Scatter(
+            scatter(
                 x=risk_times,
                 y=risk_values,
                 mode='markers+lines',
@@ -136,9 +371,10 @@ class AnomalyVisualizer:
         )
         
         # 更新x轴标签
-        fig.update_xaxes(title_text="时间", row=3, col=1)
+        # 时间轴声明为日期类型，写出报告时时间坐标按毫秒时间戳编码
+        fig.update_xaxes(title_text="时间", type='date', row=3, col=1)
         fig.update_xaxes(title_text="小时", row=2, col=1)
-        fig.update_xaxes(title_text="时间", row=1, col=1)
+        fig.update_xaxes(title_text="时间", type='date', row=1, col=1)
         
         # 更新y轴标签
         fig.update_yaxes(title_text="费用金额 (元)", row=1, col=1)
@@ -147,29 +383,26 @@ class AnomalyVisualizer:
         
         return fig
     
-    def create_risk_distribution(self, risk_scores: Dict[str, float]) -> go.Figure:
+    def create_risk_distribution(self, risk_scores: RiskResult) -> go.Figure:
         """
         创建风险分布图
         
         Args:
-            risk_scores: 风险评分字典
+            risk_scores: 评分结果或风险评分字典
             
         Returns:
             Plotly图表对象
         """
-        risk_values = list(risk_scores.values())
-        
-        # 定义风险等级
-        low_risk = [v for v in risk_values if v < 0.3]
-        medium_risk = [v for v in risk_values if 0.3 <= v < 0.7]
-        high_risk = [v for v in risk_values if v >= 0.7]
+        risk_values = RiskResult.from_scores(risk_scores).risk_score
         
         fig = go.Figure()
         
-        # 添加风险分布直方图
-        fig.add_trace(go.Histogram(
-            x=risk_values,
-            nbinsx=20,
+        # 添加风险分布直方图（先分箱计数，图表数据量与评分条数无关）
+        counts, edges = np.histogram(np.clip(risk_values, 0.0, 1.0), bins=20, range=(0.0, 1.0))
+        fig.add_trace(go.Bar(
+            x=(edges[:-1] + edges[1:]) / 2,
+            y=counts,
+            width=np.diff(edges),
             name='风险分布',
             marker_color='lightblue',
             opacity=0.7
@@ -191,43 +424,28 @@ class AnomalyVisualizer:
         return fig
     
     def create_operator_analysis(self, data: pd.DataFrame, 
-                                risk_scores: Dict[str, float]) -> go.Figure:
+                                risk_scores: Optional[RiskResult] = None,
+                                aggregates: Optional[AggregateCache] = None) -> go.Figure:
         """
         创建操作员分析图
         
         Args:
-            data: 账单数据
-            risk_scores: 风险评分字典
+            data: 账单数据；或 risk_group_stats(..., '操作员ID') 得到的预聚合统计表，此时不传 risk_scores
+            risk_scores: 评分结果或风险评分字典
+            aggregates: 可选，data 上的聚合缓存，复用其中的操作员分组
             
         Returns:
             Plotly图表对象
         """
         # 计算每个操作员的风险统计
-        operator_risks = {}
-        for _, row in data.iterrows():
-            operator_id = row['操作员ID']
-            bill_id = str(row['账单编号'])
-            risk_score = risk_scores.get(bill_id, 0)
-            
-            if operator_id not in operator_risks:
-                operator_risks[operator_id] = []
-            operator_risks[operator_id].append(risk_score)
-        
-        # 计算统计指标
-        operator_stats = {}
-        for operator_id, risks in operator_risks.items():
-            operator_stats[operator_id] = {
-                'avg_risk': np.mean(risks),
-                'max_risk': np.max(risks),
-                'high_risk_count': sum(1 for r in risks if r >= 0.7),
-                'total_operations': len(risks)
-            }
+        operator_stats = self._risk_stats(data, risk_scores, '操作员ID', aggregates,
+                                          ['count', 'mean', 'high_risk_count'])
         
         # 创建散点图
-        operators = list(operator_stats.keys())
-        avg_risks = [operator_stats[op]['avg_risk'] for op in operators]
-        operation_counts = [operator_stats[op]['total_operations'] for op in operators]
-        high_risk_counts = [operator_stats[op]['high_risk_count'] for op in operators]
+        operators = operator_stats.index.tolist()
+        avg_risks = operator_stats['mean'].to_numpy()
+        operation_counts = operator_stats['count'].to_numpy()
+        high_risk_counts = operator_stats['high_risk_count'].to_numpy()
         
         fig = go.Figure()
         
@@ -236,7 +454,7 @@ class AnomalyVisualizer:
             y=avg_risks,
             mode='markers',
             marker=dict(
-                size=[max(10, count/10) for count in high_risk_counts],
+                size=np.maximum(10, high_risk_counts / 10),
                 color=avg_risks,
                 colorscale='RdYlGn_r',
                 showscale=True,
@@ -259,47 +477,61 @@ class AnomalyVisualizer:
         return fig
     
     def create_business_type_analysis(self, data: pd.DataFrame,
-                                    risk_scores: Dict[str, float]) -> go.Figure:
+                                    risk_scores: Optional[RiskResult] = None,
+                                    aggregates: Optional[AggregateCache] = None,
+                                    outliers: Optional[pd.DataFrame] = None,
+                                    max_outliers: int = 200) -> go.Figure:
         """
         创建业务类型分析图
         
+        箱线图由各业务类型的分位数直接绘制，须线以外的离群点单独作为散点图层，
+        每个业务类型最多 max_outliers 个，图表中不嵌入其余逐条评分。
+        
         Args:
-            data: 账单数据
-            risk_scores: 风险评分字典
+            data: 账单数据；或 risk_group_stats(..., '业务类型') 得到的预聚合统计表，此时不传 risk_scores
+            risk_scores: 评分结果或风险评分字典
+            aggregates: 可选，data 上的聚合缓存，复用其中的业务类型分组
+            outliers: 可选，预聚合输入时 risk_outliers(..., '业务类型') 得到的离群点表；
+                      传入 risk_scores 时由评分计算，无需传入
+            max_outliers: 每个业务类型最多绘制的离群点数
             
         Returns:
             Plotly图表对象
         """
         # 按业务类型分组分析
-        business_risks = {}
-        for _, row in data.iterrows():
-            business_type = row['业务类型']
-            bill_id = str(row['账单编号'])
-            risk_score = risk_scores.get(bill_id, 0)
-            
-            if business_type not in business_risks:
-                business_risks[business_type] = []
-            business_risks[business_type].append(risk_score)
-        
-        # 计算统计指标
-        business_stats = {}
-        for business_type, risks in business_risks.items():
-            business_stats[business_type] = {
-                'avg_risk': np.mean(risks),
-                'std_risk': np.std(risks),
-                'count': len(risks)
-            }
+        if risk_scores is not None:
+            aggregates = _aggregates_for(data, aggregates)
+        business_stats = self._risk_stats(data, risk_scores, '业务类型', aggregates,
+                                          ['mean', 'q1', 'median', 'q3', 'lowerfence', 'upperfence'])
+        if risk_scores is not None:
+            outliers = risk_outliers(data, risk_scores, '业务类型', business_stats, aggregates, max_outliers)
         
         # 创建箱线图数据
         fig = go.Figure()
         
-        for business_type, risks in business_risks.items():
+        for business_type, stats in zip(business_stats.index, business_stats.itertuples()):
             fig.add_trace(go.Box(
-                y=risks,
-                name=business_type,
-                boxpoints='outliers',
-                jitter=0.3,
-                pointpos=-1.8
+                name=str(business_type),
+                q1=[stats.q1],
+                median=[stats.median],
+                q3=[stats.q3],
+                lowerfence=[stats.lowerfence],
+                upperfence=[stats.upperfence],
+                mean=[stats.mean],
+                boxpoints=False
+            ))
+        
+        # 离群点往往正是需要复核的账单，以散点叠加在对应业务类型上
+        if outliers is not None and len(outliers):
+            fig.add_trace(go.Scatter(
+                x=outliers['业务类型'].astype(str),
+                y=outliers['风险评分'],
+                mode='markers',
+                name='离群点',
+                customdata=outliers['账单编号'].astype(str),
+                marker=dict(color=self.colors['high_risk'], size=5),
+                hovertemplate='<b>账单编号:</b> %{customdata}<br>' +
+                            '<b>风险评分:</b> %{y:.3f}<extra></extra>'
             ))
         
         fig.update_layout(
@@ -310,6 +542,17 @@ class AnomalyVisualizer:
         
         return fig
     
+    @staticmethod
+    def _risk_stats(data: pd.DataFrame, risk_scores: Optional[RiskResult], key: str,
+                    aggregates: Optional[AggregateCache], required: List[str]) -> pd.DataFrame:
+        """未传评分时 data 即为预聚合统计表（校验所需列），否则按键汇总评分"""
+        if risk_scores is not None:
+            return risk_group_stats(data, risk_scores, key, aggregates)
+        missing = [column for column in required if column not in data.columns]
+        if missing:
+            raise ValueError(f"预聚合统计表缺少列: {missing}")
+        return data
+    
     def _get_risk_color(self, risk_score: float) -> str:
         """
         根据风险评分获取颜色
@@ -329,126 +572,141 @@ class AnomalyVisualizer:
     
     def generate_html_report(self, 
                            data: pd.DataFrame,
-                           risk_scores: Dict[str, float],
+                           risk_scores: RiskResult,
                            baseline_data: Optional[pd.DataFrame] = None,
-                           output_path: str = "anomaly_report.html") -> str:
+                           output_path: str = "anomaly_report.html",
+                           aggregates: Optional[AggregateCache] = None,
+                           plotlyjs: str = 'inline',
+                           compress: bool = False,
+                           title: str = '资费异常检测报告') -> str:
         """
-        生成完整的HTML报告
+        生成完整的HTML报告，各节依次写入文件，plotly.js 只引入一次
         
         Args:
             data: 账单数据
-            risk_scores: 风险评分字典
+            risk_scores: 评分结果或风险评分字典
             baseline_data: 基线数据
             output_path: 输出文件路径
+            aggregates: 可选，data 上的聚合缓存（如 ExcelParser.aggregates）
+            plotlyjs: plotly.js 引入方式，'inline'（内联）或 'local'（同目录共享文件）
+            compress: 是否以 gzip 压缩写出（文件名追加 .gz）
+            title: 报告标题
             
         Returns:
-            HTML内容字符串
+            写出的报告文件路径（compress 时带 .gz 后缀），不再返回HTML内容字符串
         """
-        # 生成所有图表
-        timeline_fig = self.create_anomaly_timeline(data, risk_scores, baseline_data)
-        risk_dist_fig = self.create_risk_distribution(risk_scores)
-        operator_fig = self.create_operator_analysis(data, risk_scores)
-        business_fig = self.create_business_type_analysis(data, risk_scores)
-        
-        # 生成风险用户清单
-        high_risk_bills = [(bill_id, score) for bill_id, score in risk_scores.items() 
-                          if score >= 0.7]
-        high_risk_bills.sort(key=lambda x: x[1], reverse=True)
-        
-        # 创建HTML内容
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>资费异常检测报告</title>
-            <meta charset="utf-8">
-            <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
-            <style>
-                body {{ font-family: Arial, sans-serif; margin: 20px; }}
-                .header {{ background-color: #f0f0f0; padding: 20px; border-radius: 5px; }}
-                .section {{ margin: 30px 0; }}
-                .chart {{ margin: 20px 0; }}
-                .risk-table {{ width: 100%; border-collapse: collapse; margin: 20px 0; }}
-                .risk-table th, .risk-table td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-                .risk-table th {{ background-color: #f2f2f2; }}
-                .high-risk {{ background-color: #ffebee; }}
-                .medium-risk {{ background-color: #fff3e0; }}
-                .low-risk {{ background-color: #f1f8e9; }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>资费异常检测报告</h1>
-                <p>生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-                <p>总记录数: {len(data)} | 高风险记录: {len(high_risk_bills)}</p>
-            </div>
-            
-            <div class="section">
-                <h2>异常检测时间轴</h2>
-                <div class="chart">
-                    {timeline_fig.to_html(full_html=False)}
-                </div>
-            </div>
-            
-            <div class="section">
-                <h2>风险分布分析</h2>
-                <div class="chart">
-                    {risk_dist_fig.to_html(full_html=False)}
-                </div>
-            </div>
-            
-            <div class="section">
-                <h2>操作员风险分析</h2>
-                <div class="chart">
-                    {operator_fig.to_html(full_html=False)}
-                </div>
-            </div>
-            
-            <div class="section">
-                <h2>业务类型风险分析</h2>
-                <div class="chart">
-                    {business_fig.to_html(full_html=False)}
-                </div>
-            </div>
-            
-            <div class="section">
-                <h2>高风险用户清单</h2>
-                <table class="risk-table">
-                    <thead>
-                        <tr>
-                            <th>排名</th>
-                            <th>账单编号</th>
-                            <th>风险评分</th>
-                            <th>风险等级</th>
-                        </tr>
-                    </thead>
-                    <tbody>
+        result = RiskResult.from_scores(risk_scores)
+        high_risk_count = result.band_counts()['0.7-1.0']
+        aggregates = _aggregates_for(data, aggregates)
+        
+        with HtmlReportWriter(output_path, title=title, plotlyjs=plotlyjs, compress=compress) as writer:
+            writer.write_header([
+                f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+                f"总记录数: {len(data)} | 高风险记录: {high_risk_count}",
+            ])
+            # 每张图生成后立即写出，不同时持有全部图表
+            writer.write_figure('异常检测时间轴', self.create_anomaly_timeline(data, result, baseline_data))
+            writer.write_figure('风险分布分析', self.create_risk_distribution(result))
+            writer.write_figure('操作员风险分析', self.create_operator_analysis(data, result, aggregates))
+            writer.write_figure('业务类型风险分析', self.create_business_type_analysis(data, result, aggregates))
+            writer.write_data_table('高风险用户清单', high_risk_table(data, result), score_column='风险评分')
+        
+        return writer.output_path
+    
+    def generate_branch_reports(self,
+                                data: pd.DataFrame,
+                                risk_scores: RiskResult,
+                                output_dir: str,
+                                baseline_data: Optional[pd.DataFrame] = None,
+                                max_workers: Optional[int] = None,
+                                compress: bool = False,
+                                aggregates: Optional[AggregateCache] = None) -> Tuple[Dict[Any, str], Dict[Any, str]]:
         """
+        按营业厅批量生成报告，每个营业厅一份
         
-        for i, (bill_id, score) in enumerate(high_risk_bills[:50], 1):  # 显示前50个
-            risk_level = "高风险" if score >= 0.7 else "中风险" if score >= 0.3 else "低风险"
-            row_class = "high-risk" if score >= 0.7 else "medium-risk" if score >= 0.3 else "low-risk"
+        评分一次对齐后按 营业厅编号 拆分，各营业厅的图表和报告在进程池中独立生成，
+        单个营业厅失败不影响其他营业厅；所有报告共用输出目录中同一个 plotly.js 文件。
+        
+        Args:
+            data: 账单数据
+            risk_scores: 评分结果或风险评分字典，未评分的账单按 0 计
+            output_dir: 输出目录，报告文件名为 report_<营业厅编号>.html，
+                        编号清理后重名时加分组序号，缺少营业厅编号的账单写入 report_unknown_branch.html
+            baseline_data: 可选，基线数据，含 营业厅编号 列时各营业厅只使用本厅的基线
+            max_workers: 进程数，默认为CPU核数；为1时在当前进程中依次生成
+            compress: 是否以 gzip 压缩写出
+            aggregates: 可选，data 上的聚合缓存，复用其中的营业厅分组
             
-            html_content += f"""
-                        <tr class="{row_class}">
-                            <td>{i}</td>
-                            <td>{bill_id}</td>
-                            <td>{score:.3f}</td>
-                            <td>{risk_level}</td>
-                        </tr>
-            """
-        
-        html_content += """
-                    </tbody>
-                </table>
-            </div>
-        </body>
-        </html>
+        Returns:
+            (生成的报告 {营业厅编号: 报告路径}, 生成失败的营业厅 {营业厅编号: 错误信息})，
+            键为原始编号（不转换为字符串），缺少营业厅编号的账单对应的键为 None
         """
+        os.makedirs(output_dir, exist_ok=True)
+        write_plotly_asset(output_dir)
+        
+        # 对齐到 data 的行后按行号切分，各营业厅的结果保留各维度异常度
+        result = RiskResult.from_scores(risk_scores).align(data)
+        aggregates = _aggregates_for(data, aggregates)
+        branch_rows = aggregates.split('营业厅编号', np.arange(len(data)))
+        
+        baseline_groups = None
+        if baseline_data is not None and '营业厅编号' in baseline_data.columns:
+            baseline_groups = baseline_data.groupby('营业厅编号', observed=True, sort=False).indices
+        
+        # 营业厅编号缺失的账单单独成一份报告，不静默丢弃
+        missing_rows = np.flatnonzero(aggregates.group_codes('营业厅编号')[0] < 0)
+        if len(missing_rows):
+            logger.warning(f"{len(missing_rows)} 条账单缺少营业厅编号，单独生成报告")
+            branch_rows[None] = missing_rows
+        
+        tasks = {}
+        file_names = set()
+        for group_index, (branch, rows) in enumerate(branch_rows.items()):
+            branch_data = data.iloc[rows]
+            branch_baseline = baseline_data
+            if baseline_groups is not None:
+                if branch is None:
+                    branch_baseline = baseline_data[baseline_data['营业厅编号'].isna()]
+                else:
+                    branch_baseline = baseline_data.iloc[baseline_groups.get(branch, [])]
+            
+            # 不同编号清理后可能同名（如 1 与 '1'、'A/B' 与 'A_B'，或仅大小写不同），同名时加分组序号
+            file_name = 'unknown_branch' if branch is None else re.sub(r'[^\w.-]', '_', str(branch))
+            while file_name.lower() in file_names:
+                file_name = f"{file_name}_{group_index}"
+            file_names.add(file_name.lower())
+            
+            tasks[branch] = dict(
+                data=branch_data,
+                risk_scores=result.take(rows),
+                baseline_data=branch_baseline,
+                output_path=os.path.join(output_dir, f"report_{file_name}.html"),
+                plotlyjs='local',
+                compress=compress,
+                title=f"资费异常检测报告 - 营业厅 {'编号缺失' if branch is None else branch}",
+            )
         
-        # 保存HTML文件
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        
-        logger.info(f"HTML报告已生成: {output_path}")
-        return html_content 
\ No newline at end of file
+        reports = {}
+        errors = {}
+        if max_workers == 1 or len(tasks) <= 1:
+            for branch, arguments in tasks.items():
+                try:
+                    reports[branch] = self.generate_html_report(**arguments)
+                except Exception as e:
+                    errors[branch] = f"{type(e).__name__}: {e}"
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    branch: executor.submit(self.generate_html_report, **arguments)
+                    for branch, arguments in tasks.items()
+                }
+                for branch, future in futures.items():
+                    try:
+                        reports[branch] = future.result()
+                    except Exception as e:
+                        errors[branch] = f"{type(e).__name__}: {e}"
+        
+        for branch, message in errors.items():
+            logger.error(f"营业厅 {branch} 报告生成失败: {message}")
+        logger.info(f"营业厅报告生成完成: 成功 {len(reports)} 个，失败 {len(errors)} 个")
+        return reports, errors
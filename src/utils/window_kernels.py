@@ -0,0 +1,113 @@
+"""
+时间窗计数模块
+将事件按分组和时间排序一次，批量回答"尾随时间窗内有多少事件"的查询
+"""
+
+import pandas as pd
+import numpy as np
+from typing import Optional, Tuple, Union
+from datetime import timedelta
+
+
+class EventWindowIndex:
+    """按分组排序的事件时间索引"""
+
+    def __init__(self, times: np.ndarray, groups: Optional[np.ndarray] = None):
+        """
+        初始化事件索引，事件按 (分组, 时间) 只排序一次
+
+        Args:
+            times: 事件时间
+            groups: 事件所属分组（如操作员ID），为空时所有事件同属一组；
+                    时间或分组缺失的事件不计入索引
+        """
+        times = np.asarray(times, dtype='datetime64[ns]')
+        if groups is None:
+            codes = np.zeros(len(times), dtype=np.int64)
+            self.groups = pd.Index([0])
+        else:
+            codes, uniques = pd.factorize(np.asarray(groups))
+            self.groups = pd.Index(uniques)
+
+        valid = ~np.isnat(times) & (codes >= 0)
+        codes = codes[valid].astype(np.int64)
+        ticks = times[valid].astype(np.int64)
+        order = np.lexsort((ticks, codes))
+
+        # 组合键 = 分组编码 × 时间秩数 + 时间秩数，按 (分组, 时间) 单调递增
+        self.times = np.unique(ticks)
+        self._span = max(len(self.times), 1)
+        self._keys = codes[order] * self._span + np.searchsorted(self.times, ticks[order])
+        self._group_start = np.searchsorted(
+            self._keys, np.arange(len(self.groups) + 1, dtype=np.int64) * self._span
+        )
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def count_before(self, times: np.ndarray, groups: Optional[np.ndarray] = None,
+                     inclusive: bool = False) -> np.ndarray:
+        """
+        统计每个查询时刻之前同组事件的数量
+
+        Args:
+            times: 查询时刻
+            groups: 查询所属分组，索引不分组时忽略
+            inclusive: 是否计入与查询时刻相同的事件
+
+        Returns:
+            与查询对齐的事件数量数组，查询时刻或分组缺失时为0
+        """
+        codes, ticks, order = self._prepare_queries(times, groups)
+        counts = np.zeros(len(ticks), dtype=np.int64)
+        counts[order] = self._count_sorted(codes[order], ticks[order], inclusive)
+        return counts
+
+    def count_in_window(self, times: np.ndarray,
+                        window: Union[timedelta, np.timedelta64, pd.Timedelta],
+                        groups: Optional[np.ndarray] = None,
+                        closed: str = 'both') -> np.ndarray:
+        """
+        统计每个查询时刻尾随时间窗 [t - window, t] 内同组事件的数量
+
+        Args:
+            times: 查询时刻 t
+            window: 时间窗长度
+            groups: 查询所属分组，索引不分组时忽略
+            closed: 区间闭合方式，'both'、'left'（不含 t）、'right'（不含 t - window）或 'neither'
+
+        Returns:
+            与查询对齐的事件数量数组，查询时刻或分组缺失时为0
+        """
+        if closed not in ('both', 'left', 'right', 'neither'):
+            raise ValueError(f"不支持的区间闭合方式: {closed}")
+
+        codes, ticks, order = self._prepare_queries(times, groups)
+        counts = np.zeros(len(ticks), dtype=np.int64)
+        codes, ticks = codes[order], ticks[order]
+        window_ticks = pd.Timedelta(window).value
+
+        # 窗口上下界共用同一查询排序
+        upper = self._count_sorted(codes, ticks, inclusive=closed in ('both', 'right'))
+        lower = self._count_sorted(codes, ticks - window_ticks, inclusive=closed in ('right', 'neither'))
+        counts[order] = upper - lower
+        return counts
+
+    def _prepare_queries(self, times: np.ndarray,
+                         groups: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """计算查询的分组编码和时间刻度，返回有效查询按 (分组, 时间) 的排序下标"""
+        times = np.asarray(times, dtype='datetime64[ns]')
+        if groups is None:
+            codes = np.zeros(len(times), dtype=np.int64)
+        else:
+            codes = self.groups.get_indexer(np.asarray(groups)).astype(np.int64)
+        ticks = times.astype(np.int64)
+        valid = np.flatnonzero(~np.isnat(times) & (codes >= 0))
+        order = valid[np.lexsort((ticks[valid], codes[valid]))]
+        return codes, ticks, order
+
+    def _count_sorted(self, codes: np.ndarray, ticks: np.ndarray, inclusive: bool) -> np.ndarray:
+        """对已按 (分组, 时间) 排序的查询做二分查找，顺序查询可充分利用缓存"""
+        ranks = np.searchsorted(self.times, ticks, side='right' if inclusive else 'left')
+        positions = np.searchsorted(self._keys, codes * self._span + ranks, side='left')
+        return positions - self._group_start[codes]
@@ -131,6 +131,1061 @@ def test_detector():
         print(f"❌ 异常检测器测试失败: {e}")
         return False
 
+def _random_bills(n, seed, start=datetime(2024, 1, 1)):
+    """生成随机账单数据（含未配置的业务类型、夜间与周末操作、同一时刻的重复操作）"""
+    rng = np.random.default_rng(seed)
+    business_types = ['开户', '销户', '套餐变更', '充值', '流量包', '国际漫游', '宽带']
+    offsets = rng.integers(0, 14 * 24 * 3600, n)
+    # 部分记录集中在少数时刻，以触发快速连续操作规则
+    clustered = rng.random(n) < 0.2
+    offsets[clustered] = offsets[0] + rng.integers(0, 120, clustered.sum())
+    return pd.DataFrame({
+        '账单编号': [f'BILL{seed}_{i:06d}' for i in range(n)],
+        '营业厅编号': rng.choice(['BR001', 'BR002', 'BR003'], n),
+        '账单日期': pd.Timestamp(start).normalize() + pd.to_timedelta(offsets // 86400, unit='D'),
+        '操作员ID': rng.choice([f'OP{i:03d}' for i in range(12)], n),
+        '业务类型': rng.choice(business_types, n, p=[0.15, 0.1, 0.15, 0.2, 0.15, 0.2, 0.05]),
+        '费用金额': np.round(rng.lognormal(4.5, 1.2, n), 2),
+        '优惠金额': 0.0,
+        '实收金额': 0.0,
+        '操作时间': pd.Timestamp(start) + pd.to_timedelta(offsets, unit='s'),
+    })
+
+def test_excel_chunks():
+    """测试Excel分块读取"""
+    print("\n📦 测试Excel分块读取...")
+    try:
+        import tempfile
+        from utils.excel_parser import ExcelParser, parse_bill_excel
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_file = os.path.join(tmp_dir, 'bills.xlsx')
+            bills = _random_bills(500, 0)
+            bills.to_excel(test_file, index=False)
+            
+            chunks = list(ExcelParser(test_file).iter_chunks(rows_per_chunk=120))
+            if len(chunks) != 5 or not pd.concat(chunks).equals(parse_bill_excel(test_file)):
+                print("❌ 分块读取结果与整表解析不一致")
+                return False
+            
+            # 缺少必需列时应在读取数据前报错
+            bills.drop(columns=['操作员ID']).to_excel(test_file, index=False)
+            try:
+                next(ExcelParser(test_file).iter_chunks())
+                print("❌ 未检测到缺少的必需列")
+                return False
+            except ValueError:
+                pass
+        
+        print("✅ Excel分块读取测试成功")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Excel分块读取测试失败: {e}")
+        return False
+
+def test_parse_cache():
+    """测试解析缓存"""
+    print("\n🗄️ 测试解析缓存...")
+    try:
+        import tempfile
+        from utils.excel_parser import parse_bill_excel
+        from utils.parse_cache import ParseCache
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_file = os.path.join(tmp_dir, 'bills.xlsx')
+            _random_bills(300, 0).to_excel(test_file, index=False)
+            cache = ParseCache(os.path.join(tmp_dir, 'cache'))
+            
+            parsed = parse_bill_excel(test_file, cache=cache)
+            cached = parse_bill_excel(test_file, cache=cache)
+            stats = cache.stats()
+            if not cached.equals(parsed) or stats['hits'] != 1 or stats['entries'] != 1:
+                print(f"❌ 缓存结果不正确: {stats}")
+                return False
+            
+            # ExcelParser 再次加载同一文件时，原始数据和清洗结果都从缓存读取
+            from utils.excel_parser import ExcelParser
+            parser_cache = ParseCache(os.path.join(tmp_dir, 'parser_cache'))
+            cold = ExcelParser(test_file, cache=parser_cache)
+            cold.load_data()
+            cold.clean_data()
+            warm = ExcelParser(test_file, cache=parser_cache)
+            warm.load_data()
+            warm.clean_data()
+            if not warm.data.equals(cold.data) or parser_cache.stats()['hits'] != 2 or \
+                    parser_cache.stats()['entries'] != 2:
+                print(f"❌ 清洗结果未从缓存读取: {parser_cache.stats()}")
+                return False
+            
+            # 文件内容变化后不应命中旧条目
+            _random_bills(300, 1).to_excel(test_file, index=False)
+            if parse_bill_excel(test_file, cache=cache).equals(parsed):
+                print("❌ 文件变化后仍返回旧缓存")
+                return False
+            
+            # 超出容量时淘汰旧条目
+            cache.max_bytes = cache.stats()['total_bytes'] - 1
+            if cache.evict() != 1 or cache.stats()['entries'] != 1:
+                print("❌ 缓存淘汰不正确")
+                return False
+        
+        print("✅ 解析缓存测试成功")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 解析缓存测试失败: {e}")
+        return False
+
+def test_multi_file_ingest():
+    """测试多文件并行解析"""
+    print("\n🗂️ 测试多文件并行解析...")
+    try:
+        import tempfile
+        from utils.excel_parser import parse_bill_files, parse_bill_excel
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for i in range(3):
+                _random_bills(200, i).to_excel(os.path.join(tmp_dir, f'BR00{i}_20240101.xlsx'), index=False)
+            with open(os.path.join(tmp_dir, 'broken.xlsx'), 'w') as f:
+                f.write('not a workbook')
+            
+            data, errors = parse_bill_files(tmp_dir, max_workers=2)
+            expected = pd.concat([parse_bill_excel(os.path.join(tmp_dir, f'BR00{i}_20240101.xlsx'))
+                                  for i in range(3)], ignore_index=True)
+            
+            if list(errors) != [os.path.join(tmp_dir, 'broken.xlsx')]:
+                print(f"❌ 文件错误报告不正确: {errors}")
+                return False
+            if data['操作员ID'].dtype != 'category' or \
+                    not data.astype({'营业厅编号': str, '操作员ID': str, '业务类型': str}).equals(expected):
+                print("❌ 合并结果与逐个解析不一致")
+                return False
+        
+        print("✅ 多文件并行解析测试成功")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 多文件并行解析测试失败: {e}")
+        return False
+
+def test_compact_schema():
+    """测试紧凑类型表示"""
+    print("\n🗜️ 测试紧凑类型表示...")
+    try:
+        from detector import BillingAnomalyDetector
+        from utils.bill_schema import apply_bill_schema, build_category_dictionary, memory_usage_report
+        
+        history, current = _random_bills(1000, 1), _random_bills(1000, 0)
+        categories = build_category_dictionary([history, current])
+        compact_history = apply_bill_schema(history, categories)
+        compact_current = apply_bill_schema(current, categories)
+        
+        report = memory_usage_report(current, compact_current)
+        if compact_current['操作员ID'].dtype != 'category' or compact_current['费用金额'].dtype != np.float32 or \
+                report['after_bytes'] >= report['before_bytes']:
+            print(f"❌ 紧凑类型转换不正确: {report}")
+            return False
+        
+        # 检测结果应与金额按 float32 取整后的普通表示一致
+        for frame in (history, current):
+            frame['费用金额'] = frame['费用金额'].astype(np.float32).astype(float)
+        detector, compact_detector = BillingAnomalyDetector(), BillingAnomalyDetector()
+        detector.build_baseline(history)
+        compact_detector.build_baseline(compact_history)
+        if compact_detector.detect_anomalies(compact_current) != detector.detect_anomalies(current):
+            print("❌ 紧凑表示的检测结果不一致")
+            return False
+        
+        print("✅ 紧凑类型表示测试成功")
+        print(f"   内存占用: {report['before_bytes']} -> {report['after_bytes']} 字节")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 紧凑类型表示测试失败: {e}")
+        return False
+
+def test_datetime_parsing():
+    """测试时间解析与时间特征"""
+    print("\n🕒 测试时间解析...")
+    try:
+        from utils.time_parsing import parse_datetime_column, time_features
+        from detector import BillingAnomalyDetector
+        
+        expected = pd.Timestamp('2024-01-15 09:30:00')
+        for values in (
+            pd.Series(['2024-01-15 09:30:00', '2024-01-15 09:30:00']),
+            pd.Series(['2024/01/15 09:30', '2024/01/15 09:30']),
+            pd.Series([45306.395833333336, 45306.395833333336]),  # Excel 序列日期
+            pd.Series(['2024-01-15 09:30:00', 45306.395833333336, datetime(2024, 1, 15, 9, 30)], dtype=object),
+        ):
+            if not (parse_datetime_column(values) == expected).all():
+                print(f"❌ 时间解析结果不正确: {values.tolist()}")
+                return False
+        
+        # 时间特征与 .dt 访问器一致，且始终由当前的操作时间计算（不读取数据中的同名列）
+        current = _random_bills(500, 0)
+        current.loc[0, '操作时间'] = pd.NaT
+        features = time_features(current)
+        valid = current['操作时间'].notna()
+        if not np.array_equal(features['hour'][valid], current['操作时间'].dt.hour[valid]) or \
+                not np.array_equal(features['weekday'][valid], current['操作时间'].dt.weekday[valid]) or \
+                features['hour'][0] != -1:
+            print("❌ 时间特征与 .dt 访问器结果不一致")
+            return False
+        
+        # 数据中同名的 操作小时 列只是普通列，检测不读取
+        stale = current.assign(操作小时=current['操作时间'].dt.hour)
+        stale['操作时间'] = stale['操作时间'] + pd.Timedelta(hours=7)
+        detector = BillingAnomalyDetector()
+        detector.build_baseline(_random_bills(500, 1))
+        if detector.detect_anomalies(stale) != detector.detect_anomalies(stale.drop(columns=['操作小时'])):
+            print("❌ 修改操作时间后仍读取了数据中的 操作小时 列")
+            return False
+        
+        from utils.excel_parser import ExcelParser
+        if set(ExcelParser._clean_frame(_random_bills(50, 2)).columns) != set(current.columns):
+            print("❌ 清洗后的数据不应包含时间特征列")
+            return False
+        
+        print("✅ 时间解析测试成功")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 时间解析测试失败: {e}")
+        return False
+
+def test_csv_arrow_ingest():
+    """测试 CSV 和 Arrow 文件解析"""
+    print("\n📑 测试CSV和Arrow文件解析...")
+    try:
+        import tempfile
+        import pyarrow.feather as feather
+        from utils.excel_parser import parse_bill_excel
+        from detector import BillingAnomalyDetector
+        
+        bills = _random_bills(500, 0)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = {ext: os.path.join(tmp_dir, f'bills.{ext}') for ext in ('xlsx', 'csv', 'arrow')}
+            bills.to_excel(paths['xlsx'], index=False)
+            bills.to_csv(paths['csv'], index=False)
+            feather.write_feather(bills, paths['arrow'])
+            parsed = {ext: parse_bill_excel(path) for ext, path in paths.items()}
+            
+            bills[['账单编号', '操作员ID', '营业厅编号', '业务类型', '实收金额']].to_csv(
+                os.path.join(tmp_dir, 'partial.csv'), index=False)
+            try:
+                parse_bill_excel(os.path.join(tmp_dir, 'partial.csv'))
+                print("❌ 缺少必需列时未报错")
+                return False
+            except ValueError:
+                pass
+        
+        detector = BillingAnomalyDetector()
+        detector.build_baseline(_random_bills(500, 1))
+        scores = {ext: detector.detect_anomalies(data).risk_score for ext, data in parsed.items()}
+        for ext in ('csv', 'arrow'):
+            if len(parsed[ext]) != len(parsed['xlsx']) or not np.array_equal(scores[ext], scores['xlsx']):
+                print(f"❌ {ext} 解析结果与Excel不一致")
+                return False
+        
+        print("✅ CSV和Arrow文件解析测试成功")
+        return True
+        
+    except Exception as e:
+        print(f"❌ CSV和Arrow文件解析测试失败: {e}")
+        return False
+
+def test_multi_sheet_workbook():
+    """测试多工作表工作簿解析"""
+    print("\n📚 测试多工作表工作簿解析...")
+    try:
+        import tempfile
+        from utils.excel_parser import parse_bill_workbook, SHEET_COLUMN
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_file = os.path.join(tmp_dir, 'region.xlsx')
+            with pd.ExcelWriter(test_file) as writer:
+                pd.DataFrame({'营业厅': ['BR000'], '合计': [1.0]}).to_excel(writer, sheet_name='汇总', index=False)
+                for i in range(3):
+                    _random_bills(200, i).to_excel(writer, sheet_name=f'BR00{i}', index=False)
+            
+            data, skipped = parse_bill_workbook(test_file, max_workers=2)
+            expected = pd.concat([_random_bills(200, i) for i in range(3)], ignore_index=True)
+        
+        if list(skipped) != ['汇总']:
+            print(f"❌ 跳过工作表报告不正确: {skipped}")
+            return False
+        if list(data[SHEET_COLUMN].value_counts(sort=False).items()) != [('BR000', 200), ('BR001', 200), ('BR002', 200)]:
+            print("❌ 来源工作表标记不正确")
+            return False
+        if not data['账单编号'].astype(str).equals(expected['账单编号'].astype(str)):
+            print("❌ 合并结果与各工作表数据不一致")
+            return False
+        
+        print("✅ 多工作表工作簿解析测试成功")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 多工作表工作簿解析测试失败: {e}")
+        return False
+
+def test_export_writer():
+    """测试流式导出"""
+    print("\n💾 测试流式导出...")
+    try:
+        import tempfile
+        from utils.export_writer import export_bills
+        from detector import BillingAnomalyDetector
+        
+        detector = BillingAnomalyDetector()
+        detector.build_baseline(_random_bills(500, 1))
+        current = _random_bills(250, 0)
+        result = detector.detect_anomalies(current)
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            sheet_paths = export_bills(current, os.path.join(tmp_dir, 'bills.xlsx'), result, max_rows_per_sheet=100)
+            file_paths = export_bills(current, os.path.join(tmp_dir, 'split.xlsx'), result,
+                                      max_rows_per_sheet=100, split_by='file')
+            sheets = pd.read_excel(sheet_paths[0], sheet_name=None)
+            exported = {
+                'xlsx': pd.concat(sheets.values(), ignore_index=True),
+                'csv': pd.read_csv(export_bills(current, os.path.join(tmp_dir, 'bills.csv'), result)[0],
+                                   encoding='utf_8_sig'),
+                'parquet': pd.read_parquet(export_bills(current, os.path.join(tmp_dir, 'bills.parquet'),
+                                                        result, chunk_size=60)[0]),
+            }
+            # 文本列为 object 类型（pandas 1.x/2.x 的默认表示）且首块为空值时也能分块写出
+            object_bills = current.astype({column: object for column in ['账单编号', '营业厅编号', '操作员ID', '业务类型']})
+            object_bills['备注'] = pd.Series([None] * 100 + ['人工复核'] * (len(current) - 100), dtype=object)
+            # 与时间特征同名的用户列照常导出
+            object_bills['操作日期'] = object_bills['操作时间'].dt.normalize()
+            object_parquet = pd.read_parquet(export_bills(object_bills, os.path.join(tmp_dir, 'object.parquet'),
+                                                          chunk_size=60)[0])
+            # 行顺序与检测结果不同的数据按账单编号拼接评分，未评分的账单为空
+            shuffled = pd.concat([current.sample(frac=1.0, random_state=0), _random_bills(10, 3)])
+            shuffled_csv = pd.read_csv(export_bills(shuffled, os.path.join(tmp_dir, 'shuffled.csv'), result,
+                                                    chunk_size=60)[0], encoding='utf_8_sig')
+        
+        expected_scores = result.scores_for(shuffled, default=np.nan)
+        if not np.allclose(shuffled_csv['风险评分'], expected_scores, equal_nan=True) or \
+                shuffled_csv['风险评分'].isna().sum() != 10:
+            print("❌ 行顺序不同的数据导出的评分不正确")
+            return False
+        
+        if not object_parquet['账单编号'].astype(str).equals(current['账单编号'].astype(str)) or \
+                object_parquet['备注'].iloc[-1] != '人工复核' or '操作日期' not in object_parquet.columns:
+            print("❌ object 类型文本列或用户列的 Parquet 导出不正确")
+            return False
+        
+        if list(sheets) != ['账单', '账单_2', '账单_3'] or [os.path.basename(p) for p in file_paths] != \
+                ['split.xlsx', 'split_2.xlsx', 'split_3.xlsx']:
+            print("❌ 超过行数上限时拆分不正确")
+            return False
+        for name, data in exported.items():
+            if not data['账单编号'].equals(current['账单编号']) or \
+                    not np.allclose(data['风险评分'], result.risk_score):
+                print(f"❌ {name} 导出的评分与检测结果不一致")
+                return False
+        
+        print("✅ 流式导出测试成功")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 流式导出测试失败: {e}")
+        return False
+
+def test_aggregate_cache():
+    """测试共享分组聚合缓存"""
+    print("\n🧾 测试共享分组聚合缓存...")
+    try:
+        from utils.excel_parser import ExcelParser
+        from detector import BillingAnomalyDetector
+        
+        parser = ExcelParser('')
+        parser.data = _random_bills(1000, 1)
+        stats = parser.get_operator_statistics()
+        expected = parser.data.groupby('营业厅编号')['费用金额'].agg(['count', 'sum', 'mean']).round(2)
+        if {k: [v['操作次数'], v['费用总额'], v['平均费用']] for k, v in stats['branch_stats'].items()} != \
+                {k: row.tolist() for k, row in expected.iterrows()}:
+            print("❌ 营业厅统计与 groupby 结果不一致")
+            return False
+        
+        # 检测器复用解析器已缓存的分组
+        operator_codes = parser.aggregates.group_codes('操作员ID')[0]
+        shared, plain = BillingAnomalyDetector(), BillingAnomalyDetector()
+        shared.build_baseline(parser.data, aggregates=parser.aggregates)
+        plain.build_baseline(_random_bills(1000, 1))
+        current = _random_bills(500, 0)
+        if parser.aggregates.group_codes('操作员ID')[0] is not operator_codes or \
+                not np.allclose(shared.detect_anomalies(current).risk_score, plain.detect_anomalies(current).risk_score):
+            print("❌ 共享聚合缓存构建的基线不一致")
+            return False
+        
+        # 数据替换后缓存失效
+        parser.data = _random_bills(200, 2)
+        if parser.aggregates.column_stats('操作员ID', '费用金额')['size'].sum() != 200:
+            print("❌ 数据替换后聚合缓存未失效")
+            return False
+        
+        print("✅ 共享分组聚合缓存测试成功")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 共享分组聚合缓存测试失败: {e}")
+        return False
+
+def test_dedup_index():
+    """测试跨文件账单去重索引"""
+    print("\n🧷 测试跨文件账单去重索引...")
+    try:
+        import tempfile
+        from utils.excel_parser import parse_bill_excel, parse_bill_files
+        from utils.dedup_index import BillIdIndex
+        
+        day1 = _random_bills(300, 0)
+        # 第二天的文件重新导出了前一天的 100 条账单，且本身含 20 条重复行
+        day2 = pd.concat([day1.iloc[200:], _random_bills(200, 1), _random_bills(200, 1).iloc[:20]], ignore_index=True)
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_path = os.path.join(tmp_dir, 'bill_ids.npy')
+            for name, data in (('day1.csv', day1), ('day2.csv', day2)):
+                data.to_csv(os.path.join(tmp_dir, name), index=False)
+            
+            index = BillIdIndex(index_path)
+            first = parse_bill_excel(os.path.join(tmp_dir, 'day1.csv'), dedup_index=index)
+            index.save()
+            
+            # 重新加载索引后再入库第二天的文件
+            reloaded = BillIdIndex(index_path)
+            second = parse_bill_excel(os.path.join(tmp_dir, 'day2.csv'), dedup_index=reloaded)
+            report = reloaded.last_report
+            
+            merged, _ = parse_bill_files(tmp_dir, max_workers=1, dedup_index=BillIdIndex())
+        
+        if len(first) != 300 or len(second) != 200 or report['seen_before'] != 100:
+            print(f"❌ 跨文件去重结果不正确: {report}")
+            return False
+        if len(reloaded) != 500 or len(merged) != 500 or merged['账单编号'].duplicated().any():
+            print("❌ 去重索引内容不正确")
+            return False
+        
+        print(f"✅ 跨文件账单去重索引测试成功，第二个文件去掉 {len(day2) - len(second)} 条重复账单")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 跨文件账单去重索引测试失败: {e}")
+        return False
+
+def test_risk_group_stats():
+    """测试按组汇总风险评分与预聚合图表输入"""
+    print("\n📐 测试按组风险统计...")
+    try:
+        from utils.visualize import AnomalyVisualizer, risk_group_stats, risk_outliers
+        from detector import BillingAnomalyDetector
+        
+        detector = BillingAnomalyDetector()
+        detector.build_baseline(_random_bills(500, 1))
+        current = _random_bills(1000, 0)
+        result = detector.detect_anomalies(current)
+        
+        stats = risk_group_stats(current, result, '业务类型')
+        grouped = current.assign(score=result.risk_score).groupby('业务类型', sort=False)['score']
+        expected = pd.DataFrame({'count': grouped.size(), 'mean': grouped.mean(), 'max': grouped.max(),
+                                 'q1': grouped.quantile(0.25), 'median': grouped.median(),
+                                 'q3': grouped.quantile(0.75)})
+        if not np.allclose(stats[expected.columns].to_numpy(float), expected.to_numpy(float)):
+            print("❌ 按组风险统计与 groupby 结果不一致")
+            return False
+        
+        # 图表只接收预聚合统计表
+        visualizer = AnomalyVisualizer()
+        business_fig = visualizer.create_business_type_analysis(stats)
+        operator_fig = visualizer.create_operator_analysis(risk_group_stats(current, result, '操作员ID'))
+        if [trace.name for trace in business_fig.data] != stats.index.tolist() or \
+                len(operator_fig.data[0].x) != current['操作员ID'].nunique():
+            print("❌ 预聚合输入生成的图表不正确")
+            return False
+        
+        # 离群点为四分位距 1.5 倍以外的评分，每组按偏离中位数的程度截取
+        outliers = risk_outliers(current, result, '业务类型', max_per_group=len(current))
+        q1, q3 = grouped.transform(lambda x: x.quantile(0.25)), grouped.transform(lambda x: x.quantile(0.75))
+        scores = pd.Series(result.risk_score, index=current.index)
+        beyond = (scores < q1 - 1.5 * (q3 - q1)) | (scores > q3 + 1.5 * (q3 - q1))
+        if beyond.sum() == 0 or sorted(outliers['账单编号']) != sorted(current.loc[beyond, '账单编号']):
+            print("❌ 离群点与四分位距规则不一致")
+            return False
+        capped = risk_outliers(current, result, '业务类型', max_per_group=2)
+        if capped.groupby('业务类型').size().max() > 2 or \
+                set(capped['业务类型']) != set(outliers['业务类型']):
+            print("❌ 离群点未按组截取")
+            return False
+        scatter = [trace for trace in visualizer.create_business_type_analysis(current, result).data
+                   if trace.type == 'scatter']
+        if len(scatter) != 1 or len(scatter[0].y) != len(outliers):
+            print("❌ 业务类型箱线图缺少离群点")
+            return False
+        
+        print("✅ 按组风险统计测试成功")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 按组风险统计测试失败: {e}")
+        return False
+
+def test_timeline_downsampling():
+    """测试大数据量时间轴降采样"""
+    print("\n📈 测试时间轴降采样...")
+    try:
+        from utils.visualize import AnomalyVisualizer, downsample_minmax
+        from utils.risk_result import RiskResult
+        
+        current = _random_bills(20000, 0)
+        scores = np.random.default_rng(0).beta(1, 8, len(current))
+        result = RiskResult(current['账单编号'].to_numpy(), scores)
+        
+        fig = AnomalyVisualizer().create_anomaly_timeline(current, result, max_points=1000)
+        amount_trace, risk_trace = fig.data[0], fig.data[2]
+        if type(amount_trace).__name__ != 'Scattergl' or len(amount_trace.x) > 1000 + (scores >= 0.7).sum():
+            print("❌ 大数据模式未启用 WebGL 或未降采样")
+            return False
+        if (np.asarray(risk_trace.y) >= 0.7).sum() != (scores >= 0.7).sum():
+            print("❌ 降采样丢失了高风险点")
+            return False
+        
+        amounts = current['费用金额'].to_numpy()
+        rows = downsample_minmax(current['操作时间'].to_numpy(), amounts, 500)
+        if len(rows) > 500 or amounts[rows].max() != amounts.max() or amounts[rows].min() != amounts.min():
+            print("❌ 分桶最小/最大值降采样未保留极值")
+            return False
+        
+        print(f"✅ 时间轴降采样测试成功，{len(current)} 点降为 {len(amount_trace.x)} 点")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 时间轴降采样测试失败: {e}")
+        return False
+
+def test_html_report_writer():
+    """测试流式HTML报告写出"""
+    print("\n📰 测试HTML报告写出...")
+    try:
+        import tempfile
+        import gzip
+        from utils.visualize import AnomalyVisualizer
+        from utils.risk_result import RiskResult
+        from utils.report_writer import PLOTLY_ASSET_NAME
+        
+        current = _random_bills(50000, 0)
+        scores = np.random.default_rng(0).beta(1, 8, len(current))
+        result = RiskResult(current['账单编号'].to_numpy(), scores)
+        visualizer = AnomalyVisualizer()
+        
+        # 只有声明为日期类型的坐标轴才转为时间戳，编号、年份等字符串原样保留
+        import plotly.graph_objects as go
+        from utils.report_writer import compact_figure_json
+        labels = compact_figure_json(go.Figure(go.Bar(x=['2024', '202401'], y=[1, 2])))
+        timeline = compact_figure_json(visualizer.create_anomaly_timeline(current.iloc[:500], result))
+        if list(labels['data'][0]['x']) != ['2024', '202401'] or \
+                timeline['data'][0]['x'].get('dtype') != 'f8' or timeline['layout']['xaxis']['type'] != 'date':
+            print("❌ 时间坐标转换范围不正确")
+            return False
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            inline_path = visualizer.generate_html_report(
+                current, result, output_path=os.path.join(tmp_dir, 'inline.html'))
+            with open(inline_path, encoding='utf-8') as f:
+                inline_html = f.read()
+            if inline_html.count('* plotly.js v') != 1 or '<script src="https://cdn.plot.ly' in inline_html:
+                print("❌ plotly.js 未内联或重复引入")
+                return False
+            if inline_html.count('Plotly.newPlot') != 4 or '"bdata"' not in inline_html:
+                print("❌ 图表未以二进制编码写出")
+                return False
+            
+            local_path = visualizer.generate_html_report(
+                current, result, output_path=os.path.join(tmp_dir, 'local.html'), plotlyjs='local')
+            local_size = os.path.getsize(local_path)
+            with open(local_path, encoding='utf-8') as f:
+                local_html = f.read()
+            if (f'src="{PLOTLY_ASSET_NAME}"' not in local_html
+                    or not os.path.exists(os.path.join(tmp_dir, PLOTLY_ASSET_NAME))):
+                print("❌ 未引用同目录的共享 plotly.js")
+                return False
+            if local_size > 3 * 1024 * 1024:
+                print(f"❌ 报告体积过大: {local_size} 字节")
+                return False
+            
+            gzip_path = visualizer.generate_html_report(
+                current, result, output_path=os.path.join(tmp_dir, 'local.html'),
+                plotlyjs='local', compress=True)
+            with gzip.open(gzip_path, 'rt', encoding='utf-8') as f:
+                if not gzip_path.endswith('.gz') or not f.read().rstrip().endswith('</html>'):
+                    print("❌ 压缩报告不完整")
+                    return False
+        
+        print(f"✅ HTML报告写出测试成功，{len(current)} 条记录的报告 {local_size // 1024} KB（不含 plotly.js）")
+        return True
+        
+    except Exception as e:
+        print(f"❌ HTML报告写出测试失败: {e}")
+        return False
+
+def test_branch_reports():
+    """测试按营业厅并行生成报告"""
+    print("\n🏢 测试营业厅报告批量生成...")
+    try:
+        import tempfile
+        from utils.visualize import AnomalyVisualizer
+        from utils.risk_result import RiskResult, COMPONENT_FIELDS
+        from utils.visualize import COMPONENT_LABELS
+        from utils.report_writer import PLOTLY_ASSET_NAME
+        
+        current = _random_bills(20000, 0)
+        rng = np.random.default_rng(0)
+        scores = rng.beta(1, 8, len(current))
+        result = RiskResult(current['账单编号'].to_numpy(), scores,
+                            {name: rng.random(len(current)) for name in COMPONENT_FIELDS})
+        branches = sorted(current['营业厅编号'].unique())
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            reports, errors = AnomalyVisualizer().generate_branch_reports(
+                current, result, tmp_dir, baseline_data=_random_bills(2000, 1), max_workers=2)
+            if errors or sorted(reports) != branches:
+                print(f"❌ 营业厅报告不完整: {errors}")
+                return False
+            if sorted(os.listdir(tmp_dir)) != sorted([PLOTLY_ASSET_NAME] + [os.path.basename(p) for p in reports.values()]):
+                print("❌ 输出目录中的文件与预期不符")
+                return False
+            
+            for branch, path in reports.items():
+                with open(path, encoding='utf-8') as f:
+                    report_html = f.read()
+                branch_rows = (current['营业厅编号'] == branch).to_numpy()
+                if (f'src="{PLOTLY_ASSET_NAME}"' not in report_html or f'营业厅 {branch}' not in report_html
+                        or f'总记录数: {branch_rows.sum()} | 高风险记录: {(scores[branch_rows] >= 0.7).sum()}' not in report_html):
+                    print(f"❌ 营业厅 {branch} 的报告内容不正确")
+                    return False
+                # 各营业厅的高风险清单保留各维度异常度列
+                if not all(f'<th>{label}</th>' in report_html for label in COMPONENT_LABELS.values()):
+                    print(f"❌ 营业厅 {branch} 的高风险清单缺少异常度列")
+                    return False
+        
+        # 清理后同名的编号各自成文件，缺少编号的账单单独成报告
+        odd = _random_bills(500, 2)
+        odd['营业厅编号'] = pd.Series([1, '1', 'A/B', 'A_B', None] * 100, dtype=object)
+        odd_result = RiskResult(odd['账单编号'].to_numpy(), np.random.default_rng(2).random(len(odd)))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            odd_reports, odd_errors = AnomalyVisualizer().generate_branch_reports(
+                odd, odd_result, tmp_dir, max_workers=1)
+            if odd_errors or len(odd_reports) != 5 or None not in odd_reports or \
+                    len(set(odd_reports.values())) != 5 or not all(map(os.path.exists, odd_reports.values())):
+                print(f"❌ 同名营业厅或缺失编号的报告不正确: {odd_reports}")
+                return False
+        
+        print(f"✅ 营业厅报告批量生成测试成功，{len(reports)} 个营业厅共用一个 plotly.js")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 营业厅报告批量生成测试失败: {e}")
+        return False
+
+def test_high_risk_listing():
+    """测试报告中的完整高风险清单"""
+    print("\n📋 测试高风险清单...")
+    try:
+        import re
+        import tempfile
+        from utils.visualize import AnomalyVisualizer, high_risk_table
+        from utils.risk_result import RiskResult, COMPONENT_FIELDS
+        
+        current = _random_bills(20000, 0)
+        current.loc[0, '账单编号'] = '</script><b>BILL'
+        rng = np.random.default_rng(0)
+        scores = rng.beta(1, 3, len(current))
+        scores[0] = 0.99
+        result = RiskResult(current['账单编号'].to_numpy(), scores,
+                            {name: rng.random(len(current)) for name in COMPONENT_FIELDS})
+        
+        table = high_risk_table(current, result)
+        if len(table) != (scores >= 0.7).sum() or not table['风险评分'].is_monotonic_decreasing:
+            print("❌ 清单未包含全部高风险账单或未按评分排序")
+            return False
+        if not {'操作员ID', '营业厅编号', '业务类型', '金额异常度', '特殊模式加成'} <= set(table.columns):
+            print("❌ 清单缺少操作员、营业厅、业务类型或异常度列")
+            return False
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = AnomalyVisualizer().generate_html_report(
+                current, result, output_path=os.path.join(tmp_dir, 'report.html'), plotlyjs='local')
+            with open(path, encoding='utf-8') as f:
+                report_html = f.read()
+        
+        chunks = re.findall(r'<script type="application/json" data-table="table-1">(.*?)</script>', report_html)
+        listed = [bill_id for chunk in chunks for bill_id in json.loads(chunk)[1]]
+        if listed != table['账单编号'].tolist():
+            print(f"❌ 报告中的清单与高风险账单不一致: {len(listed)} / {len(table)}")
+            return False
+        if '<td>1</td>' in report_html or '</script><b>BILL' in report_html:
+            print("❌ 清单应由脚本按页渲染，且数据需转义")
+            return False
+        
+        print(f"✅ 高风险清单测试成功，{len(table)} 条分 {len(chunks)} 块写入报告")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 高风险清单测试失败: {e}")
+        return False
+
+def test_vectorized_equivalence():
+    """测试列式评分引擎与逐行实现的结果一致性"""
+    print("\n🧮 测试列式评分引擎一致性...")
+    try:
+        from detector import BillingAnomalyDetector
+        
+        for seed in range(3):
+            history = _random_bills(600, seed + 100)
+            current = _random_bills(400, seed)
+            
+            detector = BillingAnomalyDetector()
+            detector.build_baseline(history)
+            vectorized = detector.detect_anomalies(current)
+            rowwise = detector._detect_anomalies_rowwise(current)
+            
+            if vectorized != rowwise:
+                mismatched = [k for k in rowwise if vectorized.get(k) != rowwise[k]]
+                print(f"❌ 第{seed}组随机数据结果不一致: {len(mismatched)} 条")
+                return False
+        
+        print("✅ 列式评分引擎与逐行实现结果一致")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 列式评分引擎一致性测试失败: {e}")
+        return False
+
+def test_scoring_regressions():
+    """测试评分规则的行为修正：不跨零点的夜间时段、操作员日操作次数、一次分组构建的基线"""
+    print("\n🌙 测试评分规则回归...")
+    try:
+        from detector import BillingAnomalyDetector
+        from utils.time_parsing import time_features
+        
+        # 配置只能整体赋值，就地修改副本不影响评分
+        detector = BillingAnomalyDetector()
+        config = detector.config
+        config['time_patterns']['night_hours'] = {'start': '01:00', 'end': '05:00'}
+        if detector.compiled_config.night_hours != (22, 6):
+            print("❌ 就地修改配置副本影响了检测器")
+            return False
+        detector.config = config
+        
+        # 夜间时段为 01:00-05:00 时，白天的操作不计入当天夜间操作次数
+        quiet_day, busy_day = pd.Timestamp('2024-01-03'), pd.Timestamp('2024-01-04')
+        times = ([quiet_day + pd.Timedelta(hours=14, minutes=2 * i) for i in range(10)]
+                 + [quiet_day + pd.Timedelta(hours=2, minutes=5 * i) for i in range(3)]
+                 + [busy_day + pd.Timedelta(hours=1, minutes=5 * i) for i in range(8)])
+        night_bills = pd.DataFrame({
+            '账单编号': [f'NIGHT{i:03d}' for i in range(len(times))],
+            '营业厅编号': 'BR001',
+            '账单日期': pd.to_datetime(times).normalize(),
+            '操作员ID': [f'OP{i:03d}' for i in range(len(times))],
+            '业务类型': '开户',
+            '费用金额': 100.0,
+            '优惠金额': 0.0,
+            '实收金额': 100.0,
+            '操作时间': pd.to_datetime(times),
+        })
+        result = detector.detect_anomalies(night_bills)
+        expected_boost = np.r_[np.zeros(13), np.full(8, 0.3)]
+        if not np.array_equal(result.components['special_pattern_boost'], expected_boost):
+            print("❌ 不跨零点的夜间时段统计了时段外的操作")
+            return False
+        if result.to_dict() != detector._detect_anomalies_rowwise(night_bills):
+            print("❌ 夜间时段修正后列式与逐行结果不一致")
+            return False
+        
+        # 操作员-日期操作次数：操作员或操作时间缺失的行计为 0
+        bills = _random_bills(600, 5)
+        bills.loc[::17, '操作员ID'] = None
+        bills.loc[::23, '操作时间'] = pd.NaT
+        daily_frequency = detector._operator_day_counts_vector(
+            detector._factorize_keys(bills['操作员ID']), time_features(bills)['date'])
+        expected_frequency = bills.groupby(['操作员ID', bills['操作时间'].dt.normalize()])['账单编号'] \
+            .transform('size').fillna(0).to_numpy(dtype=float)
+        if not np.array_equal(daily_frequency, expected_frequency):
+            print("❌ 操作员日操作次数与分组计数不一致")
+            return False
+        
+        # 基线由一次分组统计得到；默认不保留历史数据副本
+        history = _random_bills(1000, 6)
+        detector.build_baseline(history)
+        if detector.baseline_data is not None:
+            print("❌ 默认不应保留历史数据副本")
+            return False
+        grouped = history.groupby('操作员ID')
+        span = (grouped['账单日期'].max() - grouped['账单日期'].min()).dt.days.clip(lower=1)
+        for operator, baseline in detector.operator_baselines.items():
+            count = len(grouped.get_group(operator))
+            if baseline['count'] != count or \
+                    not np.isclose(baseline['avg_amount'], grouped['费用金额'].mean()[operator]) or \
+                    not np.isclose(baseline['avg_frequency_per_day'], count / span[operator]):
+                print(f"❌ 操作员 {operator} 的基线统计与分组结果不一致")
+                return False
+        detector.build_baseline(history, keep_data=True)
+        if detector.baseline_data is None or not detector.baseline_data.equals(history):
+            print("❌ keep_data=True 时未保留历史数据")
+            return False
+        
+        print("✅ 评分规则回归测试成功")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 评分规则回归测试失败: {e}")
+        return False
+
+def test_online_baseline_update():
+    """测试基线在线更新"""
+    print("\n🔄 测试基线在线更新...")
+    try:
+        from detector import BillingAnomalyDetector
+        
+        history = _random_bills(2000, 1)
+        
+        # learning_rate 为 0 时，在线更新应与全量重建一致（新批次与历史重叠、首尾相接、中间有间隔）
+        for batch_start in (datetime(2024, 1, 10), datetime(2024, 1, 15), datetime(2024, 1, 20)):
+            new_batch = _random_bills(500, 2, start=batch_start)
+            updated = BillingAnomalyDetector()
+            config = updated.config
+            config['operators']['learning_rate'] = 0.0
+            updated.config = config
+            updated.build_baseline(history)
+            updated.update_baseline(new_batch)
+            
+            rebuilt = BillingAnomalyDetector()
+            rebuilt.build_baseline(pd.concat([history, new_batch], ignore_index=True))
+            
+            for name in ('operator_baselines', 'business_type_baselines'):
+                left, right = getattr(updated, name), getattr(rebuilt, name)
+                if left.keys() != right.keys():
+                    print(f"❌ {name} 键集合不一致")
+                    return False
+                for key, baseline in right.items():
+                    if not np.allclose([left[key]['avg_amount'], left[key]['std_amount']],
+                                       [baseline['avg_amount'], baseline['std_amount']]):
+                        print(f"❌ {name}[{key}] 金额统计不一致")
+                        return False
+                    if not np.isclose(left[key]['avg_frequency_per_day'], baseline['avg_frequency_per_day']):
+                        print(f"❌ {name}[{key}] 日均频率不一致（新批次起始 {batch_start:%m-%d}）")
+                        return False
+                    if left[key]['hourly_distribution'] != baseline['hourly_distribution']:
+                        print(f"❌ {name}[{key}] 小时分布不一致")
+                        return False
+            
+            current = _random_bills(1000, 0, start=batch_start)
+            if not np.allclose(updated.detect_anomalies(current).risk_score,
+                               rebuilt.detect_anomalies(current).risk_score):
+                print(f"❌ 在线更新后的评分与全量重建不一致（新批次起始 {batch_start:%m-%d}）")
+                return False
+        
+        print("✅ 基线在线更新测试成功")
+        print(f"   操作员基线数: {len(updated.operator_baselines)}")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 基线在线更新测试失败: {e}")
+        return False
+
+def test_baseline_snapshot():
+    """测试基线快照保存与加载"""
+    print("\n💾 测试基线快照...")
+    try:
+        import tempfile
+        from detector import BillingAnomalyDetector
+        
+        detector = BillingAnomalyDetector()
+        detector.build_baseline(_random_bills(2000, 1))
+        detector.update_baseline(_random_bills(300, 2, start=datetime(2024, 1, 10)))
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            snapshot_path = os.path.join(tmp_dir, 'baseline')
+            detector.save_baseline(snapshot_path)
+            loaded = BillingAnomalyDetector(baseline_snapshot=snapshot_path)
+            
+            if loaded.operator_baselines != detector.operator_baselines or \
+                    loaded.business_type_baselines != detector.business_type_baselines:
+                print("❌ 加载的基线与保存前不一致")
+                return False
+            
+            current = _random_bills(300, 0)
+            if loaded.detect_anomalies(current) != detector.detect_anomalies(current):
+                print("❌ 加载快照后的检测结果不一致")
+                return False
+            
+            # 整数操作员ID加载后仍为整数；整数与字符串ID混用时拒绝保存
+            numeric = _random_bills(500, 1)
+            numeric['操作员ID'] = numeric['操作员ID'].str[2:].astype(int)
+            int_detector = BillingAnomalyDetector()
+            int_detector.build_baseline(numeric)
+            int_detector.save_baseline(snapshot_path + '_int')
+            if list(BillingAnomalyDetector(baseline_snapshot=snapshot_path + '_int').operator_baselines) != \
+                    list(int_detector.operator_baselines):
+                print("❌ 整数操作员ID加载后类型改变")
+                return False
+            mixed = pd.concat([numeric.iloc[:250], _random_bills(250, 2)], ignore_index=True)
+            int_detector.build_baseline(mixed)
+            try:
+                int_detector.save_baseline(snapshot_path + '_mixed')
+                print("❌ 未拒绝整数与字符串混用的操作员ID")
+                return False
+            except ValueError:
+                pass
+            
+            # 配置变化后应拒绝加载
+            config = loaded.config
+            config['risk_weights']['amount_anomaly'] = 0.5
+            loaded.config = config
+            try:
+                loaded.load_baseline(snapshot_path)
+                print("❌ 未检测到配置指纹不一致")
+                return False
+            except ValueError:
+                pass
+        
+        print("✅ 基线快照测试成功")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 基线快照测试失败: {e}")
+        return False
+
+def test_streaming_detection():
+    """测试分块流式检测与整批检测结果一致"""
+    print("\n🌊 测试分块流式检测...")
+    try:
+        from detector import BillingAnomalyDetector
+        
+        detector = BillingAnomalyDetector()
+        detector.build_baseline(_random_bills(1000, 1))
+        current = _random_bills(2000, 0).sort_values('操作时间', ignore_index=True)
+        expected = detector.detect_anomalies(current)
+        
+        rng = np.random.default_rng(3)
+        cuts = [0, *np.sort(rng.choice(len(current), 25, replace=False)), len(current)]
+        chunks = [current.iloc[a:b] for a, b in zip(cuts[:-1], cuts[1:])]
+        streamed = {}
+        for _, risk_scores in detector.detect_anomalies_stream(chunks):
+            streamed.update(risk_scores)
+        
+        if streamed != expected:
+            print("❌ 流式检测结果与整批检测不一致")
+            return False
+        
+        # 乱序数据块应被拒绝
+        try:
+            list(detector.detect_anomalies_stream(chunks[::-1]))
+            print("❌ 未检测到乱序数据块")
+            return False
+        except ValueError:
+            pass
+        
+        print("✅ 分块流式检测测试成功")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 分块流式检测测试失败: {e}")
+        return False
+
+def test_risk_result():
+    """测试列式评分结果"""
+    print("\n📋 测试列式评分结果...")
+    try:
+        from detector import BillingAnomalyDetector
+        
+        detector = BillingAnomalyDetector()
+        detector.build_baseline(_random_bills(1000, 1))
+        current = _random_bills(2000, 0)
+        result = detector.detect_anomalies(current)
+        # 按键查找的字符串索引只在字典方式访问时才建立
+        if result._lookup is not None:
+            print("❌ detect_anomalies 不应建立账单编号索引")
+            return False
+        risk_dict = result.to_dict()
+        
+        # 与按字典逐条计算的结果对比
+        expected_high = sorted(((k, v) for k, v in risk_dict.items() if v >= 0.5),
+                               key=lambda x: x[1], reverse=True)
+        if detector.get_high_risk_records(result, 0.5) != expected_high:
+            print("❌ 高风险记录与字典排序结果不一致")
+            return False
+        if [score for _, score in result.high_risk_records(0.0, limit=10)] != \
+                sorted(risk_dict.values(), reverse=True)[:10]:
+            print("❌ top-k 结果不正确")
+            return False
+        if detector.generate_anomaly_summary(current, result) != \
+                detector.generate_anomaly_summary(current, risk_dict):
+            print("❌ 检测摘要与字典输入结果不一致")
+            return False
+        
+        # 账单编号重复时，字典视图与摘要按编号去重（评分取最后一条），与原字典结果一致
+        duplicated = pd.concat([current, current.iloc[:300]], ignore_index=True)
+        duplicated_result = detector.detect_anomalies(duplicated)
+        duplicated_dict = duplicated_result.to_dict()
+        if len(duplicated_result) != len(duplicated_dict) or list(duplicated_result) != list(duplicated_dict) or \
+                duplicated_result.values() != list(duplicated_dict.values()):
+            print("❌ 重复账单编号时字典视图与 to_dict() 不一致")
+            return False
+        if detector.generate_anomaly_summary(duplicated, duplicated_result) != \
+                detector.generate_anomaly_summary(duplicated, duplicated_dict) or \
+                detector.get_high_risk_records(duplicated_result, 0.5) != \
+                detector.get_high_risk_records(duplicated_dict, 0.5):
+            print("❌ 重复账单编号时摘要或高风险记录与字典输入不一致")
+            return False
+        
+        joined = result.join(current)
+        shuffled = current.sample(frac=1.0, random_state=0)
+        if not np.array_equal(joined['风险评分'].to_numpy(), result.risk_score) or \
+                not np.array_equal(result.scores_for(shuffled),
+                                   [risk_dict[str(b)] for b in shuffled['账单编号']]):
+            print("❌ 评分与账单数据拼接结果不正确")
+            return False
+        
+        print("✅ 列式评分结果测试成功")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 列式评分结果测试失败: {e}")
+        return False
+
+def test_window_kernels():
+    """测试时间窗计数索引"""
+    print("\n⏱️ 测试时间窗计数索引...")
+    try:
+        from utils.window_kernels import EventWindowIndex
+        
+        rng = np.random.default_rng(7)
+        times = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 600, 300), unit='s')
+        groups = rng.choice(['OP001', 'OP002', 'OP003'], 300)
+        window = timedelta(seconds=30)
+        index = EventWindowIndex(times, groups=groups)
+        
+        for closed in ('both', 'left', 'right', 'neither'):
+            counts = index.count_in_window(times, window, groups=groups, closed=closed)
+            for t, g, count in zip(times, groups, counts):
+                same_group = times[groups == g]
+                lower_ok = same_group >= t - window if closed in ('both', 'left') else same_group > t - window
+                upper_ok = same_group <= t if closed in ('both', 'right') else same_group < t
+                if (lower_ok & upper_ok).sum() != count:
+                    print(f"❌ closed={closed} 计数与逐条统计不一致")
+                    return False
+        
+        print("✅ 时间窗计数索引测试成功")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 时间窗计数索引测试失败: {e}")
+        return False
+
 def test_visualizer():
     """测试可视化模块"""
     print("\n📈 测试可视化模块...")
@@ -234,7 +1289,29 @@ def main():
     # 运行各项测试
     test_results.append(("配置文件加载", test_config_loading()))
     test_results.append(("Excel解析器", test_excel_parser()))
+    test_results.append(("Excel分块读取", test_excel_chunks()))
+    test_results.append(("解析缓存", test_parse_cache()))
+    test_results.append(("多文件并行解析", test_multi_file_ingest()))
+    test_results.append(("紧凑类型表示", test_compact_schema()))
+    test_results.append(("时间解析", test_datetime_parsing()))
+    test_results.append(("CSV和Arrow解析", test_csv_arrow_ingest()))
+    test_results.append(("多工作表解析", test_multi_sheet_workbook()))
+    test_results.append(("流式导出", test_export_writer()))
+    test_results.append(("共享聚合缓存", test_aggregate_cache()))
+    test_results.append(("账单去重索引", test_dedup_index()))
     test_results.append(("异常检测器", test_detector()))
+    test_results.append(("列式评分一致性", test_vectorized_equivalence()))
+    test_results.append(("评分规则回归", test_scoring_regressions()))
+    test_results.append(("列式评分结果", test_risk_result()))
+    test_results.append(("按组风险统计", test_risk_group_stats()))
+    test_results.append(("时间轴降采样", test_timeline_downsampling()))
+    test_results.append(("HTML报告", test_html_report_writer()))
+    test_results.append(("营业厅报告", test_branch_reports()))
+    test_results.append(("高风险清单", test_high_risk_listing()))
+    test_results.append(("时间窗计数索引", test_window_kernels()))
+    test_results.append(("基线在线更新", test_online_baseline_update()))
+    test_results.append(("基线快照", test_baseline_snapshot()))
+    test_results.append(("分块流式检测", test_streaming_detection()))
     test_results.append(("可视化模块", test_visualizer()))
     test_results.append(("前端组件", test_frontend_components()))
     